@@ -0,0 +1,61 @@
+"""Compare CRC16 implementations.
+
+Run this in the main directory::
+
+    python benchmarks/crc16.py
+
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import schunk  # noqa: E402
+
+
+def crc16_reference(data):
+    """The original implementation: one function call per byte."""
+    crc = 0x0
+    for b in data:
+        crc = schunk.crc16_increment(crc, b)
+    return schunk._crc16_struct.pack(crc)
+
+
+frames = {
+    'CMD STOP': b'\x05\x0B\x01\x91',
+    'MOVE POS': b'\x05\x0B\x05\xB0\x00\x00\x20\x41',
+    'GET STATE response': b'\x07\x0B\x0F\x95' + bytes(14),
+    'GET CONFIG response': b'\x07\x0B\x2D\x80' + bytes(44),
+}
+
+
+def main(number=20000):
+    print('{:20}  {:>9}  {:>9}  {:>9}  {:>9}'.format(
+        '[µs per frame]', 'reference', 'crc16', 'prefix', 'check'))
+    for name, frame in frames.items():
+        crc = crc16_reference(frame)
+        assert schunk.crc16(frame) == crc
+        assert schunk.crc16_check(frame + crc)
+        prefix = schunk._crc16_prefix(frame[0], frame[1])
+        assert schunk.crc16_update(prefix, frame[2:]) == \
+            schunk._crc16_struct.unpack(crc)[0]
+        namespace = dict(globals(), frame=frame, prefix=prefix,
+                         view=memoryview(frame + crc))
+        timings = [
+            min(timeit.repeat(stmt, number=number, repeat=5,
+                              globals=namespace)) / number * 1e6
+            for stmt in [
+                'crc16_reference(frame)',
+                'schunk.crc16(frame)',
+                'schunk.crc16_update(prefix, view[2:-2])',
+                'schunk.crc16_check(view)',
+            ]
+        ]
+        print('{:20}  {:9.2f}  {:9.2f}  {:9.2f}  {:9.2f}'.format(
+            name, *timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -41,9 +41,22 @@ Example
 
 __version__ = "0.2.2"
 
-import struct
+import asyncio
+import bisect
+import collections
+import collections.abc
+import concurrent.futures
 import contextlib
 import functools
+import heapq
+import itertools
+import os
+import selectors
+import socket
+import struct
+import sys
+import threading
+import time
 
 
 class Module:
@@ -54,7 +67,7 @@ class Module:
 
     """
 
-    def __init__(self, connection):
+    def __init__(self, connection, shadow_targets=False):
         """Create an object for controlling a Schunk module.
 
         Parameters
@@ -68,9 +81,27 @@ class Module:
 
             :class:`SerialConnection` happens to do exactly that.
 
+        shadow_targets : bool, optional
+            If true, the values of the ``set_target_*()`` methods are
+            remembered.  Setting a value which is already active is
+            skipped.  Changed values are only sent with the next
+            movement (including :meth:`move_cur`, :meth:`move_vel`,
+            :meth:`move_grip` and :class:`ModuleGroup` movements), as
+            part of its parameters if possible (e.g. a new target
+            velocity and acceleration are sent with
+            ``move_pos(position, velocity, acceleration)``), or else as
+            separate messages right before it.  Therefore, errors about
+            invalid values are only raised then.
+            The remembered values are forgotten after errors,
+            :meth:`reboot` and :meth:`change_user`.
+
         """
         self._connection = connection
         self._config = _Config(self)
+        self._local = threading.local()
+        # Confirmed (packed) target values and values yet to be sent:
+        self._targets = {} if shadow_targets else None
+        self._deferred_targets = {}
 
     def reference(self):
         """2.1.1 CMD REFERENCE (0x92).
@@ -78,7 +109,7 @@ class Module:
         A reference movement is completed.
 
         """
-        self._send(0x92, expected=b'OK')
+        self._call('reference')
 
     def move_pos(self, position, velocity=None, acceleration=None,
                  current=None, jerk=None):
@@ -236,13 +267,63 @@ class Module:
                                      acceleration, current, time,
                                      blocking=True)
 
+    def move_cur(self, current):
+        """2.1.11 MOVE CUR (0xB3).
+
+        The module moves with the given current (a negative value
+        moves in the other direction) until it is stopped, e.g. with
+        :meth:`stop`.
+
+        See Also
+        --------
+        ControlLoop
+
+        """
+        if self._targets is not None:
+            self._flush_targets()  # see shadow_targets
+        self._call('move_cur', current)
+
+    def move_vel(self, velocity, current=None):
+        """2.1.12 MOVE VEL (0xB5).
+
+        The module moves with the given velocity (a negative value
+        moves in the other direction) until it is stopped, e.g. with
+        :meth:`stop`.
+
+        Parameters
+        ----------
+        velocity : float
+            Velocity.
+        current : float, optional
+            Maximum current, see :meth:`set_target_cur`.
+
+        See Also
+        --------
+        ControlLoop
+
+        """
+        if self._targets is not None:
+            self._flush_targets()  # see shadow_targets
+        self._call('move_vel', _move_pos_data([velocity, current]))
+
+    def move_grip(self, current):
+        """2.1.13 MOVE GRIP (0xB7).
+
+        A gripper closes (or, with a negative value, opens) with the
+        given current until it is blocked (e.g. by the gripped part).
+
+        """
+        if self._targets is not None:
+            self._flush_targets()  # see shadow_targets
+        self._call('move_grip', current)
+
     def set_target_vel(self, velocity):
         """2.1.14 SET TARGET VEL (0xA0).
 
         Initially, the target velocity is set to 10% of the maximum.
 
         """
-        self._send(0xA0, struct.pack('<f', velocity), expected=b'OK')
+        self._set_target('set_target_vel', velocity)
 
     def set_target_acc(self, acceleration):
         """2.1.15 SET TARGET ACC (0xA1).
@@ -250,7 +331,7 @@ class Module:
         Initially, the target acceleration is set to 10% of the maximum.
 
         """
-        self._send(0xA1, struct.pack('<f', acceleration), expected=b'OK')
+        self._set_target('set_target_acc', acceleration)
 
     def set_target_jerk(self, jerk):
         """2.1.16 SET TARGET JERK (0xA2).
@@ -258,7 +339,7 @@ class Module:
         Initially, the target jerk is set to 50% of the maximum.
 
         """
-        self._send(0xA2, struct.pack('<f', jerk), expected=b'OK')
+        self._set_target('set_target_jerk', jerk)
 
     def set_target_cur(self, current):
         """2.1.17 SET TARGET CUR (0xA3).
@@ -266,15 +347,58 @@ class Module:
         Initially, the target current is set to the nominal current.
 
         """
-        self._send(0xA3, struct.pack('<f', current), expected=b'OK')
+        self._set_target('set_target_cur', current)
 
     def set_target_time(self, time):
         """2.1.18 SET TARGET TIME (0xA4)."""
-        self._send(0xA4, struct.pack('<f', time), expected=b'OK')
+        self._set_target('set_target_time', time)
+
+    def start_move(self, *args, command='move_pos'):
+        """Start a movement and return a handle to its completion.
+
+        This needs a :class:`SerialBus` (or :class:`SerialConnection`)
+        with a running reader thread (see :meth:`SerialBus.start_reader`)
+        and enabled impulse messages (see :meth:`toggle_impulse_message`).
+
+        >>> handles = [axis.start_move(42) for axis in axes]  # doctest: +SKIP
+        >>> concurrent.futures.wait(handles)  # doctest: +SKIP
+
+        Parameters
+        ----------
+        *args
+            Arguments for `command`, e.g. position and velocity.
+        command : {'move_pos', 'move_pos_rel', 'move_pos_time', \
+                   'move_pos_time_rel'}, optional
+            Name of the corresponding method (without ``_blocking``).
+
+        Returns
+        -------
+        MoveHandle
+            A :class:`concurrent.futures.Future` which resolves to the
+            final position.
+
+        """
+        if command not in _move_commands:
+            raise ValueError("Invalid move command: {!r}".format(command))
+        bus = getattr(self._connection, 'bus', None)
+        if bus is None or bus._reader is None:
+            raise SchunkError("start_move() needs a running reader thread")
+        id = self._connection.id
+        handle = MoveHandle(self)
+        bus.add_callback(handle._callback, id=id)
+        handle.add_done_callback(
+            lambda future: bus.remove_callback(future._callback, id=id))
+        try:
+            handle.est_time = self._move_pos_helper(
+                _commands[command].code, *args)
+        except BaseException:
+            concurrent.futures.Future.cancel(handle)
+            raise
+        return handle
 
     def stop(self):
         """2.1.19 CMD STOP (0x91)."""
-        self._send(0x91, expected=b'OK')
+        self._call('stop')
 
     # Not implemented (see warnings in Schunk manual):
     # 2.1.20 CMD EMERGENCY STOP (0x90)
@@ -292,13 +416,8 @@ class Module:
             they were switched off.
 
         """
-        response = self._send(0xE7)
-        if response == b'ON':
-            return True
-        elif response == b'OFF':
-            return False
-        else:
-            raise SchunkError("Unexpected response: {}".format(response))
+        return _decode_toggle_impulse_message(
+            self._call('toggle_impulse_message'))
 
     @property
     def config(self):
@@ -313,6 +432,13 @@ class Module:
         Some options are read-only, some can only be set as "Profi"
         user. See :meth:`change_user`.
 
+        ``config.snapshot()`` reads all parameters (except `eeprom`)
+        at once and returns a :class:`ConfigSnapshot`.
+        The read-only info block (`module_type` to `firmware_date`) is
+        only requested once and then cached.
+        ``config.apply(values, verify=False)`` writes several
+        parameters at once, see :meth:`_Config.apply`.
+
         Attributes
         ----------
 
@@ -375,33 +501,98 @@ class Module:
         """
         return self._config
 
-    def get_state(self):
+    def get_state(self, fields=None):
         """2.5.1 GET STATE (0x95).
 
         Return the module status and other information.
 
-        The time parameter (to get state repeatedly) is disabled
-        (because impulse messages are not supported).
-        The mode parameter is always set to request everything
-        (position, velocity and current).
+        The time parameter is always 0.0 (the state is sent once),
+        see :meth:`stream_state` for repeatedly sent states.
+
+        Parameters
+        ----------
+        fields : sequence of {'position', 'velocity', 'current'}, optional
+            The values to request (this is the mode parameter).
+            Requesting fewer values makes the response shorter.
+            By default, everything is requested.
 
         Returns
         -------
-        position, velocity, current : float
-            Dito.
-        status : dict
-            See :func:`decode_status`.
+        position, velocity, current : float or None
+            Dito, ``None`` if not requested.
+        status : Status
+            Can also be used like the dictionary of
+            :func:`decode_status`.
         error_code : int
             See :const:`error_codes` for a mapping to strings.
 
         """
-        data = struct.pack('<fB', 0.0, 0x01 | 0x02 | 0x04)
-        pos, vel, cur, status, error = self._send(0x95, data, '<3fBB')
-        return pos, vel, cur, decode_status(status), error
+        mode = _state_mode(fields)
+        return _state_result(self._send(
+            0x95, _commands['get_state'].request.pack(0.0, mode),
+            _state_structs[mode]), mode)
+
+    def stream_state(self, interval, fields=None):
+        """2.5.1 GET STATE (0x95) with time parameter.
+
+        The module sends its state repeatedly on its own, which needs
+        only half of the bus traffic of repeated :meth:`get_state`
+        calls.  The connection is occupied while streaming.
+
+        When the generator is closed (e.g. by leaving a ``for`` loop
+        and dropping the generator, or with :func:`contextlib.closing`),
+        the streaming is stopped by requesting the state with time 0.
+        This is also tried after errors (e.g. a timeout because
+        `interval` is longer than the timeout of the port).
+
+        >>> with contextlib.closing(mod.stream_state(0.1)) as states:
+        ...     for pos, vel, cur, status, error in states:
+        ...         if status['position_reached']:
+        ...             break  # doctest: +SKIP
+
+        Parameters
+        ----------
+        interval : float
+            Time between two states in seconds.
+        fields : sequence of str, optional
+            See :meth:`get_state`.
+
+        Yields
+        ------
+        tuple
+            Same as the return value of :meth:`get_state`.
+
+        """
+        if not interval > 0:
+            raise ValueError("interval must be positive")
+        mode = _state_mode(fields)
+        stopped = False
+        try:
+            with self._session() as gen:
+                response = gen.send(_state_frame(interval, mode))
+                try:
+                    while True:
+                        if response[1] != 0x94:
+                            # 2.2.3 CMD POS REACHED (0x94) is ignored
+                            yield _decode_state(response, mode)
+                        response = gen.send(None)
+                except SchunkSerialError:
+                    raise
+                except BaseException:
+                    stopped = True
+                    # The response (or a late state) is ignored, further
+                    # late states are ignored by _send():
+                    gen.send(_state_frame(0.0, mode))
+                    raise
+        except SchunkSerialError:
+            if not stopped:
+                self._stop_stream(mode)
+            raise
 
     def reboot(self):
         """2.5.2 CMD REBOOT (0xE0)."""
-        self._send(0xE0, expected=b'OK')
+        self._forget_targets()
+        self._call('reboot')
 
     def change_user(self, password=None):
         """2.5.6 CHANGE USER (0xE3).
@@ -414,19 +605,9 @@ class Module:
         After a reboot, the default user is "User".
 
         """
-        if password is None:
-            data = b''
-        elif isinstance(password, str):
-            data = password.encode()
-        else:
-            data = password
-        ok, user = self._send(0xE3, data, '2sB')
-        if ok != b'OK':
-            raise SchunkError("Error changing user")
-        return {0x00: "User",
-                0x01: "Diag",
-                0x02: "Profi",
-                0x03: "Advanced"}[user]
+        self._forget_targets()
+        ok, user = self._call('change_user', _encode_password(password))
+        return _decode_user(ok, user)
 
     def check_mc_pc_communication(self):
         """2.5.7 CHECK MC PC COMMUNICATION (0xE4).
@@ -437,10 +618,7 @@ class Module:
             ``True`` on success.
 
         """
-        response = self._send(0xE4, fmt=_test_format_string)
-        if response != _test_values:
-            raise SchunkError("Wrong response: {}".format(response))
-        return True
+        return _check_test_values(self._call('check_mc_pc_communication'))
 
     def check_pc_mc_communication(self):
         """2.5.8 CHECK PC MC COMMUNICATION (0xE5).
@@ -451,8 +629,7 @@ class Module:
             ``True`` on success.
 
         """
-        data = struct.pack(_test_format_string, *_test_values)
-        self._send(0xE5, data, expected=b'OK\x00')
+        self._call('check_pc_mc_communication', *_test_values)
         return True
 
     def ack(self):
@@ -461,7 +638,7 @@ class Module:
         Acknowledgement of a pending error message.
 
         """
-        self._send(0x8B, expected=b'OK')
+        self._call('ack')
 
     def get_detailed_error_info(self):
         """2.8.1.5 GET DETAILED ERROR INFO (0x96).
@@ -482,59 +659,226 @@ class Module:
             ``INFO FAILED (0x05)``.
 
         """
-        command, error_code, data = self._send(0x96, fmt='<BBf')
-        command = {0x88: "ERROR", 0x89: "WARNING", 0x8A: "INFO"}[command]
-        return command, error_code, data
+        command, error_code, data = self._call('get_detailed_error_info')
+        return _error_commands[command], error_code, data
 
-    def wait_until_position_reached(self):
+    def wait_until_position_reached(self, fields=('position',),
+                                    expected_time=None, timeout=None,
+                                    bus_load=None):
         """Repeatedly check the state until the position is reached.
 
         This should only be used if impulse messages are disabled (see
         :meth:`toggle_impulse_message`).
 
+        If `expected_time` is given, most of it is waited before the
+        first check, afterwards the time between checks is halved each
+        time, down to a small fraction of the expected time (which is
+        also used after the expected time is over).
+        While waiting between checks, the connection is not used (i.e.
+        other modules can use a shared :class:`SerialBus`).
+
+        Parameters
+        ----------
+        fields : sequence of str, optional
+            The values requested while waiting, see :meth:`get_state`.
+            With an empty sequence, only the status is requested (which
+            gives the shortest responses) and the final position is
+            requested once at the end.
+        expected_time : float, optional
+            Expected time (in seconds) until the position is reached,
+            e.g. the estimated time returned by :meth:`move_pos` or the
+            duration of a :class:`MotionProfile`.
+        timeout : float, optional
+            Maximum time to wait (in seconds).
+        bus_load : float, optional
+            Maximum fraction of time (between 0 and 1) during which the
+            connection is used for checking.  By default, the checks are
+            sent back to back (unless `expected_time` is given).
+
+        Returns
+        -------
+        float
+            The final position.
+
+        Raises
+        ------
+        SchunkTimeoutError
+            If the position was not reached within `timeout`.
+
         """
-        gen = self._connection.open()
+        mode = _state_mode(fields)
+        pacer = _PollPacer(expected_time, timeout, bus_load)
+        gen = None
         try:
+            delay = pacer.first_delay()
             while True:
+                if delay > 0:
+                    if gen is not None:
+                        gen.close()
+                        gen = None
+                    time.sleep(delay)
+                if gen is None:
+                    gen = self._connection.open()
+                sent = time.monotonic()
                 # 2.5.1 GET STATE (0x95)
-                response = gen.send(_data_frame(0x95, b'\x00\x00\x00\x00\x01'))
-                if response[1] == 0x94:
-                    # 2.2.3 CMD POS REACHED (0x94) is ignored
+                response = gen.send(_state_frame(0.0, mode))
+                while (_is_ignored(response, 0x95) or
+                       _is_late_state(response, mode)):
                     response = gen.send(None)
-                position, status, error = _check_response(
-                    response, 0x95, '<fBB')
-                if status & 0x80:  # position reached
-                    return position
+                values = _check_response(response, 0x95, _state_structs[mode])
+                if values[-2] & 0x80:  # position reached
+                    if mode & 0x01:
+                        return values[0]
+                    mode = 0x01  # request the final position
+                    delay = 0.0
+                    continue
+                delay = pacer.next_delay(sent)
         except (KeyboardInterrupt, SystemExit):
-            gen.close()
-            gen = self._connection.open()
-            # 2.1.19 CMD STOP (0x91)
-            gen.send(b'\x01\x91')
-            # response message is ignored
+            if gen is not None:
+                gen.close()
+                gen = None
+            self._stop_after_interrupt()
             raise
         finally:
-            gen.close()
+            if gen is not None:
+                gen.close()
+
+    def _call(self, name, *args):
+        """Send a command from _commands with the given parameters.
+
+        If the command has no request layout, the parameters are
+        concatenated bytes objects.
+        Return the decoded response (see _send()).
+
+        """
+        command = _commands[name]
+        if command.request is not None:
+            data = command.request.pack(*args)
+        else:
+            data = b''.join(args)
+        return self._send(command.code, data, command.response,
+                          command.expected)
 
     def _send(self, command, data=b'', fmt=None, expected=None):
         """Send message, receive response.
 
         If the expected number of bytes doesn't match, an error is
         raised.
-        If expected is a string, it is used as format strings to decode
-        the received bytes.
+        If fmt is a string (or a struct.Struct object), it is used as
+        format strings to decode the received bytes.
         If expected is a bytes object, it is compared to the received
         data. If they are equal, the function returns, if not, an error
         is raised.
 
         """
+        try:
+            with self._session() as gen:
+                response = gen.send(_data_frame(command, bytes(data)))
+                while _is_ignored(response, command):
+                    response = gen.send(None)
+                return _check_response(response, command, fmt, expected)
+        except SchunkError:
+            self._forget_targets()
+            raise
+
+    def _stop_stream(self, mode):
+        """Try to stop stream_state() after an error."""
+        try:
+            with contextlib.closing(self._connection.open()) as gen:
+                gen.send(_state_frame(0.0, mode))
+        except SchunkError:
+            pass  # the original error is more interesting
+
+    def _stop_after_interrupt(self):
+        stop = getattr(self._connection, 'stop', None)
+        if stop is not None:
+            stop()  # e.g. SerialConnection.stop()
+            return
         with contextlib.closing(self._connection.open()) as gen:
-            response = gen.send(_data_frame(command, data))
-            if response[1] == 0x94:
-                # 2.2.3 CMD POS REACHED (0x94) is ignored
-                response = gen.send(None)
-            return _check_response(response, command, fmt, expected)
+            # 2.1.19 CMD STOP (0x91)
+            gen.send(b'\x01\x91')
+            # response message is ignored
 
-    def _move_pos_helper(self, command, *args, **kwargs):
+    def _set_target(self, name, value):
+        """Send a SET TARGET command (or defer it, see shadow_targets)."""
+        if self._targets is None:
+            self._call(name, value)
+        elif self._targets.get(name) == _float_structs[1].pack(value):
+            self._deferred_targets.pop(name, None)
+        else:
+            self._deferred_targets[name] = value
+
+    def _forget_targets(self):
+        """Forget confirmed target values (deferred ones are kept)."""
+        if self._targets is not None:
+            self._targets.clear()
+
+    def _flush_targets(self):
+        """Send all deferred target values."""
+        deferred = self._deferred_targets
+        while deferred:
+            name = next(iter(deferred))
+            value = deferred.pop(name)
+            self._call(name, value)
+            self._targets[name] = _float_structs[1].pack(value)
+
+    def _fold_targets(self, command, args):
+        """Add deferred target values to MOVE POS arguments.
+
+        Deferred values which cannot be added are sent separately.
+        Return the new arguments and the names of the target values
+        which are part of them.
+
+        """
+        targets, deferred = self._targets, self._deferred_targets
+        names = _move_targets[command]
+        args = list(args) + [None] * (len(names) + 1 - len(args))
+        given = [arg is not None for arg in args[1:]]
+        if given != sorted(given, reverse=True):
+            # None between arguments, this will raise an error later
+            self._flush_targets()
+            return args, ()
+        folded = args[:1]
+        for name, arg in zip(names, args[1:]):
+            if arg is None:
+                arg = deferred.get(name)
+            if arg is None and name in targets:
+                arg, = _float_structs[1].unpack(targets[name])
+            if arg is None:
+                break
+            folded.append(arg)
+        # Values which are already active don't have to be sent at the end:
+        while (len(folded) > 1 and not given[len(folded) - 2] and
+               names[len(folded) - 2] not in deferred):
+            folded.pop()
+        included = names[:len(folded) - 1]
+        for name in included:
+            deferred.pop(name, None)
+        self._flush_targets()
+        return folded, included
+
+    @contextlib.contextmanager
+    def _session(self):
+        """Use one coroutine of the connection for several messages.
+
+        Nested sessions (in the same thread) share the outer coroutine.
+        With a :class:`SerialBus`, no other module can use the bus
+        while the session is active (from its first message on), except
+        for urgent messages, see :meth:`BusScheduler.preempt`.
+
+        """
+        gen = getattr(self._local, 'gen', None)
+        if gen is not None:
+            yield gen
+            return
+        with contextlib.closing(self._connection.open()) as gen:
+            self._local.gen = gen
+            try:
+                yield gen
+            finally:
+                self._local.gen = None
+
+    def _move_pos_helper(self, command, *args, blocking=False):
         """Move to the given position.
 
         If blocking=False, the movement is started and the estimated
@@ -552,54 +896,292 @@ class Module:
         At least one argument (position) has to be specified.
 
         """
-        n = len(args)
-        while n > 1 and args[n - 1] is None:
-            n -= 1
-
-        data = struct.pack('<{}f'.format(n), *args[:n])
-
-        # Work-around since Python 2 doesn't support keyword-only args:
-        blocking = kwargs.pop('blocking', False)
-        assert not kwargs
+        included = ()
+        if self._targets is not None:
+            args, included = self._fold_targets(command, args)
+        data = _move_pos_data(args)
 
         gen = self._connection.open()
         try:
             response = gen.send(_data_frame(command, data))
-            if response[1] == 0x94:
-                # 2.2.3 CMD POS REACHED (0x94) is ignored
+            while _is_ignored(response, command):
                 response = gen.send(None)
-            response = _check_response(response, command)
-            if response == b'OK':
-                est_time = 0.0
-            elif len(response) == 4:
-                est_time, = struct.unpack_from('<f', response)
-            else:
-                raise SchunkError("Unexpected reponse: {}".format(response))
+            est_time = _decode_est_time(_check_response(response, command))
+            for name, value in zip(included, args[1:]):
+                self._targets[name] = _float_structs[1].pack(value)
 
             if not blocking:
                 return est_time
             else:
                 # 2.2.3 CMD POS REACHED (0x94)
-                position, = _check_response(next(gen), 0x94, '<f')
+                response = next(gen)
+                while response[1] == 0x95:
+                    # late state after stream_state() is ignored
+                    response = next(gen)
+                position, = _check_response(
+                    response, 0x94, _commands['pos_reached'].response)
                 return position
+        except SchunkError:
+            self._forget_targets()
+            raise
         except (KeyboardInterrupt, SystemExit):
             gen.close()
-            gen = self._connection.open()
-            # 2.1.19 CMD STOP (0x91)
-            gen.send(b'\x01\x91')
-            # response message is ignored
+            self._stop_after_interrupt()
             raise
         finally:
             gen.close()
 
 
+@functools.lru_cache(maxsize=256)
 def _data_frame(command, data=b''):
-    """Create a bytearray of D-Len, command code and binary data."""
+    """Create bytes of D-Len, command code and binary data.
+
+    The result is cached, so constant frames (e.g. CMD STOP) are only
+    created once.
+
+    """
     frame = bytearray()
     frame.append(len(data) + 1)  # command byte is counted!
     frame.append(command)
     frame.extend(data)
-    return frame
+    return bytes(frame)
+
+
+def _move_pos_data(args):
+    """Pack the arguments of the MOVE POS family of commands.
+
+    Trailing None arguments are removed, None arguments between
+    other arguments are not allowed.
+
+    """
+    n = len(args)
+    while n > 1 and args[n - 1] is None:
+        n -= 1
+    return _float_structs[n].pack(*args[:n])
+
+
+def _decode_est_time(response):
+    """Get estimated time from the response to a MOVE POS command."""
+    if response == b'OK':
+        return 0.0
+    elif len(response) == 4:
+        est_time, = _float_structs[1].unpack_from(response)
+        return est_time
+    else:
+        raise SchunkError("Unexpected reponse: {}".format(response))
+
+
+def _decode_toggle_impulse_message(response):
+    if response == b'ON':
+        return True
+    elif response == b'OFF':
+        return False
+    else:
+        raise SchunkError("Unexpected response: {}".format(response))
+
+
+def _encode_password(password):
+    if password is None:
+        return b''
+    elif isinstance(password, str):
+        return password.encode()
+    else:
+        return password
+
+
+def _decode_user(ok, user):
+    if ok != b'OK':
+        raise SchunkError("Error changing user")
+    return {0x00: "User",
+            0x01: "Diag",
+            0x02: "Profi",
+            0x03: "Advanced"}[user]
+
+
+def _check_test_values(response):
+    if response != _test_values:
+        raise SchunkError("Wrong response: {}".format(response))
+    return True
+
+
+class MoveHandle(concurrent.futures.Future):
+    """Completion of a movement started with :meth:`Module.start_move`.
+
+    The result is the final position (from 2.2.3 CMD POS REACHED).
+    A :exc:`SchunkError` is set as exception if the module sends 2.6.1
+    CMD ERROR or 2.2.2 CMD MOVE BLOCKED.
+
+    """
+
+    def __init__(self, module):
+        super().__init__()
+        self.module = module
+        """The moving :class:`Module`."""
+        self.est_time = None
+        """Estimated time returned by the module."""
+
+    def cancel(self):
+        """Stop the module (2.1.19 CMD STOP) and cancel the handle.
+
+        Returns False if the movement is already finished.
+
+        """
+        if self.done():
+            return False
+        self.module.stop()
+        return super().cancel()
+
+    def _callback(self, module_id, response):
+        """Called by SerialBus for impulse and error messages."""
+        command = response[1]
+        if command == 0x94:  # CMD POS REACHED
+            try:
+                position, = _check_response(
+                    response, 0x94, _commands['pos_reached'].response)
+            except SchunkError as e:
+                self._settle(self.set_exception, e)
+            else:
+                self._settle(self.set_result, position)
+        elif command == 0x93:  # CMD MOVE BLOCKED
+            self._settle(self.set_exception,
+                         SchunkError("CMD MOVE BLOCKED (0x93)"))
+        elif command == 0x88:  # CMD ERROR
+            try:
+                _check_response(response, 0x94)
+            except SchunkError as e:
+                self._settle(self.set_exception, e)
+
+    def _settle(self, method, value):
+        try:
+            if not self.done():
+                method(value)
+        except _InvalidStateError:
+            pass  # cancelled in the meantime
+
+
+# Added in Python 3.8, before that, set_result() didn't check the state:
+_InvalidStateError = getattr(concurrent.futures, 'InvalidStateError',
+                             RuntimeError)
+
+
+class _PollPacer:
+    """Timing of the checks in Module.wait_until_position_reached()."""
+
+    # Fraction of the expected time which is waited before the first check:
+    expected_fraction = 0.9
+
+    # The remaining time is split into at least this many checks:
+    min_delay_divisor = 8
+
+    def __init__(self, expected_time, timeout, bus_load):
+        if bus_load is not None and not 0 < bus_load <= 1:
+            raise ValueError("bus_load must be between 0 and 1")
+        self._start = time.monotonic()
+        self._end = self._start + expected_time if expected_time else None
+        # Checks are never sent back-to-back while an expected time is
+        # given, the coroutine has to be re-opened between them:
+        self._min_delay = ((1 - self.expected_fraction) * expected_time /
+                           self.min_delay_divisor if expected_time else 0.0)
+        self._deadline = None if timeout is None else self._start + timeout
+        self._bus_load = bus_load
+        self._polls = 0
+
+    def first_delay(self):
+        """Return time to wait before the first check."""
+        if self._end is None:
+            return 0.0
+        return self._limit(self.expected_fraction * (self._end - self._start),
+                           self._start)
+
+    def next_delay(self, sent):
+        """Return time to wait after a check which was sent at `sent`.
+
+        Raise SchunkTimeoutError if the deadline has passed.
+
+        """
+        now = time.monotonic()
+        self._polls += 1
+        delay = 0.0
+        if self._bus_load is not None:
+            delay = (now - sent) * (1 / self._bus_load - 1)
+        if self._end is not None:
+            delay = max(delay, (self._end - now) / 2, self._min_delay)
+        return self._limit(delay, now)
+
+    def _limit(self, delay, now):
+        if self._deadline is None:
+            return delay
+        remaining = self._deadline - now
+        if remaining <= 0:
+            waited = now - self._start
+            raise SchunkTimeoutError(
+                "Position not reached after {:.3f} seconds ({} checks)".format(
+                    waited, self._polls), waited)
+        return min(delay, remaining)
+
+
+def _is_ignored(response, command):
+    """Check if a response doesn't belong to the given command.
+
+    2.2.3 CMD POS REACHED (0x94) is ignored, as well as late GET STATE
+    (0x95) responses after :meth:`Module.stream_state` was stopped.
+
+    """
+    return response[1] == 0x94 or response[1] == 0x95 != command
+
+
+def _is_late_state(response, mode):
+    """Check if a GET STATE (0x95) response has a different mode.
+
+    This happens with late responses after :meth:`Module.stream_state`
+    was stopped.  Error responses (D-Len 2) are not late states.
+
+    """
+    return (response[1] == 0x95 and response[0] != 2 and
+            len(response) != _state_structs[mode].size + 2)
+
+
+def _state_mode(fields):
+    """Return the GET STATE (0x95) mode for a sequence of field names."""
+    if fields is None:
+        return 0x01 | 0x02 | 0x04
+    if isinstance(fields, str):
+        fields = [fields]
+    mode = 0
+    for name in fields:
+        try:
+            mode |= _state_fields[name]
+        except KeyError:
+            raise ValueError("Invalid field: {!r}".format(name))
+    return mode
+
+
+def _state_frame(interval, mode):
+    """Return GET STATE (0x95) data frame."""
+    return _data_frame(0x95, _commands['get_state'].request.pack(
+        interval, mode))
+
+
+def _state_result(values, mode):
+    """Return the values of an (unpacked) GET STATE (0x95) response.
+
+    The result has the same form as :meth:`Module.get_state`, values
+    which were not requested by `mode` are None.
+
+    """
+    values = list(values)
+    error = values.pop()
+    status = values.pop()
+    values.reverse()
+    pos, vel, cur = (values.pop() if mode & bit else None
+                     for bit in (0x01, 0x02, 0x04))
+    return pos, vel, cur, _status_objects[status], error
+
+
+def _decode_state(response, mode):
+    """Check and decode a GET STATE (0x95) response."""
+    return _state_result(
+        _check_response(response, 0x95, _state_structs[mode]), mode)
 
 
 def _check_response(response, command, fmt=None, expected=None):
@@ -612,12 +1194,12 @@ def _check_response(response, command, fmt=None, expected=None):
         raise SchunkError("D-Len mismatch in response")
     if dlen == 2:
         error = response[2]
-        error_prefix = {
-            0x88: "CMD ERROR: ",
-            0x89: "CMD WARNING: ",
-            0x8A: "CMD INFO: ",
-            command: "",
-        }.get(cmd_code, "Command code 0x{:02X}: ".format(cmd_code))
+        if cmd_code == command:
+            error_prefix = ""
+        else:
+            error_prefix = _error_prefixes.get(cmd_code)
+            if error_prefix is None:
+                error_prefix = "Command code 0x{:02X}: ".format(cmd_code)
         error_string = "{} (0x{:02X})".format(
             error_codes.get(error, "UNKNOWN"), error)
         raise SchunkError(error_prefix + error_string)
@@ -634,14 +1216,24 @@ def _check_response(response, command, fmt=None, expected=None):
             err = "Unexpected response: {} instead of {}"
             raise SchunkError(err.format(response, expected))
     if fmt is not None:
-        size = struct.calcsize(fmt)
-        if len(response) != size:
+        if isinstance(fmt, str):
+            fmt = _struct(fmt)
+        if len(response) != fmt.size:
             err = "Unexpected payload size in reponse: {} instead of {}"
-            raise SchunkError(err.format(len(response), size))
-        response = struct.unpack_from(fmt, response)
+            raise SchunkError(err.format(len(response), fmt.size))
+        response = fmt.unpack_from(response)
     return response
 
 
+_struct = functools.lru_cache(maxsize=None)(struct.Struct)
+
+_error_prefixes = {
+    0x88: "CMD ERROR: ",
+    0x89: "CMD WARNING: ",
+    0x8A: "CMD INFO: ",
+}
+
+
 class SchunkError(Exception):
     """This exception is raised on all kinds of errors."""
 
@@ -651,39 +1243,40 @@ class SchunkError(Exception):
 class _Config:
     """Helper class for the Module.config property."""
 
-    _params = {
-        'module_id':          (b'\x01', 'B'),
-        'group_id':           (b'\x02', 'B'),
-        'serial_baudrate':    (b'\x03', 'H'),
-        'can_baudrate':       (b'\x04', 'H'),
-        'communication_mode': (b'\x05', 'B'),
-        'unit_system':        (b'\x06', 'B'),
-        'soft_high':          (b'\x07', 'f'),
-        'soft_low':           (b'\x08', 'f'),
-        'max_velocity':       (b'\x09', 'f'),
-        'max_acceleration':   (b'\x0A', 'f'),
-        'max_current':        (b'\x0B', 'f'),
-        'nom_current':        (b'\x0C', 'f'),
-        'max_jerk':           (b'\x0D', 'f'),
-        'offset_phase_a':     (b'\x0E', 'H'),
-        'offset_phase_b':     (b'\x0F', 'H'),
-        'data_crc':           (b'\x13', 'H'),
-        'reference_offset':   (b'\x14', 'f'),
-        'serial_number':      (b'\x15', 'I'),
-        'order_number':       (b'\x16', 'I'),
-        'gear_ratio':         (b'\x18', 'f'),
-        'eeprom':             (b'\xFE', None),
-
-        'module_type':        (None, '8s4x2x2x2x21x5x'),
+    # The order of the parameters is also the order of ConfigSnapshot:
+    _params = collections.OrderedDict([
+        ('module_id',          (b'\x01', 'B')),
+        ('group_id',           (b'\x02', 'B')),
+        ('serial_baudrate',    (b'\x03', 'H')),
+        ('can_baudrate',       (b'\x04', 'H')),
+        ('communication_mode', (b'\x05', 'B')),
+        ('unit_system',        (b'\x06', 'B')),
+        ('soft_high',          (b'\x07', 'f')),
+        ('soft_low',           (b'\x08', 'f')),
+        ('max_velocity',       (b'\x09', 'f')),
+        ('max_acceleration',   (b'\x0A', 'f')),
+        ('max_current',        (b'\x0B', 'f')),
+        ('nom_current',        (b'\x0C', 'f')),
+        ('max_jerk',           (b'\x0D', 'f')),
+        ('offset_phase_a',     (b'\x0E', 'H')),
+        ('offset_phase_b',     (b'\x0F', 'H')),
+        ('data_crc',           (b'\x13', 'H')),
+        ('reference_offset',   (b'\x14', 'f')),
+        ('serial_number',      (b'\x15', 'I')),
+        ('order_number',       (b'\x16', 'I')),
+        ('gear_ratio',         (b'\x18', 'f')),
+        ('eeprom',             (b'\xFE', None)),
+
+        ('module_type',        (None, '8s4x2x2x2x21x5x')),
         # 'order_number' is already available
-        'firmware_version':   (None, '8x4xH2x2x21x5x'),
-        'protocol_version':   (None, '8x4x2xH2x21x5x'),
-        'hardware_version':   (None, '8x4x2x2xH21x5x'),
-        'firmware_date':      (None, '8x4x2x2x2x21s5x'),
+        ('firmware_version',   (None, '8x4xH2x2x21x5x')),
+        ('protocol_version',   (None, '8x4x2xH2x21x5x')),
+        ('hardware_version',   (None, '8x4x2x2xH21x5x')),
+        ('firmware_date',      (None, '8x4x2x2x2x21s5x')),
         # Note: There are 5 more bytes which the Schunk manual doesn't mention.
         # The meaning of these mysterious bytes is not known.
-        '_internal':          (None, '8x4x2x2x2x21x5s'),
-    }
+        ('_internal',          (None, '8x4x2x2x2x21x5s')),
+    ])
 
     def __init__(self, module):
         # Avoid __setattr__:
@@ -699,205 +1292,3163 @@ class _Config:
 
     def __getattr__(self, name):
         """2.3.2 GET CONFIG (0x80)."""
+        if name in self._info_fields:
+            return self._info_block()[self._info_fields.index(name)]
+        data, fmt = self._get_request(name)
+        return self._get_result(name, self._module._send(0x80, data, fmt))
+
+    def __setattr__(self, name, value):
+        """2.3.1 SET CONFIG (0x81)."""
+        data = self._set_request(name, value)
+        result, = self._module._call('set_config', data)
+        self._check_set_result(name, data, result)
+
+    def snapshot(self):
+        """Read all parameters (except `eeprom`) at once.
+
+        All messages are sent in one session, i.e. other modules on a
+        shared :class:`SerialBus` have to wait until the snapshot is
+        complete, except for urgent messages (e.g. CMD STOP, see
+        :class:`BusScheduler` and :meth:`SerialBus.stop`), which may be
+        sent in between.
+        Parameters which the module refuses to report (i.e. it answers
+        with an error message) are set to ``None``.
+
+        Returns
+        -------
+        ConfigSnapshot
+            A named tuple of all parameters.
+
+        """
+        values = []
+        with self._module._session():
+            info = dict(zip(self._info_fields, self._info_block()))
+            for name in ConfigSnapshot._fields:
+                if name in info:
+                    values.append(info[name])
+                    continue
+                try:
+                    values.append(getattr(self, name))
+                except SchunkSerialError:
+                    raise
+                except SchunkError:
+                    values.append(None)
+        return ConfigSnapshot(*values)
+
+    def apply(self, values, verify=False):
+        """Set several parameters, skipping unchanged ones.
+
+        All current values are read before anything is written, all
+        messages are sent in one session.
+
+        Parameters
+        ----------
+        values : dict
+            Mapping of parameter names to new values.
+        verify : bool, optional
+            If True, the written parameters are read back and a
+            :exc:`SchunkError` is raised if one of them doesn't match.
+
+        Returns
+        -------
+        ConfigChanges
+            The changed parameters, separated by whether they are
+            applied immediately or only after a reboot.
+
+        """
+        requests = self._apply_requests(values)
+        old = {}
+        with self._module._session():
+            for name, data in requests:
+                current = getattr(self, name)
+                if self._set_request(name, current) != data:
+                    old[name] = current
+            for name, data in requests:
+                if name in old:
+                    result, = self._module._call('set_config', data)
+                    self._check_set_result(name, data, result)
+            if verify:
+                for name, data in requests:
+                    if name in old:
+                        self._check_verified(name, data, getattr(self, name))
+        return self._changes(values, old)
+
+    def _info_block(self):
+        """Return the (cached) fields of the GET CONFIG info block."""
+        info = vars(self).get('_info')
+        if info is None:
+            info = self._module._send(0x80, b'', self._info_struct)
+            vars(self)['_info'] = info
+        return info
+
+    # The info block is the response to GET CONFIG without data:
+    _info_fields = ('module_type', 'firmware_version', 'protocol_version',
+                    'hardware_version', 'firmware_date', '_internal')
+    _info_struct = struct.Struct('<8s4xHHH21s5s')
+
+    @classmethod
+    def _param(cls, name):
         try:
-            cmd_byte, format_string = self._params[name]
+            return cls._params[name]
         except KeyError:
             raise AttributeError("Invalid parameter: {}".format(name))
 
+    # Precompiled layouts of GET CONFIG responses and SET CONFIG values:
+    _get_structs = {
+        name: struct.Struct(('<' if cmd_byte is None else '<s') + fmt)
+        for name, (cmd_byte, fmt) in _params.items() if fmt is not None}
+    _set_structs = {
+        name: struct.Struct('<' + fmt)
+        for name, (cmd_byte, fmt) in _params.items()
+        if cmd_byte is not None and fmt is not None}
+
+    @classmethod
+    def _get_request(cls, name):
+        """Return data and struct.Struct (or None) for GET CONFIG."""
+        cmd_byte, format_string = cls._param(name)
+        return cmd_byte or b'', cls._get_structs.get(name)
+
+    @classmethod
+    def _get_result(cls, name, response):
+        """Check and decode the (already unpacked) GET CONFIG response."""
+        cmd_byte, format_string = cls._param(name)
         if cmd_byte is None:
-            result, = self._module._send(0x80, fmt=format_string)
+            result, = response
             firstbyte = None
         elif format_string is None:
-            result = self._module._send(0x80, cmd_byte)
-            firstbyte = result[0:1]
-            result = result[1:]
+            firstbyte = response[0:1]
+            result = response[1:]
         else:
-            firstbyte, result = self._module._send(0x80, cmd_byte,
-                                                   '<s' + format_string)
+            firstbyte, result = response
         if firstbyte != cmd_byte:
             raise SchunkError("Unexpected subcommand: {}".format(firstbyte))
 
         return result
 
-    def __setattr__(self, name, value):
-        """2.3.1 SET CONFIG (0x81)."""
-        try:
-            cmd_byte, format_string = self._params[name]
-        except KeyError:
-            raise AttributeError("Invalid parameter: {}".format(name))
+    @classmethod
+    def _set_request(cls, name, value):
+        """Return data for SET CONFIG."""
+        cmd_byte, format_string = cls._param(name)
 
         if cmd_byte is None:
             raise AttributeError("{} is read-only".format(name))
 
         if format_string is not None:
-            value = struct.pack('<' + format_string, value)
+            value = cls._set_structs[name].pack(value)
+        return cmd_byte + value
 
-        result, = self._module._send(0x81, cmd_byte + value, '3s')
-        if result != b'OK' + cmd_byte:
+    @staticmethod
+    def _check_set_result(name, data, result):
+        if result != b'OK' + data[:1]:
             raise SchunkError("Error setting {}".format(name))
 
+    # These parameters are applied without reboot (see Module.config):
+    _immediate = frozenset(['soft_high', 'soft_low', 'gear_ratio'])
 
-def coroutine(func):
-    """Decorator for generator functions that calls next() initially."""
-    @functools.wraps(func)
-    def start(*args, **kwargs):
-        gen = func(*args, **kwargs)
-        next(gen)
-        return gen
-    return start
+    @classmethod
+    def _apply_requests(cls, values):
+        """Return list of (name, data) pairs for SET CONFIG."""
+        if 'eeprom' in values:
+            raise AttributeError("eeprom cannot be applied")
+        return [(name, cls._set_request(name, value))
+                for name, value in values.items()]
 
+    @classmethod
+    def _check_verified(cls, name, data, value):
+        if cls._set_request(name, value) != data:
+            raise SchunkError("Verification of {} failed: {!r}".format(
+                name, value))
 
-class SerialConnection:
-    """A serial connection.
+    @classmethod
+    def _changes(cls, values, old):
+        """Return ConfigChanges, given the old values of changed params."""
+        immediate, reboot = {}, {}
+        for name, value in old.items():
+            target = immediate if name in cls._immediate else reboot
+            target[name] = value, values[name]
+        return ConfigChanges(immediate, reboot)
 
-    For further documentation see the __init__() docstring.
 
-    """
+ConfigSnapshot = collections.namedtuple('ConfigSnapshot', [
+    name for name in _Config._params
+    if name != 'eeprom' and not name.startswith('_')])
+ConfigSnapshot.__doc__ = """All config parameters, see :attr:`Module.config`.
 
-    def __init__(self, id, serialmanager, *args, **kwargs):
-        """Prepare a serial connection.
+Returned by ``config.snapshot()``.
 
-        This can be used to initialize a :class:`Module`.
+"""
 
-        The connection is opened with :meth:`open`.
+ConfigChanges = collections.namedtuple('ConfigChanges', 'immediate reboot')
+ConfigChanges.__doc__ = """Changed parameters, returned by ``config.apply()``.
 
-        Parameters
-        ----------
-        id : int
-            Module ID of the Schunk device.
+Both `immediate` and `reboot` are dictionaries which map parameter names
+to ``(old, new)`` pairs.  The parameters in `reboot` are only applied
+after the module has been restarted (see :meth:`Module.reboot`).
 
-        serialmanager
-            A callable (to be called with ``*args`` and ``**kwargs``)
-            that must return a context manager which in turn must have
-            ``read()`` and ``write()`` methods (and it should close the
-            connection automatically in the end).
+"""
 
-            This is typically ``serial.Serial`` from PySerial_, but
-            anything with a similar API can be used.
 
-            .. _PySerial: http://pyserial.sf.net/
+class AsyncModule:
+    """A Schunk module, to be used with :mod:`asyncio`.
 
-            .. note:: there should be a timeout, otherwise you may have
-                      to wait forever for the functions to return if
-                      there is an error.
-                      On the other hand, receiving multiple responses
-                      only works if there is no timeout in between.
-                      Multiple responses are needed for the blocking
-                      movement commands, e.g.
-                      :meth:`Module.move_pos_blocking`.
+    For further documentation see the __init__() docstring.
 
-        *args, **kwargs
-            All further arguments are forwarded to `serialmanager`.
+    """
 
-        See Also
-        --------
-        Module
+    def __init__(self, connection):
+        """Create an object for controlling a Schunk module with asyncio.
 
-        Examples
-        --------
+        All methods of :class:`Module` are available, but they are
+        coroutines which have to be awaited.  Config parameters are
+        read with ``await mod.config.max_velocity`` and written with
+        ``await mod.config.set('soft_high', 90.0)``.
 
-        Using PySerial_:
+        Timeouts can be realized with :func:`asyncio.wait_for`.
+        If a waiting ``*_blocking()`` method (or
+        :meth:`wait_until_position_reached`) is cancelled, the module is
+        stopped, just like :class:`Module` does it on
+        :exc:`KeyboardInterrupt`.
+
+        Parameters
+        ----------
+        connection
+            Something that has an ``open()`` method which returns an
+            asynchronous context manager.  The object it provides must
+            have the coroutine methods ``send(data)`` (which sends a
+            data frame and returns the response, like the coroutine of
+            :class:`SerialConnection`) and ``receive()`` (which returns
+            the next response without sending anything).
+
+            :class:`AsyncSerialConnection` happens to do exactly that.
+
+        Examples
+        --------
+
+        >>> import asyncio
+        >>> import serial_asyncio  # doctest: +SKIP
+        >>> async def main():
+        ...     async with AsyncSerialBus(
+        ...             serial_asyncio.open_serial_connection,
+        ...             url='/dev/ttyS0', baudrate=9600) as bus:
+        ...         mod1 = AsyncModule(bus.connection(0x0B))
+        ...         mod2 = AsyncModule(bus.connection(0x0C))
+        ...         await asyncio.gather(mod1.move_pos(42),
+        ...                              mod2.move_pos(23))
+        >>> loop = asyncio.get_event_loop()  # doctest: +SKIP
+        >>> loop.run_until_complete(main())  # doctest: +SKIP
+
+        """
+        self._connection = connection
+        self._config = _AsyncConfig(self)
+
+    async def reference(self):
+        """See :meth:`Module.reference`."""
+        await self._call('reference')
+
+    async def move_pos(self, position, velocity=None, acceleration=None,
+                       current=None, jerk=None):
+        """See :meth:`Module.move_pos`."""
+        return await self._move_pos_helper(0xB0, position, velocity,
+                                           acceleration, current, jerk)
+
+    async def move_pos_blocking(self, position, velocity=None,
+                                acceleration=None, current=None, jerk=None):
+        """See :meth:`Module.move_pos_blocking`."""
+        return await self._move_pos_helper(0xB0, position, velocity,
+                                           acceleration, current, jerk,
+                                           blocking=True)
+
+    async def move_pos_rel(self, position, velocity=None, acceleration=None,
+                           current=None, jerk=None):
+        """See :meth:`Module.move_pos_rel`."""
+        return await self._move_pos_helper(0xB8, position, velocity,
+                                           acceleration, current, jerk)
+
+    async def move_pos_rel_blocking(self, position, velocity=None,
+                                    acceleration=None, current=None,
+                                    jerk=None):
+        """See :meth:`Module.move_pos_rel_blocking`."""
+        return await self._move_pos_helper(0xB8, position, velocity,
+                                           acceleration, current, jerk,
+                                           blocking=True)
+
+    async def move_pos_time(self, position, velocity=None, acceleration=None,
+                            current=None, time=None):
+        """See :meth:`Module.move_pos_time`."""
+        return await self._move_pos_helper(0xB1, position, velocity,
+                                           acceleration, current, time)
+
+    async def move_pos_time_blocking(self, position, velocity=None,
+                                     acceleration=None, current=None,
+                                     time=None):
+        """See :meth:`Module.move_pos_time_blocking`."""
+        return await self._move_pos_helper(0xB1, position, velocity,
+                                           acceleration, current, time,
+                                           blocking=True)
+
+    async def move_pos_time_rel(self, position, velocity=None,
+                                acceleration=None, current=None, time=None):
+        """See :meth:`Module.move_pos_time_rel`."""
+        return await self._move_pos_helper(0xB9, position, velocity,
+                                           acceleration, current, time)
+
+    async def move_pos_time_rel_blocking(self, position, velocity=None,
+                                         acceleration=None, current=None,
+                                         time=None):
+        """See :meth:`Module.move_pos_time_rel_blocking`."""
+        return await self._move_pos_helper(0xB9, position, velocity,
+                                           acceleration, current, time,
+                                           blocking=True)
+
+    async def move_cur(self, current):
+        """See :meth:`Module.move_cur`."""
+        await self._call('move_cur', current)
+
+    async def move_vel(self, velocity, current=None):
+        """See :meth:`Module.move_vel`."""
+        await self._call('move_vel', _move_pos_data([velocity, current]))
+
+    async def move_grip(self, current):
+        """See :meth:`Module.move_grip`."""
+        await self._call('move_grip', current)
+
+    async def set_target_vel(self, velocity):
+        """See :meth:`Module.set_target_vel`."""
+        await self._call('set_target_vel', velocity)
+
+    async def set_target_acc(self, acceleration):
+        """See :meth:`Module.set_target_acc`."""
+        await self._call('set_target_acc', acceleration)
+
+    async def set_target_jerk(self, jerk):
+        """See :meth:`Module.set_target_jerk`."""
+        await self._call('set_target_jerk', jerk)
+
+    async def set_target_cur(self, current):
+        """See :meth:`Module.set_target_cur`."""
+        await self._call('set_target_cur', current)
+
+    async def set_target_time(self, time):
+        """See :meth:`Module.set_target_time`."""
+        await self._call('set_target_time', time)
+
+    async def stop(self):
+        """See :meth:`Module.stop`."""
+        await self._call('stop')
+
+    async def toggle_impulse_message(self):
+        """See :meth:`Module.toggle_impulse_message`."""
+        return _decode_toggle_impulse_message(
+            await self._call('toggle_impulse_message'))
+
+    @property
+    def config(self):
+        """See :attr:`Module.config`.
+
+        Reading a parameter returns an awaitable, use :meth:`set` to
+        write a parameter:
+
+        >>> await mod.config.unit_system  # doctest: +SKIP
+        0
+        >>> await mod.config.set('soft_high', 90.0)  # doctest: +SKIP
+
+        """
+        return self._config
+
+    async def get_state(self, fields=None):
+        """See :meth:`Module.get_state`."""
+        mode = _state_mode(fields)
+        return _state_result(await self._send(
+            0x95, _commands['get_state'].request.pack(0.0, mode),
+            _state_structs[mode]), mode)
+
+    def stream_state(self, interval, fields=None):
+        """See :meth:`Module.stream_state`.
+
+        The returned object has to be used as asynchronous context
+        manager, the streaming is stopped at the end of the block:
+
+        >>> async with mod.stream_state(0.1) as states:  # doctest: +SKIP
+        ...     async for pos, vel, cur, status, error in states:
+        ...         if status['position_reached']:
+        ...             break
+
+        """
+        if not interval > 0:
+            raise ValueError("interval must be positive")
+        return _AsyncStateStream(self, interval, _state_mode(fields))
+
+    async def reboot(self):
+        """See :meth:`Module.reboot`."""
+        await self._call('reboot')
+
+    async def change_user(self, password=None):
+        """See :meth:`Module.change_user`."""
+        ok, user = await self._call('change_user',
+                                    _encode_password(password))
+        return _decode_user(ok, user)
+
+    async def check_mc_pc_communication(self):
+        """See :meth:`Module.check_mc_pc_communication`."""
+        return _check_test_values(
+            await self._call('check_mc_pc_communication'))
+
+    async def check_pc_mc_communication(self):
+        """See :meth:`Module.check_pc_mc_communication`."""
+        await self._call('check_pc_mc_communication', *_test_values)
+        return True
+
+    async def ack(self):
+        """See :meth:`Module.ack`."""
+        await self._call('ack')
+
+    async def get_detailed_error_info(self):
+        """See :meth:`Module.get_detailed_error_info`."""
+        command, error_code, data = await self._call(
+            'get_detailed_error_info')
+        return _error_commands[command], error_code, data
+
+    async def wait_until_position_reached(self, fields=('position',),
+                                          expected_time=None, timeout=None,
+                                          bus_load=None):
+        """See :meth:`Module.wait_until_position_reached`."""
+        mode = _state_mode(fields)
+        pacer = _PollPacer(expected_time, timeout, bus_load)
+        try:
+            delay = pacer.first_delay()
+            while True:
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                async with self._connection.open() as exchange:
+                    while True:
+                        sent = time.monotonic()
+                        # 2.5.1 GET STATE (0x95)
+                        response = await exchange.send(
+                            _state_frame(0.0, mode))
+                        while (_is_ignored(response, 0x95) or
+                               _is_late_state(response, mode)):
+                            response = await exchange.receive()
+                        values = _check_response(response, 0x95,
+                                                 _state_structs[mode])
+                        if values[-2] & 0x80:  # position reached
+                            if mode & 0x01:
+                                return values[0]
+                            mode = 0x01  # request the final position
+                            continue
+                        delay = pacer.next_delay(sent)
+                        if delay > 0:
+                            break
+        except (asyncio.CancelledError, KeyboardInterrupt, SystemExit):
+            await self._stop_after_interrupt()
+            raise
+
+    async def _call(self, name, *args):
+        """See :meth:`Module._call`."""
+        command = _commands[name]
+        if command.request is not None:
+            data = command.request.pack(*args)
+        else:
+            data = b''.join(args)
+        return await self._send(command.code, data, command.response,
+                                command.expected)
+
+    async def _send(self, command, data=b'', fmt=None, expected=None):
+        """See :meth:`Module._send`."""
+        async with self._connection.open() as exchange:
+            response = await exchange.send(_data_frame(command, bytes(data)))
+            while _is_ignored(response, command):
+                response = await exchange.receive()
+            return _check_response(response, command, fmt, expected)
+
+    async def _move_pos_helper(self, command, *args, blocking=False):
+        """See :meth:`Module._move_pos_helper`."""
+        data = _move_pos_data(args)
+        try:
+            async with self._connection.open() as exchange:
+                response = await exchange.send(_data_frame(command, data))
+                while _is_ignored(response, command):
+                    response = await exchange.receive()
+                est_time = _decode_est_time(
+                    _check_response(response, command))
+
+                if not blocking:
+                    return est_time
+                # 2.2.3 CMD POS REACHED (0x94), other modules can use
+                # the bus in the meantime
+                response = await exchange.receive()
+                while response[1] == 0x95:
+                    # late state after stream_state() is ignored
+                    response = await exchange.receive()
+                position, = _check_response(
+                    response, 0x94, _commands['pos_reached'].response)
+                return position
+        except (asyncio.CancelledError, KeyboardInterrupt, SystemExit):
+            await self._stop_after_interrupt()
+            raise
+
+    async def _stop_after_interrupt(self):
+        async with self._connection.open() as exchange:
+            # 2.1.19 CMD STOP (0x91)
+            await exchange.send(b'\x01\x91')
+            # response message is ignored
+
+
+class _AsyncConfig(_Config):
+    """Helper class for the AsyncModule.config property."""
+
+    def __getattr__(self, name):
+        """2.3.2 GET CONFIG (0x80)."""
+        self._param(name)  # raise AttributeError early
+        return self.get(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(
+            "Use 'await config.set({!r}, value)' instead".format(name))
+
+    async def get(self, name):
+        """2.3.2 GET CONFIG (0x80)."""
+        if name in self._info_fields:
+            info = await self._info_block()
+            return info[self._info_fields.index(name)]
+        data, fmt = self._get_request(name)
+        return self._get_result(name, await self._module._send(0x80, data,
+                                                               fmt))
+
+    async def set(self, name, value):
+        """2.3.1 SET CONFIG (0x81)."""
+        data = self._set_request(name, value)
+        result, = await self._module._call('set_config', data)
+        self._check_set_result(name, data, result)
+
+    async def snapshot(self):
+        """See :attr:`Module.config`.
+
+        Other modules on the same bus may send messages in between.
+
+        """
+        values = []
+        info = dict(zip(self._info_fields, await self._info_block()))
+        for name in ConfigSnapshot._fields:
+            if name in info:
+                values.append(info[name])
+                continue
+            try:
+                values.append(await self.get(name))
+            except SchunkSerialError:
+                raise
+            except SchunkError:
+                values.append(None)
+        return ConfigSnapshot(*values)
+
+    async def apply(self, values, verify=False):
+        """See :meth:`_Config.apply`.
+
+        Other modules on the same bus may send messages in between.
+
+        """
+        requests = self._apply_requests(values)
+        old = {}
+        for name, data in requests:
+            current = await self.get(name)
+            if self._set_request(name, current) != data:
+                old[name] = current
+        for name, data in requests:
+            if name in old:
+                result, = await self._module._call('set_config', data)
+                self._check_set_result(name, data, result)
+        if verify:
+            for name, data in requests:
+                if name in old:
+                    self._check_verified(name, data, await self.get(name))
+        return self._changes(values, old)
+
+    async def _info_block(self):
+        info = vars(self).get('_info')
+        if info is None:
+            info = await self._module._send(0x80, b'', self._info_struct)
+            vars(self)['_info'] = info
+        return info
+
+
+class _AsyncStateStream:
+    """Helper class for AsyncModule.stream_state()."""
+
+    def __init__(self, module, interval, mode):
+        self._module = module
+        self._interval = interval
+        self._mode = mode
+        self._context = None
+        self._exchange = None
+        self._response = None
+
+    async def __aenter__(self):
+        context = self._module._connection.open()
+        exchange = await context.__aenter__()
+        try:
+            self._response = await exchange.send(
+                _state_frame(self._interval, self._mode))
+        except BaseException:
+            await context.__aexit__(*sys.exc_info())
+            raise
+        self._context, self._exchange = context, exchange
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        context, exchange = self._context, self._exchange
+        self._context = self._exchange = self._response = None
+        try:
+            if exc_type is None or not issubclass(exc_type,
+                                                  SchunkSerialError):
+                # The response (or a late state) is ignored:
+                await exchange.send(_state_frame(0.0, self._mode))
+        except BaseException:
+            await context.__aexit__(*sys.exc_info())
+            raise
+        await context.__aexit__(exc_type, exc_value, traceback)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._exchange is None:
+            raise RuntimeError("Use 'async with' to start streaming")
+        response, self._response = self._response, None
+        while response is None or response[1] == 0x94:
+            # 2.2.3 CMD POS REACHED (0x94) is ignored
+            response = await self._exchange.receive()
+        return _decode_state(response, self._mode)
+
+
+class TrajectoryPlayer:
+    """Move through several waypoints without stopping at each of them.
+
+    For further documentation see the __init__() docstring.
+
+    """
+
+    def __init__(self, module, lead_time=0.05, clock=time.monotonic,
+                 sleep=time.sleep):
+        """Prepare a trajectory for a :class:`Module`.
+
+        Each waypoint is sent as MOVE POS (or MOVE POS TIME) command
+        `lead_time` seconds before the previous waypoint is expected to
+        be reached (according to the estimated time returned by the
+        module), which replaces the previous target while the module is
+        still moving.
+
+        If the module cannot estimate the time (i.e. it returns 0.0),
+        the player waits until the position is reached before sending
+        the next waypoint.
+
+        The connection should be kept open (see
+        :meth:`SerialConnection.connect`), otherwise the port is
+        opened for each waypoint.
+
+        >>> player = TrajectoryPlayer(mod)  # doctest: +SKIP
+        >>> stats = player.play([(10, 20), (20, 20), 25])  # doctest: +SKIP
+        >>> [segment.duration for segment in stats]  # doctest: +SKIP
+
+        Parameters
+        ----------
+        module : Module
+            The module to be moved.
+        lead_time : float, optional
+            Time (in seconds) to send the next waypoint before the
+            current one is expected to be reached.
+        clock, sleep : callable, optional
+            Functions to get the current time and to wait.
+
+        """
+        self.module = module
+        self.lead_time = lead_time
+        self._clock = clock
+        self._sleep = sleep
+
+    def play(self, waypoints, use_time=False):
+        """Move through all waypoints and wait until the last is reached.
+
+        On :exc:`KeyboardInterrupt`, the module is stopped.
+
+        Parameters
+        ----------
+        waypoints : sequence or array_like
+            Each waypoint is a position or a sequence of the arguments
+            of :meth:`Module.move_pos` (or :meth:`Module.move_pos_time`
+            if `use_time` is true), e.g. a row of a NumPy array.
+            Trailing ``None`` (or NaN) values are not sent.
+        use_time : bool, optional
+            Use MOVE POS TIME instead of MOVE POS.
+
+        Returns
+        -------
+        list of SegmentStats
+            Timing information for each waypoint.
+
+        """
+        module = self.module
+        clock = self._clock
+        command = 0xB1 if use_time else 0xB0
+        stats = []
+        previous = None
+        try:
+            for waypoint in waypoints:
+                args = _waypoint_args(waypoint)
+                if previous is not None:
+                    self._wait_for(previous)
+                sent = clock()
+                est_time = module._move_pos_helper(command, *args)
+                received = clock()
+                start = (sent + received) / 2
+                if previous is not None:
+                    stats.append(previous._replace(
+                        duration=start - previous.start))
+                previous = SegmentStats(args[0], est_time, start, None,
+                                        received - sent)
+            if previous is not None:
+                remaining = previous.start + previous.est_time - clock()
+                module.wait_until_position_reached(
+                    expected_time=max(remaining, 0.0) if previous.est_time
+                    else None)
+                stats.append(previous._replace(
+                    duration=clock() - previous.start))
+        except (KeyboardInterrupt, SystemExit):
+            module._stop_after_interrupt()
+            raise
+        return stats
+
+    def _wait_for(self, segment):
+        """Wait until it's time to send the next waypoint."""
+        if segment.est_time == 0:
+            self.module.wait_until_position_reached()
+            return
+        remaining = (segment.start + segment.est_time - self.lead_time -
+                     self._clock())
+        if remaining > 0:
+            self._sleep(remaining)
+
+
+SegmentStats = collections.namedtuple(
+    'SegmentStats', 'position est_time start duration rtt')
+SegmentStats.__doc__ = """Timing of one waypoint of :class:`TrajectoryPlayer`.
+
+`start` is the time (according to the player's clock) in the middle of
+the round trip (which took `rtt` seconds) of the MOVE POS command.
+`est_time` is the time estimated by the module.  `duration` is the time
+until the next waypoint was sent (or the last waypoint was reached).
+
+"""
+
+
+def _waypoint_args(waypoint):
+    """Convert a waypoint to arguments for the MOVE POS commands."""
+    try:
+        args = list(waypoint)
+    except TypeError:
+        args = [waypoint]
+    if not args:
+        raise ValueError("Empty waypoint")
+    # NaN is the only value which is not equal to itself:
+    return [None if arg is None or arg != arg else float(arg)
+            for arg in args]
+
+
+class ControlLoop:
+    """Run a function at a fixed rate with the current state of a module.
+
+    For further documentation see the __init__() docstring.
+
+    """
+
+    def __init__(self, module, callback, rate, fields=None, spin=0.002,
+                 jitter_bins=(0.0001, 0.0005, 0.001, 0.005, 0.01),
+                 clock=time.perf_counter, sleep=time.sleep):
+        """Prepare a control loop for a :class:`Module`.
+
+        In each cycle, the state of the module is requested (see
+        :meth:`Module.get_state`) and passed to `callback`, which
+        typically computes a new command and sends it to the module,
+        e.g. with :meth:`Module.move_vel` or :meth:`Module.move_cur`.
+
+        Cycles start at multiples of the period (``1 / rate``) after
+        the start of :meth:`run`.  The loop sleeps until shortly
+        before the next cycle and then busy-waits for the remaining
+        `spin` seconds, which is more accurate than sleeping only.
+        If a cycle takes longer than the period, the missed cycles are
+        skipped and counted.  The delay of each cycle start (the
+        jitter) is counted in a histogram, see :class:`LoopStats`.
+
+        >>> def control(state, t):
+        ...     position = state[0]
+        ...     mod.move_vel(gain * (target - position))
+        >>> loop = ControlLoop(mod, control, rate=100,
+        ...                    fields=['position'])  # doctest: +SKIP
+        >>> stats = loop.run(duration=10)  # doctest: +SKIP
+
+        Parameters
+        ----------
+        module : Module
+            The module to be controlled.
+        callback : callable
+            Called with the state and the time (in seconds) since the
+            start of :meth:`run` for each cycle.
+        rate : float
+            Number of cycles per second.
+        fields : sequence of str, optional
+            See :meth:`Module.get_state`.
+        spin : float, optional
+            Time (in seconds) to busy-wait before each cycle.
+        jitter_bins : sequence of float, optional
+            Upper limits (in seconds) of the bins of :attr:`histogram`.
+        clock, sleep : callable, optional
+            Functions to get the current time and to wait.
+
+        """
+        self.module = module
+        self.callback = callback
+        self.period = 1.0 / rate
+        self.fields = fields
+        self.spin = spin
+        self.jitter_bins = tuple(jitter_bins)
+        self._clock = clock
+        self._sleep = sleep
+        self._stopped = False
+        self._reset()
+
+    def run(self, cycles=None, duration=None):
+        """Run the loop.
+
+        The loop ends after the given number of `cycles`, after
+        `duration` seconds or when :meth:`stop` is called (e.g. from
+        the callback).  On :exc:`KeyboardInterrupt`, the module is
+        stopped.
+
+        If the connection isn't open (see
+        :meth:`SerialConnection.connect`), it is opened for the whole
+        loop.
+
+        Returns
+        -------
+        LoopStats
+            Timing statistics.  While the loop is running, they are
+            available as the attributes ``cycles``, ``misses``,
+            ``max_jitter`` and ``histogram``.
+
+        """
+        connection = self.module._connection
+        temporary = not getattr(connection, 'connected', True)
+        if temporary:
+            connection.connect()
+        self._reset()
+        self._stopped = False
+        try:
+            self._run(cycles, duration)
+        except (KeyboardInterrupt, SystemExit):
+            self.module._stop_after_interrupt()
+            raise
+        finally:
+            if temporary:
+                connection.close()
+        return LoopStats(self.cycles, self.misses, self.max_jitter,
+                         list(self.histogram))
+
+    def stop(self):
+        """End :meth:`run` after the current cycle."""
+        self._stopped = True
+
+    def _reset(self):
+        # Number of completed and skipped cycles:
+        self.cycles = 0
+        self.misses = 0
+        # Largest delay of a cycle start, and number of cycle starts per
+        # bin of jitter_bins (the last one counts the delays above):
+        self.max_jitter = 0.0
+        self.histogram = [0] * (len(self.jitter_bins) + 1)
+
+    def _run(self, cycles, duration):
+        clock = self._clock
+        period = self.period
+        start = clock()
+        index = 0  # deadlines are computed from the start to avoid drift
+        while not self._stopped:
+            if cycles is not None and self.cycles >= cycles:
+                break
+            if duration is not None and index * period >= duration:
+                break
+            deadline = start + index * period
+            now = self._wait_until(deadline)
+            jitter = now - deadline
+            self.histogram[bisect.bisect_left(self.jitter_bins,
+                                              jitter)] += 1
+            self.max_jitter = max(self.max_jitter, jitter)
+            self.callback(self.module.get_state(self.fields), now - start)
+            self.cycles += 1
+            index += 1
+            late = clock() - (start + index * period)
+            if late > 0:
+                missed = int(late // period) + 1
+                self.misses += missed
+                index += missed
+
+    def _wait_until(self, deadline):
+        """Sleep, then spin until deadline, return the current time."""
+        clock = self._clock
+        remaining = deadline - clock() - self.spin
+        if remaining > 0:
+            self._sleep(remaining)
+        now = clock()
+        while now < deadline:
+            now = clock()
+        return now
+
+
+LoopStats = collections.namedtuple(
+    'LoopStats', 'cycles misses max_jitter histogram')
+LoopStats.__doc__ = """Timing of a :meth:`ControlLoop.run`.
+
+`cycles` is the number of completed cycles and `misses` the number of
+skipped ones.  `max_jitter` is the largest delay (in seconds) of a
+cycle start.  `histogram` counts the delays per bin of `jitter_bins`
+(see :class:`ControlLoop`), the last entry counts delays above the
+last limit.
+
+"""
+
+
+class ModuleGroup:
+    """Several modules which are started with one broadcast frame.
+
+    For further documentation see the __init__() docstring.
+
+    """
+
+    def __init__(self, modules, group_id):
+        """Coordinate the modules of a group on one :class:`SerialBus`.
+
+        The motion parameters are set for each module individually (see
+        :meth:`set_targets`), afterwards all modules are started with
+        one frame sent to the group (see :meth:`SerialBus.broadcast`),
+        i.e. they start at the same time.
+
+        Because the position is part of the MOVE POS commands, all
+        modules get the same (absolute or relative) target position.
+        With :meth:`move_pos_time` (and different target times), the
+        modules can also be made to arrive at the same time.
+
+        >>> with SerialBus(serial.Serial, port=0, baudrate=9600,
+        ...                timeout=1) as bus:  # doctest: +SKIP
+        ...     axes = [Module(bus.connection(id)) for id in (1, 2, 3)]
+        ...     group = ModuleGroup(axes, group_id=10)
+        ...     group.set_targets(velocity=[5, 10, 20])
+        ...     group.move_pos(42)
+        ...     positions = group.wait_until_position_reached()
+
+        Parameters
+        ----------
+        modules : sequence of Module
+            The modules must use connections of the same
+            :class:`SerialBus` (see :meth:`SerialBus.connection`) and
+            their `group_id` must be configured.
+        group_id : int
+            Group ID of the modules.
+
+        """
+        self.modules = list(modules)
+        buses = {module._connection.bus for module in self.modules}
+        if len(buses) != 1:
+            raise ValueError("All modules must use the same SerialBus")
+        self.bus, = buses
+        self.group_id = group_id
+
+    def set_targets(self, velocity=None, acceleration=None, current=None,
+                    jerk=None, time=None):
+        """Set motion parameters of the modules (one after the other).
+
+        Each argument can be a single value (for all modules) or a
+        sequence with one value per module.  ``None`` values are not
+        sent.
+
+        See Also
+        --------
+        Module.set_target_vel, Module.set_target_acc
+        Module.set_target_cur, Module.set_target_jerk
+        Module.set_target_time
+
+        """
+        for name, values in (('set_target_vel', velocity),
+                             ('set_target_acc', acceleration),
+                             ('set_target_cur', current),
+                             ('set_target_jerk', jerk),
+                             ('set_target_time', time)):
+            if values is None:
+                continue
+            try:
+                values = list(values)
+            except TypeError:
+                values = [values] * len(self.modules)
+            if len(values) != len(self.modules):
+                raise ValueError("Expected one value per module")
+            for module, value in zip(self.modules, values):
+                if value is not None:
+                    getattr(module, name)(value)
+
+    def move_pos(self, position):
+        """Broadcast 2.1.3 MOVE POS (0xB0)."""
+        self._broadcast(0xB0, _float_structs[1].pack(position))
+
+    def move_pos_rel(self, position):
+        """Broadcast 2.1.4 MOVE POS REL (0xB8)."""
+        self._broadcast(0xB8, _float_structs[1].pack(position))
+
+    def move_pos_time(self, position):
+        """Broadcast 2.1.5 MOVE POS TIME (0xB1)."""
+        self._broadcast(0xB1, _float_structs[1].pack(position))
+
+    def move_pos_time_rel(self, position):
+        """Broadcast 2.1.6 MOVE POS TIME REL (0xB9)."""
+        self._broadcast(0xB9, _float_structs[1].pack(position))
+
+    def stop(self):
+        """Broadcast 2.1.19 CMD STOP (0x91).
+
+        Deferred target values are not sent and waiting threads are
+        bypassed, see :meth:`SerialBus.stop`.
+
+        """
+        self.bus.stop(group_id=self.group_id)
+
+    def wait_until_position_reached(self, expected_time=None, timeout=None,
+                                    bus_load=None):
+        """Wait until all modules have reached their position.
+
+        The modules are checked one after the other, `expected_time`
+        and `timeout` are counted from the start of this call.
+
+        Parameters
+        ----------
+        expected_time, timeout, bus_load : float, optional
+            See :meth:`Module.wait_until_position_reached`.
+
+        Returns
+        -------
+        list of float
+            The final position of each module.
+
+        See Also
+        --------
+        Module.wait_until_position_reached
+
+        """
+        start = time.monotonic()
+
+        def remaining(duration):
+            if duration is None:
+                return None
+            return max(duration - (time.monotonic() - start), 0.0)
+
+        try:
+            return [module.wait_until_position_reached(
+                        expected_time=remaining(expected_time) or None,
+                        timeout=remaining(timeout), bus_load=bus_load)
+                    for module in self.modules]
+        except (KeyboardInterrupt, SystemExit):
+            self.stop()
+            raise
+
+    def _broadcast(self, command, data=b''):
+        for module in self.modules:
+            if module._targets is not None:
+                module._flush_targets()  # see Module(shadow_targets=True)
+        self.bus.broadcast(self.group_id, _data_frame(command, data))
+
+
+def coroutine(func):
+    """Decorator for generator functions that calls next() initially."""
+    @functools.wraps(func)
+    def start(*args, **kwargs):
+        gen = func(*args, **kwargs)
+        next(gen)
+        return gen
+    return start
+
+
+class SerialConnection:
+    """A serial connection.
+
+    For further documentation see the __init__() docstring.
+
+    """
+
+    def __init__(self, id, serialmanager, *args, **kwargs):
+        """Prepare a serial connection.
+
+        This can be used to initialize a :class:`Module`.
+
+        The connection is opened with :meth:`open`.
+
+        Parameters
+        ----------
+        id : int
+            Module ID of the Schunk device.
+
+        serialmanager
+            A callable (to be called with ``*args`` and ``**kwargs``)
+            that must return a context manager which in turn must have
+            ``read()`` and ``write()`` methods (and it should close the
+            connection automatically in the end).
+
+            This is typically ``serial.Serial`` from PySerial_, but
+            anything with a similar API can be used.
+
+            .. _PySerial: http://pyserial.sf.net/
+
+            .. note:: there should be a timeout, otherwise you may have
+                      to wait forever for the functions to return if
+                      there is an error.
+                      On the other hand, receiving multiple responses
+                      only works if there is no timeout in between.
+                      Multiple responses are needed for the blocking
+                      movement commands, e.g.
+                      :meth:`Module.move_pos_blocking`.
+
+        *args, **kwargs
+            All further arguments are forwarded to `serialmanager`.
+
+        See Also
+        --------
+        Module, SerialBus
+
+        Examples
+        --------
+
+        Using PySerial_:
+
+        >>> import serial
+        >>> conn = SerialConnection(0x0B, serial.Serial, port=0,
+        ...                         baudrate=9600, timeout=1)
+
+        """
+        self._id = id
+        self._bus = SerialBus(serialmanager, *args, **kwargs)
+        self._strict = True
+
+    @classmethod
+    def _from_bus(cls, bus, id):
+        self = cls.__new__(cls)
+        self._id = id
+        self._bus = bus
+        self._strict = False
+        return self
+
+    @property
+    def id(self):
+        """Module ID of the Schunk device."""
+        return self._id
+
+    @property
+    def bus(self):
+        """The :class:`SerialBus` this connection is using."""
+        return self._bus
+
+    def connect(self):
+        """Open the serial port and keep it open.
+
+        Until :meth:`close` is called, all coroutines returned by
+        :meth:`open` share this port instead of opening (and closing)
+        it for each message.
+
+        If an error occurs during a message exchange (e.g. a timeout or
+        a CRC error), the input buffer is flushed, so that the next
+        message starts with a clean slate.  If even that fails, the
+        port is re-opened on the next use.
+
+        Instead of calling :meth:`connect` and :meth:`close` manually,
+        the connection can be used as a context manager:
+
+        >>> import serial
+        >>> with SerialConnection(0x0B, serial.Serial, port=0,
+        ...                       baudrate=9600, timeout=1) as conn:
+        ...     mod = Module(conn)
+        ...     est_time = mod.move_pos(42)
+        ...     state = mod.get_state()  # doctest: +SKIP
+
+        If the connection was obtained from :meth:`SerialBus.connection`,
+        this opens (and :meth:`close` closes) the port of the whole bus.
+
+        Returns
+        -------
+        SerialConnection
+            The connection itself.
+
+        """
+        self._bus.connect()
+        return self
+
+    def close(self):
+        """Close the serial port opened with :meth:`connect`.
+
+        This is a no-op if the port is not open.
+
+        """
+        self._bus.close()
+
+    @property
+    def connected(self):
+        """``True`` while the serial port is kept open."""
+        return self._bus.connected
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        """Open a serial connection.
+
+        A coroutine (a.k.a. generator object) is returned which can be
+        used to send and receive one or more data frames.
+
+        Calling ``.send(data)`` on this coroutine creates a serial frame
+        around `data`, sends it to the module and waits for a response.
+
+        `data` must have at least two bytes, D-Len and command code.
+        The (optional) rest are parameters.
+        2 Group/ID bytes are added in the beginning and 2 CRC bytes in
+        the end.  The first byte is always 0x05 (= message from master
+        to module), the second byte holds the module ID.
+
+        When receiving a response, the 2 CRC bytes are checked (and
+        removed), as well as the 2 Group/ID bytes.  Bytes which don't
+        belong to a valid frame are skipped (see :class:`FrameParser`).
+
+        The connection is kept open and the coroutine can be invoked
+        repeatedly to receive further data frames.
+        Use ``.send(None)`` or the built-in ``next()`` function to
+        receive a data frame without sending anything.
+
+        When the desired number of frames has been received, the
+        connection has to be closed with the generator's ``close()``
+        method.  If the port was opened with :meth:`connect`, it stays
+        open, otherwise it is closed as well.
+
+        While the coroutine is open, no other coroutine can use the
+        same :class:`SerialBus`, except while it only waits for an
+        impulse message with the reader thread running (see
+        :meth:`SerialBus.start_reader`).
+
+        Yields
+        ------
+        bytes
+            Response data received from the module, including D-Len and
+            command code.
+
+            If the first byte indicates an error (0x03), the
+            response is returned normally and the error has to be
+            handled in the calling function. Error responses always have
+            a D-Len of 2, i.e. they have 3 bytes: D-Len, command code
+            and error code.
+
+        See Also
+        --------
+        crc16
+
+        """
+        return self._bus._open(self._id, self._strict)
+
+    def stop(self):
+        """Send 2.1.19 CMD STOP (0x91) right away.
+
+        See :meth:`SerialBus.stop`.  This is used by :class:`Module`
+        if a blocking method is interrupted (e.g. with Ctrl-C).
+
+        """
+        return self._bus.stop(self._id)
+
+
+class SerialBus:
+    """A serial bus with one or more Schunk modules.
+
+    For further documentation see the __init__() docstring.
+
+    """
+
+    frame_cache_size = 128
+    """Maximum number of encoded frames which are kept for re-use.
+
+    Frames are cached by module ID, command code and data, so
+    e.g. repeated GET STATE or CMD STOP frames don't have to be
+    encoded again.  This has to be set before the bus is created.
+
+    """
+
+    max_waiting = 32
+    """Maximum number of threads waiting for access to the bus.
+
+    See :class:`BusScheduler`.  This has to be set before the bus is
+    created.
+
+    """
+
+    stop_response_window = 0.5
+    """Time (in seconds) during which responses to :meth:`stop` are dropped.
+
+    Responses to CMD STOP which arrive later are treated like any other
+    late response.
+
+    """
+
+    def __init__(self, serialmanager, *args, **kwargs):
+        """Prepare a serial bus (e.g. RS-485) shared by several modules.
+
+        All modules on the bus share one serial port.
+        Use :meth:`connection` to get a connection for each module ID,
+        which can be used to initialize a :class:`Module`.
+
+        Access to the port is serialized, i.e. only one message
+        exchange can happen at a time (even if several threads are
+        involved).  Waiting threads are served by the priority of
+        their first message, see :attr:`scheduler`.  Received frames
+        are routed to the requesting connection by their module ID
+        byte.  Frames from other modules (e.g. impulse messages) are
+        kept until the next message exchange with the respective
+        module.
+
+        Parameters
+        ----------
+        serialmanager, *args, **kwargs
+            See :class:`SerialConnection`.
+
+        See Also
+        --------
+        SerialConnection
+
+        Examples
+        --------
+
+        >>> import serial
+        >>> with SerialBus(serial.Serial, port=0, baudrate=9600,
+        ...                timeout=1) as bus:
+        ...     axes = [Module(bus.connection(id)) for id in range(1, 7)]
+        ...     for axis in axes:
+        ...         est_time = axis.move_pos(42)  # doctest: +SKIP
+
+        """
+        self._serialmanager = serialmanager
+        self._serial_args = args
+        self._serial_kwargs = kwargs
+        self._persistent = False
+        self._context = None
+        self._serial = None
+        self._lock = BusScheduler(self.max_waiting)
+        self._write_lock = threading.Lock()
+        self._stop_frames = {}
+        self._stops = {}
+        self._pending = {}
+        self._parser = FrameParser()
+        self._encode = functools.lru_cache(self.frame_cache_size)(
+            _serial_frame)
+        self._received = threading.Condition()
+        self._reader = None
+        self._reader_stop = threading.Event()
+        self._reader_error = None
+        self._response_timeout = None
+        self._active = collections.Counter()
+        self._listening = collections.Counter()
+        self._callbacks = {}
+
+    def connection(self, id):
+        """Return a connection to the module with the given ID.
+
+        Parameters
+        ----------
+        id : int
+            Module ID of the Schunk device.
+
+        Returns
+        -------
+        SerialConnection
+            A connection using this bus.
+
+        """
+        return SerialConnection._from_bus(self, id)
+
+    @property
+    def scheduler(self):
+        """The :class:`BusScheduler` which grants access to the bus.
+
+        It can be used to get latency statistics:
+
+        >>> bus = SerialBus(None)
+        >>> bus.scheduler.stats()['high']
+        LatencyStats(count=0, mean=0.0, max=0.0)
+
+        """
+        return self._lock
+
+    def connect(self):
+        """Open the serial port and keep it open.
+
+        See :meth:`SerialConnection.connect`.
+
+        Returns
+        -------
+        SerialBus
+            The bus itself.
+
+        """
+        with self._lock:
+            self._persistent = True
+            if self._serial is None:
+                context = self._serialmanager(*self._serial_args,
+                                              **self._serial_kwargs)
+                serial = context.__enter__()
+                try:
+                    serial.flushInput()
+                except BaseException:
+                    context.__exit__(*sys.exc_info())
+                    raise
+                self._context, self._serial = context, serial
+                self._pending.clear()
+                self._parser.clear()
+                self._stops.clear()
+        return self
+
+    def close(self):
+        """Close the serial port opened with :meth:`connect`.
+
+        If the reader thread is running, it is stopped.
+
+        """
+        self.stop_reader()
+        with self._lock:
+            self._persistent = False
+            self._disconnect()
+
+    def start_reader(self, timeout=None):
+        """Start a thread which continuously receives frames.
+
+        The port is opened (see :meth:`connect`) and a background thread
+        reads all incoming frames and puts them into a queue for each
+        module ID.  Message exchanges (see :meth:`SerialConnection.open`)
+        only write their frames and then wait for their queue.
+
+        Impulse messages and error messages (e.g. CMD POS REACHED) are
+        passed to the callbacks registered with :meth:`add_callback`.
+        They are only queued if a message exchange with the respective
+        module is active at the time.  Responses which were not picked
+        up are discarded when the next message is sent to a module.
+
+        Once a command's response has arrived, an exchange which only
+        waits for an impulse message (e.g. a blocking movement waiting
+        for CMD POS REACHED) releases the bus, so that other modules
+        can be used in the meantime.
+
+        .. note:: The serial port must have a timeout, otherwise the
+                  thread cannot be stopped.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time (in seconds) to wait for a response.  By
+            default, there is no limit.
+
+        Returns
+        -------
+        SerialBus
+            The bus itself.
+
+        """
+        with self._lock:
+            if self._reader is not None:
+                return self
+            self.connect()
+            self._response_timeout = timeout
+            self._reader_error = None
+            self._reader_stop.clear()
+            self._reader = threading.Thread(
+                target=self._read_frames, args=[self._serial],
+                name='schunk-reader')
+            self._reader.daemon = True
+            self._reader.start()
+        return self
+
+    def stop_reader(self):
+        """Stop the thread started with :meth:`start_reader`.
+
+        The port stays open.
+        This is a no-op if the thread is not running.
+
+        """
+        reader = self._reader
+        if reader is None:
+            return
+        self._reader_stop.set()
+        reader.join()
+        with self._received:
+            self._reader = None
+            self._received.notify_all()
+
+    def add_callback(self, callback, id=None):
+        """Register a function to be called on impulse/error messages.
+
+        This only works while the reader thread is running, see
+        :meth:`start_reader`.
+        The callback is called (from the reader thread) with the module
+        ID and a bytearray of D-Len, command code and data, e.g. for
+        2.2.3 CMD POS REACHED (0x94)::
+
+            def callback(module_id, response):
+                if response[1] == 0x94:
+                    position, = struct.unpack_from('<f', response, 2)
+                    ...
+
+        Parameters
+        ----------
+        callback : callable
+            Function to be called.
+        id : int, optional
+            Only messages from this module ID are passed to `callback`.
+            By default, messages from all modules are passed.
+
+        """
+        with self._received:
+            self._callbacks[id] = self._callbacks.get(id, ()) + (callback,)
+
+    def remove_callback(self, callback, id=None):
+        """Remove a function registered with :meth:`add_callback`."""
+        with self._received:
+            callbacks = list(self._callbacks.get(id, ()))
+            callbacks.remove(callback)
+            self._callbacks[id] = tuple(callbacks)
+
+    def broadcast(self, group_id, data):
+        """Send a data frame to all modules of a group.
+
+        The modules with the given group ID (see :attr:`Module.config`)
+        don't send a response, therefore nothing is received.
+
+        Parameters
+        ----------
+        group_id : int
+            Group ID of the modules.
+        data : bytes
+            Data frame (D-Len, command code and parameters).
+
+        See Also
+        --------
+        ModuleGroup
+
+        """
+        with self._lock.request(_frame_priority(data)):
+            if self._reader is not None:
+                self._write(self._serial, group_id, data)
+                return
+            with self._port() as serial:
+                self._write(serial, group_id, data)
+
+    def stop(self, ids=(), group_id=None, trigger=None):
+        """Send 2.1.19 CMD STOP (0x91) right away.
+
+        If the port is open (see :meth:`connect`), the (pre-encoded)
+        frames are written immediately, without waiting for the bus
+        (see :attr:`scheduler`).  An ongoing message exchange is not
+        interrupted, the frames are written between its messages (or
+        during a response, where they might collide on a half-duplex
+        bus).  If the port is not open, it is opened for sending the
+        frames, with the highest priority.
+
+        The responses of the modules are not checked, they are
+        discarded when they are received within
+        :attr:`stop_response_window` (unless a message exchange with
+        the module has sent CMD STOP itself in the meantime).  With
+        several module IDs, the responses are likely to collide,
+        stopping a group (which doesn't respond) is preferable.
+
+        Parameters
+        ----------
+        ids : int or sequence of int, optional
+            Module ID(s).
+        group_id : int, optional
+            Group ID of modules (see :attr:`Module.config`).
+        trigger : float, optional
+            Time (from :func:`time.perf_counter`) of the event which
+            caused the stop.  By default, the time of the call is used.
+
+        Returns
+        -------
+        float
+            Time (in seconds) from `trigger` until all frames were
+            written.
+
+        Examples
+        --------
+
+        >>> with SerialBus(serial.Serial, port=0, baudrate=9600,
+        ...                timeout=1) as bus:  # doctest: +SKIP
+        ...     latency = bus.stop([1, 2, 3])
+
+        """
+        if trigger is None:
+            trigger = time.perf_counter()
+        if isinstance(ids, int):
+            ids = [ids]
+        frames = [self._stop_frame(id) for id in ids]
+        if group_id is not None:
+            frames.append(self._stop_frame(group_id))
+        frames = b''.join(frames)
+        serial = self._serial
+        if serial is not None:
+            deadline = time.monotonic() + self.stop_response_window
+            with self._received:
+                for id in ids:
+                    self._stops[id] = deadline
+            self._write_frame(serial, frames)
+        else:
+            with self._lock.request(BusScheduler.HIGH), \
+                    self._port() as serial:
+                self._write_frame(serial, frames)
+        return time.perf_counter() - trigger
+
+    def sample_all(self, modules, fields=None):
+        """Get the state of several modules in one round.
+
+        2.5.1 GET STATE (0x95) is sent to one module after the other,
+        without other messages in between and without re-opening the
+        port.  The messages cannot be sent all at once, because the
+        responses would collide on the bus.
+
+        Each sample is timestamped (with :func:`time.perf_counter`) at
+        the midpoint between sending the request and receiving the
+        response.
+
+        NumPy_ is needed for this method.
+
+        .. _NumPy: http://www.numpy.org/
+
+        Parameters
+        ----------
+        modules : sequence of int or Module
+            Module IDs, or :class:`Module` objects which use a
+            connection of this bus.
+        fields : sequence of str, optional
+            See :meth:`Module.get_state`.
+
+        Returns
+        -------
+        samples : numpy.ndarray
+            Structured array with one entry per module.  The fields are
+            ``id``, ``rtt`` (round trip time) and those of
+            :attr:`TelemetryRecorder.dtype`.
+        skew : float
+            Time between the first and the last timestamp.
+
+        """
+        import numpy as np
+        ids = []
+        for module in modules:
+            if not isinstance(module, int):
+                connection = module._connection
+                if connection.bus is not self:
+                    raise ValueError("Module is not using this bus")
+                module = connection.id
+            ids.append(module)
+        mode = _state_mode(fields)
+        request = _state_frame(0.0, mode)
+        clock = time.perf_counter
+        received = []
+        with self._lock.request(BusScheduler.MOTION):
+            persistent = self._persistent
+            if not persistent:
+                self.connect()
+            try:
+                for id in ids:
+                    with contextlib.closing(self._open(id, False)) as gen:
+                        start = clock()
+                        response = gen.send(request)
+                        while _is_ignored(response, 0x95):
+                            response = gen.send(None)
+                        received.append((start, clock(), response))
+            finally:
+                if not persistent:
+                    self.close()
+
+        samples = np.zeros(len(ids), [('id', 'u1'), ('rtt', 'f8')] +
+                           TelemetryRecorder.dtype)
+        for index, (id, (start, stop, response)) in enumerate(
+                zip(ids, received)):
+            samples[index] = (id, stop - start, (start + stop) / 2) + \
+                _telemetry_values(_decode_state(response, mode))
+        timestamps = samples['timestamp']
+        skew = timestamps.max() - timestamps.min() if len(ids) else 0.0
+        return samples, skew
+
+    @property
+    def connected(self):
+        """``True`` while the serial port is kept open."""
+        return self._serial is not None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _disconnect(self):
+        context, self._context, self._serial = self._context, None, None
+        if context is not None:
+            context.__exit__(None, None, None)
+
+    @contextlib.contextmanager
+    def _port(self):
+        """Provide the serial port for one call to :meth:`_open`."""
+        if not self._persistent:
+            with self._serialmanager(*self._serial_args,
+                                     **self._serial_kwargs) as serial:
+                serial.flushInput()
+                self._pending.clear()
+                self._parser.clear()
+                self._stops.clear()
+                yield serial
+            return
+        if self._serial is None:
+            self.connect()  # re-open after a failed recovery
+        try:
+            yield self._serial
+        except GeneratorExit:
+            raise
+        except BaseException:
+            # Partially received frames (or late responses after a
+            # timeout) must not confuse the next message exchange:
+            self._parser.clear()
+            self._stops.clear()
+            try:
+                self._serial.flushInput()
+            except Exception:
+                self._disconnect()
+            raise
+
+    @coroutine
+    def _open(self, id, strict):
+        """Coroutine behind :meth:`SerialConnection.open`.
+
+        If `strict` is true, frames from other module IDs are an error,
+        otherwise they are kept for later.
+
+        """
+        if self._reader is not None:
+            return (yield from self._open_queued(id))
+        # The bus is requested with the priority of the first message:
+        next_msg = yield
+        with self._lock.request(_frame_priority(next_msg)), \
+                self._port() as serial:
+            pending = self._pending.setdefault(
+                id, collections.deque(maxlen=_MAX_PENDING_FRAMES))
+            while True:
+                if next_msg is not None:
+                    if pending:
+                        _discard_responses(pending)
+                    self._write(serial, id, next_msg)
+
+                if pending:
+                    response = pending.popleft()
+                else:
+                    while True:
+                        module_id, response = self._receive(serial)
+                        if module_id == id:
+                            break
+                        if strict:
+                            raise SchunkSerialError("Module ID mismatch")
+                        self._pending.setdefault(
+                            module_id,
+                            collections.deque(maxlen=_MAX_PENDING_FRAMES),
+                        ).append(response)
+
+                next_msg = yield response
+                if next_msg is not None and self._persistent:
+                    self._preempt(serial)
+
+    def _open_queued(self, id):
+        """Message exchange while the reader thread is running.
+
+        Once the response to a command is in, waiting for a later
+        impulse message (e.g. CMD POS REACHED) doesn't block the bus.
+
+        """
+        def accept(frame):
+            # While one exchange waits for impulse messages without the
+            # bus, another one may talk to the same module:
+            if frame[1] in _impulse_commands:
+                return not (held and self._listening[id])
+            return held
+
+        next_msg = yield
+        self._lock.acquire(_frame_priority(next_msg))
+        held = True
+        with self._received:
+            pending = self._pending.setdefault(
+                id, collections.deque(maxlen=_MAX_PENDING_FRAMES))
+            self._active[id] += 1
+        try:
+            while True:
+                if next_msg is not None:
+                    with self._received:
+                        if self._listening[id]:
+                            _discard_responses(pending)
+                        else:
+                            pending.clear()  # Discard stale responses
+                    self._write(self._serial, id, next_msg)
+                response = self._wait_for_frame(pending, accept)
+                next_msg = yield response
+                if next_msg is not None:
+                    if held:
+                        self._preempt(self._serial)
+                    else:
+                        with self._received:
+                            self._listening[id] -= 1
+                        self._lock.acquire(_frame_priority(next_msg))
+                        held = True
+                elif held and response[1] not in _impulse_commands and \
+                        response[1] != 0x95:
+                    # Only impulse messages are expected from now on:
+                    with self._received:
+                        self._listening[id] += 1
+                    self._lock.release()
+                    held = False
+        finally:
+            with self._received:
+                if not held:
+                    self._listening[id] -= 1
+                self._active[id] -= 1
+                if not self._active[id]:
+                    del self._active[id]
+                if not self._listening[id]:
+                    del self._listening[id]
+            if held:
+                self._lock.release()
+
+    def _preempt(self, serial):
+        """Let urgent requests use the bus between two exchanges."""
+        if self._lock.preempt() and self._serial is not serial:
+            raise SchunkSerialError("Port was closed by another thread")
+
+    def _wait_for_frame(self, pending, accept=None):
+        """Remove and return the first frame in `pending` (if accepted)."""
+        timeout = self._response_timeout
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        with self._received:
+            while True:
+                for index, frame in enumerate(pending):
+                    if accept is None or accept(frame):
+                        del pending[index]
+                        return frame
+                if self._reader is None or self._reader_error is not None:
+                    raise SchunkSerialError("Reader thread stopped{}".format(
+                        ": {}".format(self._reader_error)
+                        if self._reader_error else ""))
+                if timeout is None:
+                    self._received.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise SchunkSerialError("Error reading response")
+                    self._received.wait(remaining)
+
+    def _write(self, serial, id, data):
+        """Send a data frame (with Group/ID bytes and CRC)."""
+        if data[1] == 0x91 and id in self._stops:
+            # The exchange waits for the response to its own CMD STOP:
+            with self._received:
+                self._stops.pop(id, None)
+        self._write_frame(serial, self._encode(id, bytes(data)))
+
+    def _write_frame(self, serial, frame):
+        # Frames from stop() must not be interleaved with other frames:
+        with self._write_lock:
+            written = serial.write(frame)
+        if written != len(frame):
+            raise SchunkSerialError("Error sending data")
+
+    def _stop_frame(self, id):
+        frame = self._stop_frames.get(id)
+        if frame is None:
+            frame = self._stop_frames[id] = bytes(
+                _serial_frame(id, b'\x01\x91'))
+        return frame
+
+    def _is_stop_response(self, module_id, response):
+        """Check for the response to a frame from stop().
+
+        Only one response per module ID is dropped, and only within
+        :attr:`stop_response_window`.
+        This must be called while holding self._received.
+
+        """
+        if response[1] != 0x91 or module_id not in self._stops:
+            return False
+        return time.monotonic() < self._stops.pop(module_id)
+
+    def _receive(self, serial):
+        """Return module ID and bytearray of the next valid frame."""
+        while True:
+            module_id, response = self._receive_any(serial)
+            if not self._stops:
+                return module_id, response
+            with self._received:
+                if not self._is_stop_response(module_id, response):
+                    return module_id, response
+
+    def _receive_any(self, serial):
+        parser = self._parser
+        while True:
+            frame = parser.next_frame()
+            if frame is not None:
+                module_id, data = frame
+                return module_id, bytearray(data)
+            needed = parser.needed
+            if parser.readfrom(serial) < needed:
+                # Timeout, maybe the incomplete frame is only noise:
+                while parser.resync():
+                    frame = parser.next_frame()
+                    if frame is not None:
+                        module_id, data = frame
+                        return module_id, bytearray(data)
+                raise SchunkSerialError("Error reading response")
+
+    def _read_frames(self, serial):
+        """Target function of the reader thread."""
+        parser = self._parser
+        try:
+            while not self._reader_stop.is_set():
+                if not parser.readfrom(serial) and parser.buffered:
+                    parser.resync()  # Timeout, skip incomplete frame
+                for module_id, data in parser.frames():
+                    self._dispatch(module_id, bytearray(data))
+        except Exception as e:
+            with self._received:
+                self._reader_error = e
+                self._received.notify_all()
+
+    def _dispatch(self, module_id, response):
+        """Pass a received frame to callbacks and/or its queue."""
+        data = bytes(response)  # the queued response may be modified
+        with self._received:
+            if self._is_stop_response(module_id, response):
+                return
+            if response[1] in _impulse_commands:
+                callbacks = (self._callbacks.get(module_id, ()) +
+                             self._callbacks.get(None, ()))
+                queue_it = module_id in self._active
+            else:
+                callbacks = ()
+                queue_it = True
+            if queue_it:
+                self._pending.setdefault(
+                    module_id, collections.deque(maxlen=_MAX_PENDING_FRAMES),
+                ).append(response)
+                self._received.notify_all()
+        for callback in callbacks:
+            try:
+                callback(module_id, bytearray(data))
+            except Exception:
+                sys.excepthook(*sys.exc_info())
+
+
+# Impulse messages and error messages may arrive at any time:
+# 0x88: CMD ERROR, 0x89: CMD WARNING, 0x8A: CMD INFO,
+# 0x93: CMD MOVE BLOCKED, 0x94: CMD POS REACHED
+_impulse_commands = frozenset([0x88, 0x89, 0x8A, 0x93, 0x94])
+
+
+def _discard_responses(pending):
+    """Remove stale responses from a queue, keep impulse/error messages."""
+    frames = [frame for frame in pending if frame[1] in _impulse_commands]
+    pending.clear()
+    pending.extend(frames)
+
+
+# Frames from modules which are not currently talked to are kept up to this
+# number (per module ID), older ones are dropped:
+_MAX_PENDING_FRAMES = 16
+
+
+class BusScheduler:
+    """Grant access to a bus by priority.
+
+    For further documentation see the __init__() docstring.
+
+    """
+
+    HIGH = 0
+    """Priority of CMD STOP, CMD EMERGENCY STOP and CMD ACK."""
+
+    MOTION = 1
+    """Priority of movements, target values and GET STATE."""
+
+    LOW = 2
+    """Priority of everything else (e.g. configuration)."""
+
+    _names = 'high', 'motion', 'low'
+
+    def __init__(self, max_waiting=32, clock=time.perf_counter):
+        """A re-entrant lock which serves waiting threads by priority.
+
+        Each :class:`SerialBus` has one of these (see
+        :attr:`SerialBus.scheduler`), it is normally not necessary to
+        create one manually.
+
+        A message exchange requests the bus with the priority of its
+        first message (see :attr:`HIGH`, :attr:`MOTION` and
+        :attr:`LOW`).  When the bus becomes free, the waiting thread
+        with the highest priority gets it, threads with the same
+        priority are served in order.
+
+        A thread which holds the bus for several exchanges (see
+        :meth:`preempt`) lets waiting :attr:`HIGH` priority requests
+        go first in between.  Exchanges are never interrupted.
+
+        Parameters
+        ----------
+        max_waiting : int, optional
+            If this many threads are waiting, further requests (except
+            :attr:`HIGH` priority ones) raise a :class:`SchunkError`.
+        clock : callable, optional
+            Used for measuring the waiting time.
+
+        """
+        self._max_waiting = max_waiting
+        self._clock = clock
+        self._cond = threading.Condition(threading.Lock())
+        self._owner = None
+        self._count = 0
+        self._waiting = []  # heap of (priority, sequence number)
+        self._sequence = itertools.count()
+        self._stats = [[0, 0.0, 0.0] for _ in self._names]
+
+    def acquire(self, priority=LOW):
+        """Wait until the bus is free, then take it.
+
+        If the calling thread already holds the bus, it is taken once
+        more (and has to be released once more).
+
+        Parameters
+        ----------
+        priority : int, optional
+            :attr:`HIGH`, :attr:`MOTION` or :attr:`LOW`.
+
+        """
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._count += 1
+                return
+            start = self._clock()
+            if self._owner is not None or self._waiting:
+                if (len(self._waiting) >= self._max_waiting and
+                        priority != self.HIGH):
+                    raise SchunkError("Too many requests waiting for bus")
+                self._wait_for_turn(priority)
+            self._owner, self._count = me, 1
+            stats = self._stats[priority]
+            waited = self._clock() - start
+            stats[0] += 1
+            stats[1] += waited
+            stats[2] = max(stats[2], waited)
+
+    def release(self):
+        """Release the bus (once)."""
+        with self._cond:
+            if self._owner != threading.get_ident():
+                raise RuntimeError("Bus is not held by this thread")
+            self._count -= 1
+            if not self._count:
+                self._owner = None
+                self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def request(self, priority):
+        """Context manager for :meth:`acquire` and :meth:`release`."""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def preempt(self):
+        """Let waiting :attr:`HIGH` priority requests go first.
+
+        This must only be called by the thread holding the bus, between
+        two message exchanges.  If the bus was taken more than once
+        (i.e. the calling thread wants to keep it for a series of
+        exchanges), nothing happens.
+
+        Returns
+        -------
+        bool
+            Whether the bus was released in the meantime.
+
+        """
+        with self._cond:
+            if (self._count != 1 or not self._waiting or
+                    self._waiting[0][0] != self.HIGH):
+                return False
+            me = self._owner
+            self._owner = None
+            self._cond.notify_all()
+            self._wait_for_turn(self.HIGH)
+            self._owner, self._count = me, 1
+            return True
+
+    def stats(self):
+        """Return the time spent waiting for the bus, per priority.
+
+        Returns
+        -------
+        dict
+            Maps ``'high'``, ``'motion'`` and ``'low'`` to
+            ``LatencyStats(count, mean, max)`` (in seconds).
+
+        """
+        with self._cond:
+            return {
+                name: LatencyStats(count, total / count if count else 0.0,
+                                   maximum)
+                for name, (count, total, maximum)
+                in zip(self._names, self._stats)}
+
+    def reset_stats(self):
+        """Start collecting :meth:`stats` from scratch."""
+        with self._cond:
+            self._stats = [[0, 0.0, 0.0] for _ in self._names]
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *args):
+        self.release()
+
+    def _is_owned(self):
+        return self._owner == threading.get_ident()
+
+    def _wait_for_turn(self, priority):
+        entry = priority, next(self._sequence)
+        heapq.heappush(self._waiting, entry)
+        try:
+            self._cond.wait_for(
+                lambda: self._owner is None and self._waiting[0] == entry)
+        except BaseException:
+            self._waiting.remove(entry)
+            heapq.heapify(self._waiting)
+            self._cond.notify_all()
+            raise
+        heapq.heappop(self._waiting)
+
+
+LatencyStats = collections.namedtuple('LatencyStats', 'count mean max')
+
+# 0x90: CMD EMERGENCY STOP, 0x91: CMD STOP, 0x8B: CMD ACK
+# 0xA0-0xA4: SET TARGET *, 0xB0-0xB9: MOVE *, 0x92: CMD REFERENCE,
+# 0x95: GET STATE
+_command_priorities = dict.fromkeys([0x90, 0x91, 0x8B], BusScheduler.HIGH)
+_command_priorities.update(dict.fromkeys(
+    [0x92, 0x95, 0xA0, 0xA1, 0xA2, 0xA3, 0xA4,
+     0xB0, 0xB1, 0xB3, 0xB5, 0xB7, 0xB8, 0xB9], BusScheduler.MOTION))
+
+
+def _frame_priority(data):
+    """Get the priority of a data frame (D-Len, command code, ...)."""
+    if data is None:
+        return BusScheduler.MOTION  # e.g. waiting for CMD POS REACHED
+    return _command_priorities.get(data[1], BusScheduler.LOW)
+
+
+def _serial_frame(id, data):
+    """Add Group/ID bytes and CRC to a data frame."""
+    frame = bytearray()
+    frame.append(0x05)
+    frame.append(id)
+    frame.extend(data)
+    frame.extend(_crc16_struct.pack(
+        crc16_update(_crc16_prefix(0x05, id), data)))
+    return bytes(frame)
+
+
+class FrameParser:
+    """Incremental parser for serial frames received from Schunk modules.
+
+    For further documentation see the __init__() docstring.
+
+    """
+
+    def __init__(self, size=4096):
+        """Create a parser for a stream of serial frames.
+
+        Received bytes are stored in a pre-allocated buffer, either by
+        :meth:`readfrom` (which reads directly into the buffer) or by
+        :meth:`feed`.
+        Complete frames are obtained from :meth:`next_frame` (or by
+        iterating over :meth:`frames`) as :class:`memoryview` slices of
+        this buffer, i.e. without copying.  When the end of the buffer
+        is reached, the (incomplete) rest is moved to its beginning.
+
+        Bytes which don't belong to a valid frame (because of an
+        unexpected message type or a wrong CRC) are skipped, the
+        parser re-synchronizes on the next valid frame.
+
+        Parameters
+        ----------
+        size : int, optional
+            Size of the buffer.  It must be able to hold at least one
+            frame of maximum length (260 bytes).
+
+        """
+        if size < _MAX_FRAME_SIZE:
+            raise ValueError("Buffer size must be at least {}".format(
+                _MAX_FRAME_SIZE))
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # first byte which is not yet parsed
+        self._end = 0  # end of received data
+        self.discarded = 0
+        """Number of bytes which were skipped so far."""
+
+    @property
+    def buffered(self):
+        """Number of received bytes which were not yet parsed."""
+        return self._end - self._start
+
+    @property
+    def needed(self):
+        """Number of bytes which are (at least) missing for a frame."""
+        available = self._end - self._start
+        if available < 3:
+            return 3 - available
+        dlen = self._buffer[self._start + 2]
+        return max(dlen + 5 - available, 0)
+
+    def readfrom(self, serial):
+        """Read bytes from `serial` into the buffer.
+
+        At least :attr:`needed` bytes are requested (which blocks until
+        they arrive or until the timeout of `serial` expires).
+        If `serial` has an ``in_waiting`` attribute (like PySerial_),
+        all bytes which are available are read.
+        If `serial` has a ``readinto()`` method, it is used to avoid
+        copying.
+
+        Returns
+        -------
+        int
+            The number of bytes read.
+
+        """
+        count = max(self.needed, getattr(serial, 'in_waiting', 0), 1)
+        chunk = self._reserve(count)
+        readinto = getattr(serial, 'readinto', None)
+        if readinto is not None:
+            count = readinto(chunk) or 0
+        else:
+            data = serial.read(len(chunk))
+            count = len(data)
+            chunk[:count] = data
+        self._end += count
+        return count
+
+    def feed(self, data):
+        """Append `data` (bytes-like) to the buffer.
+
+        Raises
+        ------
+        ValueError
+            If the buffer is full.  This doesn't happen if all frames
+            are obtained (see :meth:`next_frame`) after each call and
+            if `data` is not larger than the buffer size minus 260.
+
+        """
+        data = memoryview(data)
+        chunk = self._reserve(len(data))
+        if len(chunk) < len(data):
+            raise ValueError("Not enough space in buffer")
+        chunk[:] = data
+        self._end += len(data)
+
+    def next_frame(self):
+        """Return the next complete frame.
+
+        Returns
+        -------
+        (int, memoryview) or None
+            The module ID and D-Len, command code and data (with
+            Group/ID bytes and CRC removed).  The memoryview is only
+            valid until the next call to :meth:`readfrom` or
+            :meth:`feed`.
+            If no complete frame is available, ``None`` is returned.
+
+        """
+        buffer = self._buffer
+        while self._end - self._start >= 3:
+            start = self._start
+            msg_type = buffer[start]
+            dlen = buffer[start + 2]
+            # Error messages (0x03) always have a D-Len of 2:
+            if not (msg_type == 0x07 or msg_type == 0x03 and dlen == 2):
+                self._skip()
+                continue
+            end = start + dlen + 5
+            if end > self._end:
+                return None
+            crc = crc16_update(_crc16_prefix(msg_type, buffer[start + 1]),
+                               self._view[start + 2:end])
+            if crc != 0:  # The CRC is included, see crc16_check()
+                self._skip()
+                continue
+            self._start = end
+            return buffer[start + 1], self._view[start + 2:end - 2]
+        return None
+
+    def frames(self):
+        """Iterate over all complete frames, see :meth:`next_frame`."""
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def resync(self):
+        """Skip the first byte of an incomplete frame.
+
+        This can be used after a timeout, in case the incomplete frame
+        is in fact only noise.
+
+        Returns
+        -------
+        bool
+            ``True`` if there are further bytes in the buffer.
+
+        """
+        if self._start < self._end:
+            self._skip()
+        return self._start < self._end
+
+    def clear(self):
+        """Discard all bytes in the buffer."""
+        self._start = self._end = 0
+
+    def _skip(self):
+        self._start += 1
+        self.discarded += 1
+
+    def _reserve(self, count):
+        """Return a writable view of (at most) `count` bytes at the end."""
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif self._end + count > len(self._buffer):
+            # Move incomplete frame to the beginning of the buffer:
+            remaining = self._end - self._start
+            self._buffer[:remaining] = bytes(self._view[self._start:self._end])
+            self._start, self._end = 0, remaining
+        return self._view[self._end:min(self._end + count, len(self._buffer))]
+
+
+# Group/ID bytes, D-Len, up to 255 bytes command code and data, CRC:
+_MAX_FRAME_SIZE = 2 + 1 + 255 + 2
+
+
+class SelectorLoop:
+    """Serve several serial ports from one thread.
+
+    For further documentation see the __init__() docstring.
+
+    """
+
+    def __init__(self, timeout=1.0, selector=None):
+        """Prepare an event loop for several buses (e.g. RS-485).
+
+        Instead of blocking reads (which need at least one thread per
+        port, see :class:`SerialBus`), the file descriptors of all
+        ports are switched to non-blocking mode and watched with a
+        :mod:`selectors` selector (e.g. epoll).  Received bytes are
+        parsed per port (see :class:`FrameParser`) and complete frames
+        are dispatched to the waiting requests.
+
+        Ports are added with :meth:`add_port`.  Requests are sent with
+        :meth:`submit` (which returns a :class:`concurrent.futures.Future`)
+        or via :meth:`connection`, which can be used to initialize a
+        :class:`Module`.  There is only one outstanding request per
+        port, further requests are queued until the response arrives
+        (or the timeout expires).  Frames from other modules, and
+        impulse messages which are not the response to the current
+        request, are kept until they are requested.
+
+        The loop runs in a background thread (see :meth:`start`) or is
+        driven manually with :meth:`run_once`.  All other methods can
+        be called from any thread.
+
+        This only works on POSIX systems.
+
+        >>> ports = [serial.Serial(name, baudrate=9600)
+        ...          for name in names]  # doctest: +SKIP
+        >>> with SelectorLoop() as loop:  # doctest: +SKIP
+        ...     axes = []
+        ...     for port in ports:
+        ...         loop.add_port(port)
+        ...         axes.extend(Module(loop.connection(port, id))
+        ...                     for id in range(1, 7))
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time (in seconds) to wait for a response.
+            ``None`` means no limit.
+        selector : selectors.BaseSelector, optional
+            By default, :class:`selectors.DefaultSelector` is used.
+
+        """
+        self.timeout = timeout
+        self._selector = selector or selectors.DefaultSelector()
+        self._ports = {}
+        self._calls = collections.deque()
+        self._wakeup, self._wakeup_writer = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._wakeup_writer.setblocking(False)
+        self._selector.register(self._wakeup, selectors.EVENT_READ)
+        self._thread = None
+        self._thread_ident = None
+        self._stopping = False
+        self._closed = False
+
+    def add_port(self, port):
+        """Add a serial port to the loop.
+
+        Parameters
+        ----------
+        port
+            An open port with a ``fileno()`` method, e.g. a
+            ``serial.Serial`` object from PySerial_.  Its file
+            descriptor is switched to non-blocking mode.  The port is
+            not closed by the loop.
+
+        """
+        fd = port.fileno()
+        os.set_blocking(fd, False)
+        self._call_soon(self._add_port, port, fd)
+
+    def remove_port(self, port):
+        """Remove a port, outstanding requests fail."""
+        self._call_soon(self._remove_port, port,
+                        SchunkSerialError("Port was removed"))
+
+    def submit(self, port, id, data):
+        """Send a data frame and return a future for the response.
+
+        Parameters
+        ----------
+        port
+            A port added with :meth:`add_port`.
+        id : int
+            Module ID.
+        data : bytes or None
+            Data frame (D-Len, command code and parameters), see
+            :meth:`SerialConnection.open`.  If ``None``, nothing is
+            sent and the next frame from `id` is received.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to a bytearray of D-Len, command code and data.
+            On timeout, :exc:`SchunkSerialError` is set.
+
+        """
+        future = concurrent.futures.Future()
+        if data is None:
+            self._call_soon(self._listen, port, id, future)
+        else:
+            frame = bytes(_serial_frame(id, bytes(data)))
+            self._call_soon(self._request, port, id, data[1], frame, future)
+        return future
+
+    def connection(self, port, id):
+        """Return a connection to a module on the given port.
+
+        The connection can be used to initialize a :class:`Module`.
+        Its methods block the calling thread (which must not be the
+        thread of the loop) until the response arrives.
+
+        Parameters
+        ----------
+        port
+            A port added with :meth:`add_port`.
+        id : int
+            Module ID.
+
+        """
+        return _SelectorConnection(self, port, id)
+
+    def start(self):
+        """Run the loop in a background thread.
+
+        Returns
+        -------
+        SelectorLoop
+            The loop itself.
+
+        """
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run_forever, name='schunk-selector')
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def close(self):
+        """Stop the thread (if running) and fail outstanding requests."""
+        if self._closed:
+            return
+        thread = self._thread
+        if thread is not None:
+            self._stopping = True
+            self._wake()
+            thread.join()
+            self._thread = None
+        self._run_calls()
+        for port in list(self._ports):
+            self._remove_port(port, SchunkSerialError("Loop was closed"))
+        self._closed = True
+        self._selector.close()
+        self._wakeup.close()
+        self._wakeup_writer.close()
+
+    def run_once(self, timeout=None):
+        """Wait for events (at most `timeout` seconds) and handle them.
+
+        This must not be used while the thread from :meth:`start` is
+        running.
+
+        """
+        self._run_calls()
+        wait = self._next_deadline()
+        if wait is not None:
+            wait = max(wait - time.monotonic(), 0)
+            if timeout is not None:
+                wait = min(wait, timeout)
+        else:
+            wait = timeout
+        for key, events in self._selector.select(wait):
+            state = key.data
+            if state is None:
+                self._drain_wakeup()
+                continue
+            if events & selectors.EVENT_WRITE:
+                self._flush(state)
+            if events & selectors.EVENT_READ:
+                self._read(state)
+        self._run_calls()
+        self._check_deadlines(time.monotonic())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run_forever(self):
+        self._thread_ident = threading.get_ident()
+        while not self._stopping:
+            self.run_once()
+
+    def _call_soon(self, func, *args):
+        if self._closed:
+            raise SchunkError("Loop is closed")
+        self._calls.append((func, args))
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wakeup_writer.send(b'\x00')
+        except BlockingIOError:
+            pass  # the loop will wake up anyway
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _run_calls(self):
+        calls = self._calls
+        while calls:
+            func, args = calls.popleft()
+            func(*args)
+
+    def _add_port(self, port, fd):
+        if port in self._ports:
+            return
+        state = _SelectorPort(port, fd)
+        self._ports[port] = state
+        self._selector.register(fd, selectors.EVENT_READ, state)
+
+    def _remove_port(self, port, error):
+        state = self._ports.pop(port, None)
+        if state is None:
+            return
+        self._selector.unregister(state.fd)
+        if state.current is not None:
+            _set_future(state.current[2].set_exception, error)
+        for _, _, _, future in state.queue:
+            _set_future(future.set_exception, error)
+        for listeners in state.listeners.values():
+            for future, _ in listeners:
+                _set_future(future.set_exception, error)
+
+    def _state(self, port, future):
+        state = self._ports.get(port)
+        if state is None:
+            _set_future(future.set_exception,
+                        ValueError("Port was not added to the loop"))
+        return state
+
+    def _request(self, port, id, command, frame, future):
+        state = self._state(port, future)
+        if state is not None:
+            state.queue.append((id, command, frame, future))
+            self._start_next(state)
+
+    def _listen(self, port, id, future):
+        state = self._state(port, future)
+        if state is None:
+            return
+        pending = state.pending.get(id)
+        if pending:
+            _set_future(future.set_result, pending.popleft())
+            return
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.monotonic() + self.timeout
+        state.listeners.setdefault(id, collections.deque()).append(
+            (future, deadline))
+
+    def _start_next(self, state):
+        """Write the next queued request if there is none outstanding."""
+        while state.current is None and state.queue:
+            id, command, frame, future = state.queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            pending = state.pending.get(id)
+            if pending:
+                _discard_responses(pending)
+            state.current = id, command, future
+            state.output = frame
+            self._flush(state)
+
+    def _flush(self, state):
+        """Write (the rest of) the current request."""
+        try:
+            written = os.write(state.fd, state.output)
+        except BlockingIOError:
+            written = 0
+        except OSError as e:
+            self._fail_current(state, SchunkSerialError(
+                "Error sending data: {}".format(e)))
+            return
+        state.output = state.output[written:]
+        if state.output:
+            events = selectors.EVENT_READ | selectors.EVENT_WRITE
+        else:
+            events = selectors.EVENT_READ
+            if self.timeout is not None:
+                state.deadline = time.monotonic() + self.timeout
+        if state.events != events:
+            self._selector.modify(state.fd, events, state)
+            state.events = events
+
+    def _read(self, state):
+        reader = state.reader
+        try:
+            state.parser.readfrom(reader)
+        except OSError as e:
+            self._remove_port(state.port, SchunkSerialError(
+                "Error reading response: {}".format(e)))
+            return
+        if reader.eof:
+            self._remove_port(state.port, SchunkSerialError(
+                "Port was closed"))
+            return
+        for module_id, data in state.parser.frames():
+            self._dispatch(state, module_id, bytearray(data))
+
+    def _dispatch(self, state, module_id, response):
+        """Pass a received frame to its request or keep it."""
+        current = state.current
+        if current is not None and current[0] == module_id:
+            if not _is_ignored(response, current[1]):
+                state.current = state.deadline = None
+                _set_future(current[2].set_result, response)
+                self._start_next(state)
+                return
+            if response[1] not in _impulse_commands:
+                return  # Late state after stream_state()
+            # e.g. CMD POS REACHED for another thread
+        listeners = state.listeners.get(module_id)
+        while listeners:
+            future, _ = listeners.popleft()
+            if _set_future(future.set_result, response):
+                return
+        state.pending.setdefault(
+            module_id, collections.deque(maxlen=_MAX_PENDING_FRAMES),
+        ).append(response)
+
+    def _fail_current(self, state, error):
+        future = state.current[2]
+        state.current = state.deadline = None
+        state.output = b''
+        # Partially received frames must not confuse the next request:
+        state.parser.clear()
+        _set_future(future.set_exception, error)
+        self._start_next(state)
+
+    def _next_deadline(self):
+        deadlines = []
+        for state in self._ports.values():
+            if state.deadline is not None:
+                deadlines.append(state.deadline)
+            for listeners in state.listeners.values():
+                deadlines.extend(deadline for _, deadline in listeners
+                                 if deadline is not None)
+        return min(deadlines) if deadlines else None
+
+    def _check_deadlines(self, now):
+        for state in list(self._ports.values()):
+            if state.deadline is not None and state.deadline <= now:
+                self._fail_current(state, SchunkSerialError(
+                    "Error reading response"))
+            for listeners in state.listeners.values():
+                while (listeners and listeners[0][1] is not None and
+                       listeners[0][1] <= now):
+                    future, _ = listeners.popleft()
+                    _set_future(future.set_exception, SchunkSerialError(
+                        "Error reading response"))
+
+
+class _SelectorPort:
+    """State of one port of a SelectorLoop."""
+
+    def __init__(self, port, fd):
+        self.port = port
+        self.fd = fd
+        self.reader = _NonBlockingReader(fd)
+        self.parser = FrameParser()
+        self.events = selectors.EVENT_READ
+        self.queue = collections.deque()  # (id, command, frame, future)
+        self.current = None  # (id, command, future)
+        self.output = b''  # unwritten rest of the current frame
+        self.deadline = None  # for the response to the current frame
+        self.pending = {}  # module ID -> frames
+        self.listeners = {}  # module ID -> (future, deadline)
+
+
+class _NonBlockingReader:
+    """Adapter for FrameParser.readfrom() on a non-blocking file."""
+
+    in_waiting = 1024  # read as much as possible
+
+    def __init__(self, fd):
+        self._fd = fd
+        self.eof = False
+
+    def readinto(self, buffer):
+        try:
+            count = os.readv(self._fd, [buffer])
+        except BlockingIOError:
+            return 0
+        if not count:
+            self.eof = True
+        return count
+
+
+class _SelectorConnection:
+    """Connection to one module on a port of a SelectorLoop."""
+
+    def __init__(self, loop, port, id):
+        self._loop = loop
+        self._port = port
+        self._id = id
+
+    @property
+    def id(self):
+        """Module ID of the Schunk device."""
+        return self._id
+
+    @coroutine
+    def open(self):
+        """See :meth:`SerialConnection.open`."""
+        loop = self._loop
+        if loop._thread_ident == threading.get_ident():
+            raise SchunkError("Blocking call from the thread of the loop")
+        response = None
+        while True:
+            data = yield response
+            future = loop.submit(self._port, self._id, data)
+            try:
+                response = future.result()
+            except BaseException:
+                future.cancel()
+                raise
+
+
+def _set_future(method, value):
+    """Resolve a future, return False if it was already done."""
+    try:
+        method(value)
+    except _InvalidStateError:
+        return False  # e.g. cancelled
+    return True
 
-        >>> import serial
-        >>> conn = SerialConnection(0x0B, serial.Serial, port=0,
-        ...                         baudrate=9600, timeout=1)
+
+class AsyncSerialConnection:
+    """A serial connection for use with :mod:`asyncio`.
+
+    For further documentation see the __init__() docstring.
+
+    """
+
+    def __init__(self, id, opener, *args, **kwargs):
+        """Prepare a serial connection for use with asyncio.
+
+        This can be used to initialize an :class:`AsyncModule`.
+        It uses the same framing as :class:`SerialConnection`.
+
+        Parameters
+        ----------
+        id : int
+            Module ID of the Schunk device.
+
+        opener
+            A coroutine function (to be called with ``*args`` and
+            ``**kwargs``) that returns a ``(reader, writer)`` pair of
+            :class:`asyncio.StreamReader` and
+            :class:`asyncio.StreamWriter` (or anything with a similar
+            API).
+
+            This is typically ``serial_asyncio.open_serial_connection``
+            from pySerial-asyncio_, but e.g.
+            :func:`asyncio.open_connection` can also be used to talk to
+            a serial device server.
+
+            .. _pySerial-asyncio:
+               https://pyserial-asyncio.readthedocs.io/
+
+        *args, **kwargs
+            All further arguments are forwarded to `opener`.
+
+        See Also
+        --------
+        AsyncModule, AsyncSerialBus, SerialConnection
 
         """
         self._id = id
-        self._serialmanager = serialmanager
-        self._serial_args = args
-        self._serial_kwargs = kwargs
+        self._bus = AsyncSerialBus(opener, *args, **kwargs)
+        self._strict = True
+
+    @classmethod
+    def _from_bus(cls, bus, id):
+        self = cls.__new__(cls)
+        self._id = id
+        self._bus = bus
+        self._strict = False
+        return self
+
+    @property
+    def id(self):
+        """Module ID of the Schunk device."""
+        return self._id
+
+    @property
+    def bus(self):
+        """The :class:`AsyncSerialBus` this connection is using."""
+        return self._bus
+
+    async def connect(self):
+        """Open the connection and keep it open.
+
+        See :meth:`SerialConnection.connect`.  If an error occurs (or a
+        coroutine is cancelled) during a message exchange, the
+        connection is re-opened on the next use.
+
+        Instead of using :meth:`connect` and :meth:`close`, the
+        connection can be used with ``async with``.
+
+        """
+        await self._bus.connect()
+        return self
+
+    async def close(self):
+        """Close the connection opened with :meth:`connect`."""
+        await self._bus.close()
+
+    @property
+    def connected(self):
+        """``True`` while the connection is kept open."""
+        return self._bus.connected
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *args):
+        await self.close()
 
-    @coroutine
     def open(self):
-        """Open a serial connection.
+        """Start a message exchange.
 
-        A coroutine (a.k.a. generator object) is returned which can be
-        used to send and receive one or more data frames.
+        An asynchronous context manager is returned, which provides an
+        object with the coroutine methods ``send(data)`` and
+        ``receive()``.
 
-        Calling ``.send(data)`` on this coroutine creates a serial frame
-        around `data`, sends it to the module and waits for a response.
+        ``send(data)`` creates a serial frame around `data` (see
+        :meth:`SerialConnection.open`), sends it to the module and
+        returns the response.
+        ``receive()`` returns the next response without sending
+        anything.
 
-        `data` must have at least two bytes, D-Len and command code.
-        The (optional) rest are parameters.
-        2 Group/ID bytes are added in the beginning and 2 CRC bytes in
-        the end.  The first byte is always 0x05 (= message from master
-        to module), the second byte holds the module ID.
+        While the context manager is active, no other message exchange
+        can happen on the same :class:`AsyncSerialBus`.  With a
+        persistent connection (see :meth:`connect`), there is one
+        exception: once a command's response has arrived, waiting for
+        an impulse message (e.g. CMD POS REACHED of a blocking
+        movement) with ``receive()`` lets other exchanges use the bus.
 
-        When receiving a response, the 2 CRC bytes are checked (and
-        removed), as well as the 2 Group/ID bytes.
+        """
+        return self._bus._open(self._id, self._strict)
 
-        The connection is kept open and the coroutine can be invoked
-        repeatedly to receive further data frames.
-        Use ``.send(None)`` or the built-in ``next()`` function to
-        receive a data frame without sending anything.
 
-        When the desired number of frames has been received, the
-        connection has to be closed with the generator's ``close()``
-        method.
+class AsyncSerialBus:
+    """A serial bus with one or more Schunk modules, using asyncio.
 
-        Yields
-        ------
-        bytes
-            Response data received from the module, including D-Len and
-            command code.
+    For further documentation see the __init__() docstring.
 
-            If the first byte indicates an error (0x03), the
-            response is returned normally and the error has to be
-            handled in the calling function. Error responses always have
-            a D-Len of 2, i.e. they have 3 bytes: D-Len, command code
-            and error code.
+    """
 
-        See Also
-        --------
-        crc16
+    frame_cache_size = SerialBus.frame_cache_size
+    """See :attr:`SerialBus.frame_cache_size`."""
+
+    def __init__(self, opener, *args, **kwargs):
+        """Prepare a serial bus shared by several modules.
+
+        This is the :mod:`asyncio` equivalent of :class:`SerialBus`.
+        Use :meth:`connection` to get a connection for each module ID,
+        which can be used to initialize an :class:`AsyncModule`.
+
+        Parameters
+        ----------
+        opener, *args, **kwargs
+            See :class:`AsyncSerialConnection`.
 
         """
-        response = None
-        with self._serialmanager(*self._serial_args,
-                                 **self._serial_kwargs) as serial:
-            serial.flushInput()
-            while True:
-                next_msg = yield response
+        self._opener = opener
+        self._args = args
+        self._kwargs = kwargs
+        self._persistent = False
+        self._streams = None
+        self._lock = None
+        self._arrived = None
+        self._reading = False
+        self._listening = collections.Counter()
+        self._pending = {}
+        self._parser = FrameParser()
+        self._encode = functools.lru_cache(self.frame_cache_size)(
+            _serial_frame)
+
+    def connection(self, id):
+        """Return a connection to the module with the given ID.
 
-                if next_msg is not None:
-                    frame = bytearray()
-                    frame.append(0x05)
-                    frame.append(self._id)
-                    frame.extend(next_msg)
-                    frame.extend(crc16(frame))
-                    if serial.write(frame) != len(frame):
-                        raise SchunkSerialError("Error sending data")
-
-                response = serial.read(3)
-                if len(response) < 3:
-                    raise SchunkSerialError("Error reading response")
-                response = bytearray(response)
-                msg_type, module_id, dlen = response
-                if module_id != self._id:
-                    raise SchunkSerialError("Module ID mismatch")
-                elif msg_type not in (0x03, 0x07):
-                    raise SchunkSerialError(
-                        "Unexpected message type in response: "
-                        "0x{:02X}".format(msg_type))
-                crclen = 2
-                the_rest = serial.read(dlen + crclen)
-                if len(the_rest) < dlen + crclen:
-                    raise SchunkSerialError("Not enough data in response")
-                response.extend(the_rest)
-                crc = response[-crclen:]
-                del response[-crclen:]  # Remove CRC
-                if crc != crc16(response):
-                    raise SchunkSerialError("CRC error in response")
-                del response[:2]  # Remove first 2 bytes, leaving dlen intact
-
-                if msg_type == 0x03 and dlen != 2:
-                    # This should never happen, but who knows ...
-                    raise SchunkSerialError(
-                        "Message type 0x03, D-Len {}, data: {}".format(
-                            dlen, the_rest))
-
-                # Note: error checking (if dlen == 2) is not done here
+        Returns
+        -------
+        AsyncSerialConnection
+            A connection using this bus.
+
+        """
+        return AsyncSerialConnection._from_bus(self, id)
+
+    async def connect(self):
+        """Open the connection and keep it open.
+
+        See :meth:`AsyncSerialConnection.connect`.
+
+        """
+        self._persistent = True
+        if self._streams is None:
+            self._streams = await self._opener(*self._args, **self._kwargs)
+            self._pending.clear()
+            self._parser.clear()
+        return self
+
+    async def close(self):
+        """Close the connection opened with :meth:`connect`."""
+        self._persistent = False
+        self._disconnect()
+
+    @property
+    def connected(self):
+        """``True`` while the connection is kept open."""
+        return self._streams is not None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def _disconnect(self):
+        streams, self._streams = self._streams, None
+        if streams is not None:
+            reader, writer = streams
+            writer.close()
+
+    def _open(self, id, strict):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+            self._arrived = asyncio.Condition()
+        return _AsyncExchange(self, id, strict)
+
+
+class _AsyncExchange:
+    """Helper class for AsyncSerialConnection.open()."""
+
+    def __init__(self, bus, id, strict):
+        self._bus = bus
+        self._id = id
+        self._strict = strict
+        self._streams = None
+        self._held = False  # whether the bus lock is held
+        self._answered = False  # whether only impulses are expected
+
+    async def __aenter__(self):
+        bus = self._bus
+        await self._acquire()
+        if not bus._persistent:
+            bus._pending.clear()
+            bus._parser.clear()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        bus = self._bus
+        try:
+            if not bus._persistent:
+                reader, writer = self._streams
+                writer.close()
+            elif (exc_type is not None and self._streams is bus._streams
+                  and (self._held or self._is_alone())):
+                # The stream may contain the rest of a frame:
+                bus._disconnect()
+        finally:
+            self._streams = None
+            if self._held:
+                self._held = False
+                bus._lock.release()
+            else:
+                self._stop_listening()
+
+    async def _acquire(self):
+        bus = self._bus
+        await bus._lock.acquire()
+        try:
+            if bus._persistent:
+                if bus._streams is None:
+                    await bus.connect()  # re-open after an error
+                self._streams = bus._streams
+            elif self._streams is None:
+                self._streams = await bus._opener(*bus._args, **bus._kwargs)
+        except BaseException:
+            bus._lock.release()
+            raise
+        self._held = True
+
+    def _is_alone(self):
+        """Check if no other exchange is using the bus."""
+        bus = self._bus
+        return not bus._lock.locked() and sum(bus._listening.values()) == 1
+
+    def _stop_listening(self):
+        listening = self._bus._listening
+        listening[self._id] -= 1
+        if not listening[self._id]:
+            del listening[self._id]
+
+    async def send(self, data):
+        """Send a data frame, return the response."""
+        bus = self._bus
+        if not self._held:
+            self._stop_listening()
+            await self._acquire()
+        pending = bus._pending.get(self._id)
+        if pending:
+            if bus._listening[self._id]:
+                _discard_responses(pending)
+            else:
+                pending.clear()  # Discard stale responses
+        reader, writer = self._streams
+        writer.write(bus._encode(self._id, bytes(data)))
+        await writer.drain()
+        self._answered = False
+        return await self.receive()
+
+    async def receive(self):
+        """Return the next response."""
+        bus = self._bus
+        if self._answered and self._held and bus._persistent:
+            # Only impulse messages are expected from now on:
+            bus._listening[self._id] += 1
+            self._held = False
+            bus._lock.release()
+        response = await self._next_frame()
+        self._answered = (response[1] not in _impulse_commands and
+                          response[1] != 0x95)
+        return response
+
+    def _accept(self, frame):
+        # While one exchange waits for impulse messages without the
+        # bus, another one may talk to the same module:
+        if frame[1] in _impulse_commands:
+            return not (self._held and self._bus._listening[self._id])
+        return self._held
+
+    async def _next_frame(self):
+        bus = self._bus
+        pending = bus._pending.setdefault(
+            self._id, collections.deque(maxlen=_MAX_PENDING_FRAMES))
+        while True:
+            for index, frame in enumerate(pending):
+                if self._accept(frame):
+                    del pending[index]
+                    return frame
+            if bus._reading:
+                # Another exchange reads (and queues) the next frames:
+                async with bus._arrived:
+                    await bus._arrived.wait()
+                continue
+            bus._reading = True
+            try:
+                await self._read_frames()
+            finally:
+                bus._reading = False
+                async with bus._arrived:
+                    bus._arrived.notify_all()
+
+    async def _read_frames(self):
+        """Read from the stream and queue frames by module ID."""
+        bus = self._bus
+        reader, writer = self._streams
+        data = await reader.read(_MAX_FRAME_SIZE)
+        if not data:
+            raise SchunkSerialError("Error reading response")
+        bus._parser.feed(data)
+        for module_id, data in bus._parser.frames():
+            if module_id != self._id and self._strict:
+                raise SchunkSerialError("Module ID mismatch")
+            bus._pending.setdefault(
+                module_id, collections.deque(maxlen=_MAX_PENDING_FRAMES),
+            ).append(bytearray(data))
 
 
 class SchunkSerialError(SchunkError):
@@ -919,8 +4470,23 @@ class SchunkSerialError(SchunkError):
     pass
 
 
+class SchunkTimeoutError(SchunkError):
+    """Exception class for timeouts while waiting for a module.
+
+    The attribute `waited` holds the time (in seconds) which was waited.
+
+    """
+
+    def __init__(self, message, waited):
+        super().__init__(message)
+        self.waited = waited
+
+
 def decode_status(status):
-    """This is internally used in :meth:`Module.get_state`.
+    """Return a dictionary of status flags.
+
+    :meth:`Module.get_state` returns a :class:`Status` instead, which
+    can also be used like this dictionary.
 
     >>> status = decode_status(0x03)
     >>> from pprint import pprint
@@ -935,9 +4501,404 @@ def decode_status(status):
      'warning': False}
 
     """
-    statuses = ('referenced', 'moving', 'program_mode', 'warning', 'error',
-                'brake', 'move_end', 'position_reached')
-    return {name: bool(status & 1 << bit) for bit, name in enumerate(statuses)}
+    return dict(_status_dicts[status])
+
+
+_status_names = ('referenced', 'moving', 'program_mode', 'warning', 'error',
+                 'brake', 'move_end', 'position_reached')
+
+
+def _status_flag(bit):
+    return property(lambda self: bool(self & 1 << bit),
+                    doc="Bit {} of the status byte.".format(bit))
+
+
+class Status(int, collections.abc.Mapping):
+    """Status byte of a module, as returned by :meth:`Module.get_state`.
+
+    The flags are available as properties and, for compatibility with
+    :func:`decode_status`, as a read-only mapping of flag names to
+    ``bool`` (e.g. ``status.get('moving')``, ``list(status)``).
+    Comparison with a dictionary compares the flags:
+
+    >>> status = Status(0x03)
+    >>> status.moving, status['referenced'], status.error
+    (True, True, False)
+    >>> status == decode_status(0x03)
+    True
+    >>> status
+    Status(0x03: referenced, moving)
+
+    See :func:`decode_status_array` for decoding many status bytes.
+
+    """
+
+    __slots__ = ()
+
+    referenced = _status_flag(0)
+    moving = _status_flag(1)
+    program_mode = _status_flag(2)
+    warning = _status_flag(3)
+    error = _status_flag(4)
+    brake = _status_flag(5)
+    move_end = _status_flag(6)
+    position_reached = _status_flag(7)
+
+    def __repr__(self):
+        return 'Status(0x{:02X}: {})'.format(self, ', '.join(
+            name for name in _status_names if self[name]))
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            return _status_dicts[self] == other
+        return int.__eq__(self, other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = int.__hash__
+
+    def __getitem__(self, name):
+        return _status_dicts[self][name]
+
+    def __iter__(self):
+        return iter(_status_names)
+
+    def __len__(self):
+        return len(_status_names)
+
+    def __contains__(self, name):
+        return name in _status_names
+
+    def keys(self):
+        """Names of the flags (like :func:`decode_status`)."""
+        return _status_names
+
+    def values(self):
+        return [self[name] for name in _status_names]
+
+    def items(self):
+        return [(name, self[name]) for name in _status_names]
+
+    def as_dict(self):
+        """Return the flags as new dictionary."""
+        return dict(_status_dicts[self])
+
+    copy = as_dict
+
+
+# Pre-computed objects for all possible status bytes:
+_status_objects = tuple(Status(status) for status in range(256))
+_status_dicts = tuple(
+    {name: bool(status & 1 << bit) for bit, name in enumerate(_status_names)}
+    for status in range(256))
+
+
+def decode_status_array(statuses):
+    """Decode an array of status bytes (e.g. from a recording).
+
+    NumPy_ is needed for this function.
+
+    .. _NumPy: http://www.numpy.org/
+
+    Parameters
+    ----------
+    statuses : array_like
+        Status bytes (integers from 0 to 255).
+
+    Returns
+    -------
+    numpy.ndarray
+        Structured array with the same shape as `statuses` and one
+        boolean field per flag (see :class:`Status`).
+
+    >>> flags = decode_status_array([0x01, 0x03, 0x81])
+    >>> flags['moving']
+    array([False,  True, False])
+    >>> flags['position_reached'].nonzero()[0]
+    array([2])
+
+    """
+    import numpy as np
+    statuses = np.asarray(statuses, dtype=np.uint8)
+    bits = np.unpackbits(statuses[..., np.newaxis], axis=-1,
+                         bitorder='little')
+    return bits.view([(name, '?') for name in _status_names])[..., 0]
+
+
+def _status_byte(status):
+    """Inverse of decode_status(), integers are returned unchanged."""
+    if isinstance(status, int):
+        return status
+    return sum(1 << bit for bit, name in enumerate(_status_names)
+               if status[name])
+
+
+class TelemetryRecorder:
+    """Store states in a fixed-capacity NumPy array.
+
+    For further documentation see the __init__() docstring.
+
+    """
+
+    dtype = [
+        ('timestamp', 'f8'),
+        ('pos', 'f4'),
+        ('vel', 'f4'),
+        ('cur', 'f4'),
+        ('status', 'u1'),
+        ('error', 'u1'),
+    ]
+    """NumPy structured data type of the recorded samples."""
+
+    def __init__(self, capacity, clock=time.monotonic):
+        """Create a recorder for the states of one module.
+
+        All memory is allocated up front, when the recorder is full,
+        the oldest samples are overwritten.  Samples are stored twice
+        (in a buffer of twice the capacity), therefore the latest
+        samples are always available as one contiguous array without
+        copying them, see :meth:`window`.
+
+        NumPy_ is needed for this class.
+
+        .. _NumPy: http://www.numpy.org/
+
+        >>> mod = Module(...)  # doctest: +SKIP
+        >>> recorder = TelemetryRecorder(100000)  # doctest: +SKIP
+        >>> with contextlib.closing(mod.stream_state(0.01)) as states:
+        ...     for state in itertools.islice(states, 1000):
+        ...         recorder.record(state)  # doctest: +SKIP
+        >>> recorder.window(100)['pos'].mean()  # doctest: +SKIP
+
+        Parameters
+        ----------
+        capacity : int
+            Maximum number of samples.
+        clock : callable, optional
+            Used to get the timestamp of samples which are recorded
+            without one.
+
+        """
+        import numpy as np
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._data = np.zeros(2 * capacity, self.dtype)
+        self._capacity = capacity
+        self._clock = clock
+        self._total = 0
+
+    @property
+    def capacity(self):
+        """Maximum number of samples."""
+        return self._capacity
+
+    @property
+    def total(self):
+        """Number of samples recorded so far (including overwritten)."""
+        return self._total
+
+    def __len__(self):
+        return min(self._total, self._capacity)
+
+    def record(self, state, timestamp=None):
+        """Store one state.
+
+        Parameters
+        ----------
+        state : tuple
+            As returned by :meth:`Module.get_state` (or yielded by
+            :meth:`Module.stream_state`).  Values which are None are
+            stored as NaN.  The status can be given as dictionary or
+            as integer.
+        timestamp : float, optional
+            By default, the current time of `clock` is used.
+
+        """
+        if timestamp is None:
+            timestamp = self._clock()
+        sample = (timestamp,) + _telemetry_values(state)
+        index = self._total % self._capacity
+        data = self._data
+        data[index] = sample
+        data[index + self._capacity] = sample
+        self._total += 1
+
+    def extend(self, states):
+        """Store several states (with the current timestamps)."""
+        for state in states:
+            self.record(state)
+
+    def window(self, n=None):
+        """Return the latest samples (oldest first).
+
+        The returned array is a read-only view into the recorder's
+        memory, it is overwritten by further recordings.  Use its
+        ``copy()`` method if it has to be kept.
+
+        Parameters
+        ----------
+        n : int, optional
+            Maximum number of samples, by default all stored samples
+            are returned.
+
+        """
+        size = len(self)
+        if n is not None:
+            size = max(min(n, size), 0)
+        end = (self._total - 1) % self._capacity + self._capacity + 1
+        view = self._data[end - size:end]
+        view.flags.writeable = False
+        return view
+
+    def since(self, timestamp):
+        """Return the samples not older than `timestamp`.
+
+        Timestamps are assumed to be increasing.
+        See :meth:`window`.
+
+        """
+        import numpy as np
+        view = self.window()
+        start = np.searchsorted(view['timestamp'], timestamp)
+        return view[start:]
+
+    def clear(self):
+        """Forget all samples."""
+        self._total = 0
+
+
+def _telemetry_values(state):
+    """Convert a state (see Module.get_state()) for TelemetryRecorder."""
+    pos, vel, cur, status, error = state
+    return (_nan if pos is None else pos,
+            _nan if vel is None else vel,
+            _nan if cur is None else cur,
+            _status_byte(status), error)
+
+
+_nan = float('nan')
+
+
+class MotionProfile:
+    """Jerk-limited motion profile, to predict the motion of modules.
+
+    For further documentation see the __init__() docstring.
+
+    """
+
+    def __init__(self, distance, velocity, acceleration, jerk):
+        """Model point-to-point moves which start and end at rest.
+
+        The model is a symmetric jerk-limited ("S-curve") profile:
+        The acceleration increases with `jerk` up to (at most)
+        `acceleration`, the velocity increases up to (at most)
+        `velocity`, and the deceleration is the mirror image.
+        The real motion of a module may differ somewhat, but this can
+        be used to estimate when to check back, e.g. if
+        :meth:`Module.move_pos` cannot estimate the time.
+
+        All parameters can be NumPy arrays (or scalars), they are
+        broadcast against each other, i.e. many moves can be modelled
+        at once.
+
+        NumPy_ is needed for this class.
+
+        .. _NumPy: http://www.numpy.org/
+
+        >>> profile = MotionProfile([0.1, 2, -100], 20, 50, 500)
+        >>> profile.duration
+        array([0.18566355, 0.51231056, 5.5       ])
+        >>> profile.peak_velocity
+        array([ 1.07721735,  7.80776406, 20.        ])
+        >>> profile.position([[0.1], [1.0]])
+        array([[  0.05769104,   0.08333333,  -0.08333333],
+               [  0.1       ,   2.        , -15.        ]])
+
+        Parameters
+        ----------
+        distance : array_like
+            Distance to the target (may be negative).
+        velocity, acceleration, jerk : array_like
+            Target values (or maximum values) of the module, see e.g.
+            :meth:`Module.set_target_vel` and :attr:`Module.config`.
+            They must be positive.
+
+        """
+        import numpy as np
+        distance, v, a, j = np.broadcast_arrays(
+            *(np.asarray(x, dtype=float)
+              for x in (distance, velocity, acceleration, jerk)))
+        d = np.abs(distance)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Velocity at which the maximum acceleration is just reached:
+            v_lim = a * a / j
+            t_acc = np.where(v >= v_lim, v / a + a / j, 2 * np.sqrt(v / j))
+            # Peak velocity if the velocity limit is not reached, with
+            # and without reaching the maximum acceleration:
+            v_peak = (np.sqrt(v_lim * v_lim + 4 * a * d) - v_lim) / 2
+            v_peak = np.where(v_peak >= v_lim, v_peak, np.cbrt(d * d * j / 4))
+            vp = np.where(v * t_acc <= d, v, v_peak)
+            limited = vp >= v_lim
+            tj = np.where(limited, a / j, np.sqrt(vp / j))
+            ta = np.where(limited, vp / a + a / j, 2 * tj)
+            duration = np.where(d > 0, ta + d / vp, 0.0)
+        self._sign = np.sign(distance)
+        self._distance = d
+        self._jerk = j
+        self._tj = tj
+        self._ta = ta
+        self.duration = duration
+        """Time to reach the target."""
+        self.peak_velocity = vp
+        """Maximum velocity (absolute value) during the move."""
+        self.peak_acceleration = j * tj
+        """Maximum acceleration (absolute value) during the move."""
+
+    def position(self, t):
+        """Position (relative to the start) at time `t` after the start.
+
+        `t` is broadcast against the parameters given to
+        :meth:`__init__`.
+
+        """
+        return self._evaluate(t)[0]
+
+    def velocity(self, t):
+        """Velocity at time `t` after the start, see :meth:`position`."""
+        return self._evaluate(t)[1]
+
+    def _evaluate(self, t):
+        import numpy as np
+        t = np.asarray(t, dtype=float)
+        ta, duration = self._ta, self.duration
+        acc_x, acc_v = self._accelerate(np.clip(t, 0, ta))
+        cruise = np.clip(t - ta, 0, duration - 2 * ta)
+        dec_x, dec_v = self._accelerate(np.clip(duration - t, 0, ta))
+        decelerating = t >= duration - ta
+        x = np.where(decelerating, self._distance - dec_x,
+                     acc_x + self.peak_velocity * cruise)
+        v = np.where(decelerating, dec_v, acc_v)
+        return self._sign * x, self._sign * v
+
+    def _accelerate(self, t):
+        """Position and velocity while accelerating (0 <= t <= ta)."""
+        import numpy as np
+        j, tj, ap = self._jerk, self._tj, self.peak_acceleration
+        # increasing acceleration:
+        t1 = np.minimum(t, tj)
+        x = j * t1**3 / 6
+        v = j * t1**2 / 2
+        # constant acceleration:
+        t2 = np.clip(t - tj, 0, self._ta - 2 * tj)
+        x = x + v * t2 + ap * t2**2 / 2
+        v = v + ap * t2
+        # decreasing acceleration:
+        t3 = np.clip(t - self._ta + tj, 0, tj)
+        x = x + v * t3 + ap * t3**2 / 2 - j * t3**3 / 6
+        v = v + ap * t3 - j * t3**2 / 2
+        return x, v
 
 
 def crc16_increment(crc, data):
@@ -983,17 +4944,71 @@ def crc16(data):
 
     See Also
     --------
-    crc16_increment
+    crc16_update, crc16_increment
+
+    """
+    return _crc16_struct.pack(crc16_update(0x0, data))
+
+
+def crc16_update(crc, data):
+    """Update CRC16 with a sequence of bytes.
+
+    This gives the same result as calling :func:`crc16_increment` for
+    each byte, but it is much faster.
+
+    The calculation can be resumed, i.e.
+    ``crc16_update(crc16_update(0, a), b) == crc16_update(0, a + b)``.
+    This can be used to cache the CRC state after a constant prefix.
+
+    Parameters
+    ----------
+    crc : int
+        Previous CRC16 (use 0 to start a new calculation).
+    data : bytes, bytearray, memoryview or iterable of integers (0..255)
+        Data to append.
+
+    Returns
+    -------
+    int
+        New CRC16.
+
+    See Also
+    --------
+    crc16, crc16_check
+
+    """
+    table = _crc16_tbl
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def crc16_check(frame):
+    """Check a sequence of bytes which ends with its CRC16.
+
+    The CRC16 of data followed by its own (little endian) CRC16 is
+    always zero, therefore the whole frame can be checked in one go.
+
+    >>> data = b'\\x07\\x01\\x03\\x92OK'
+    >>> crc16_check(data + crc16(data))
+    True
+    >>> crc16_check(data + b'\\x00\\x00')
+    False
 
     """
-    crc = 0x0
-    for b in data:
-        crc = crc16_increment(crc, b)
-    return struct.pack('<H', crc)
+    return crc16_update(0x0, frame) == 0
+
+
+@functools.lru_cache(maxsize=None)
+def _crc16_prefix(msg_type, id):
+    """CRC16 state after the Group/ID bytes."""
+    return crc16_update(0x0, (msg_type, id))
+
 
+_crc16_struct = struct.Struct('<H')
 
 # Table copied from the Schunk manual:
-_crc16_tbl = [
+_crc16_tbl = (
     0x0000, 0xC0C1, 0xC181, 0x0140, 0xC301, 0x03C0, 0x0280, 0xC241,
     0xC601, 0x06C0, 0x0780, 0xC741, 0x0500, 0xC5C1, 0xC481, 0x0440,
     0xCC01, 0x0CC0, 0x0D80, 0xCD41, 0x0F00, 0xCFC1, 0xCE81, 0x0E40,
@@ -1025,7 +5040,7 @@ _crc16_tbl = [
     0x8801, 0x48C0, 0x4980, 0x8941, 0x4B00, 0x8BC1, 0x8A81, 0x4A40,
     0x4E00, 0x8EC1, 0x8F81, 0x4F40, 0x8D01, 0x4DC0, 0x4C80, 0x8C41,
     0x4400, 0x84C1, 0x8581, 0x4540, 0x8701, 0x47C0, 0x4680, 0x8641,
-    0x8201, 0x42C0, 0x4380, 0x8341, 0x4100, 0x81C1, 0x8081, 0x4040]
+    0x8201, 0x42C0, 0x4380, 0x8341, 0x4100, 0x81C1, 0x8081, 0x4040)
 
 
 communication_modes = {
@@ -1125,4 +5140,79 @@ See also :meth:`Module.get_state`.
 # point numbers.
 _test_values = ( -1.2345000505447388, 47.11000061035156, 287454020, -1122868,
                 512, -20482)
-_test_format_string = '<2f2i2h'
+
+_error_commands = {0x88: "ERROR", 0x89: "WARNING", 0x8A: "INFO"}
+
+
+class _Command(collections.namedtuple(
+        '_Command', ['code', 'request', 'response', 'expected'])):
+    """Layout of a command, see _commands.
+
+    code: command code
+    request: struct.Struct of the parameters (None: no parameters)
+    response: struct.Struct of the response (None: bytes are returned)
+    expected: expected response bytes (None: no check)
+
+    """
+
+    __slots__ = ()
+
+
+def _command(code, request=None, response=None, expected=None):
+    """Compile format strings (without byte order) into a _Command."""
+    return _Command(
+        code,
+        struct.Struct('<' + request) if request is not None else None,
+        struct.Struct('<' + response) if response is not None else None,
+        expected)
+
+
+# All supported commands, by method name.  The MOVE POS family has up to 5
+# float parameters (see _move_pos_data()), the response is either b'OK' or
+# the estimated time (see _decode_est_time()).  GET CONFIG (0x80) and SET
+# CONFIG parameters are listed in _Config._params, the layout of GET STATE
+# responses depends on the requested fields (see _state_structs).
+_commands = {
+    'reference':                 _command(0x92, expected=b'OK'),
+    'move_pos':                  _command(0xB0),
+    'move_pos_rel':              _command(0xB8),
+    'move_pos_time':             _command(0xB1),
+    'move_pos_time_rel':         _command(0xB9),
+    'move_cur':                  _command(0xB3, 'f', expected=b'OK'),
+    'move_vel':                  _command(0xB5, expected=b'OK'),
+    'move_grip':                 _command(0xB7, 'f', expected=b'OK'),
+    'set_target_vel':            _command(0xA0, 'f', expected=b'OK'),
+    'set_target_acc':            _command(0xA1, 'f', expected=b'OK'),
+    'set_target_jerk':           _command(0xA2, 'f', expected=b'OK'),
+    'set_target_cur':            _command(0xA3, 'f', expected=b'OK'),
+    'set_target_time':           _command(0xA4, 'f', expected=b'OK'),
+    'stop':                      _command(0x91, expected=b'OK'),
+    'pos_reached':               _command(0x94, response='f'),
+    'toggle_impulse_message':    _command(0xE7),
+    'set_config':                _command(0x81, response='3s'),
+    'get_state':                 _command(0x95, 'fB'),
+    'reboot':                    _command(0xE0, expected=b'OK'),
+    'change_user':               _command(0xE3, response='2sB'),
+    'check_mc_pc_communication': _command(0xE4, response='2f2i2h'),
+    'check_pc_mc_communication': _command(0xE5, '2f2i2h', expected=b'OK\x00'),
+    'ack':                       _command(0x8B, expected=b'OK'),
+    'get_detailed_error_info':   _command(0x96, response='BBf'),
+}
+
+# Target values which are part of the MOVE POS family of commands:
+_move_targets = dict.fromkeys(
+    [0xB0, 0xB8],
+    ('set_target_vel', 'set_target_acc', 'set_target_cur', 'set_target_jerk'))
+_move_targets.update(dict.fromkeys(
+    [0xB1, 0xB9],
+    ('set_target_vel', 'set_target_acc', 'set_target_cur', 'set_target_time')))
+
+_move_commands = frozenset(
+    ['move_pos', 'move_pos_rel', 'move_pos_time', 'move_pos_time_rel'])
+
+_float_structs = [struct.Struct('<{}f'.format(n)) for n in range(6)]
+
+# 2.5.1 GET STATE (0x95): mode bits and response layout for each mode
+_state_fields = {'position': 0x01, 'velocity': 0x02, 'current': 0x04}
+_state_structs = [struct.Struct('<{}fBB'.format(bin(mode).count('1')))
+                  for mode in range(8)]
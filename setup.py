@@ -37,12 +37,13 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
         "Programming Language :: Python",
-        "Programming Language :: Python :: 2",
         "Programming Language :: Python :: 3",
         "Topic :: Scientific/Engineering",
     ],
 
-    tests_require=['pytest', 'pyserial'],
+    python_requires='>=3.5',
+    extras_require={'numpy': ['NumPy']},
+    tests_require=['pytest', 'pyserial', 'NumPy'],
     cmdclass={'test': PyTest},
     zip_safe=True,
 )
@@ -0,0 +1,139 @@
+"""Fake serial ports and frame helpers shared by the tests."""
+
+import asyncio
+import threading
+
+import schunk
+
+
+def frame(msg_type, id, data):
+    """Return a serial frame (including the CRC)."""
+    data = bytearray([msg_type, id]) + bytearray(data)
+    return bytes(data + schunk.crc16(data))
+
+
+def ack_request(id):
+    return frame(0x05, id, b'\x01\x8B')
+
+
+def ack_response(id):
+    return frame(0x07, id, b'\x03\x8BOK')
+
+
+class DummyPort:
+    """Answers are looked up by the written frame.
+
+    Written frames are appended to `written` and each opened port to
+    `opened` (if given).
+
+    """
+
+    def __init__(self, answers, written=None, opened=None):
+        if opened is not None:
+            opened.append(self)
+        self._answers = answers
+        self._written = written
+        self._input = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def write(self, data):
+        data = bytes(data)
+        if self._written is not None:
+            self._written.append(data)
+        self._input.extend(self._answer(data))
+        return len(data)
+
+    def read(self, n):
+        result = self._input[:n]
+        del self._input[:n]
+        return result
+
+    def flushInput(self):
+        del self._input[:]
+
+    def _answer(self, data):
+        return self._answers[data]
+
+
+class LoggingPort(DummyPort):
+    """Frames without an answer (e.g. broadcasts) are only logged."""
+
+    def _answer(self, data):
+        return self._answers.get(data, b'')
+
+
+class ThreadedPort:
+    """A fake serial port with a timeout, to be read from another thread."""
+
+    def __init__(self, answers, timeout=0.01):
+        self._answers = answers
+        self._timeout = timeout
+        self._input = bytearray()
+        self._cond = threading.Condition()
+        self.written = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def write(self, data):
+        data = bytes(data)
+        self.written.append(data)
+        self.inject(self._answers.get(data, b''))
+        return len(data)
+
+    def inject(self, data):
+        with self._cond:
+            self._input.extend(data)
+            self._cond.notify_all()
+
+    def read(self, n):
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._input) >= n, self._timeout)
+            result = bytes(self._input[:n])
+            del self._input[:n]
+            return result
+
+    def flushInput(self):
+        with self._cond:
+            del self._input[:]
+
+
+def run(coro):
+    """Run a coroutine in a new event loop (asyncio.run() needs 3.7)."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class DummyWriter:
+    """Fake asyncio.StreamWriter, answers are fed to `reader`."""
+
+    def __init__(self, reader, answers, log):
+        self._reader = reader
+        self._answers = answers
+        self._log = log
+        self.closed = False
+
+    def write(self, data):
+        assert not self.closed
+        data = bytes(data)
+        self._log.append(data)
+        answer = self._answers.get(data)
+        if answer is not None:
+            self._reader.feed_data(answer)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
@@ -0,0 +1,142 @@
+"""Test AsyncModule with AsyncSerialConnection/AsyncSerialBus."""
+
+import asyncio
+
+import schunk
+import pytest
+
+from helpers import DummyWriter, ack_request, ack_response, frame, run
+
+
+def pos_reached(id):
+    return frame(0x07, id, b'\x05\x94\x00\x00\x20\x41')
+
+
+class DummyOpener:
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.writers = []
+        self.log = []
+
+    async def __call__(self):
+        reader = asyncio.StreamReader()
+        writer = DummyWriter(reader, self.answers, self.log)
+        self.writers.append(writer)
+        return reader, writer
+
+
+def test_move_pos_and_config():
+    opener = DummyOpener({
+        # 6.1.1.2 MOVE POS 10 [mm]
+        b'\x05\x01\x05\xB0\x00\x00\x20\x41\x48\x80':
+            b'\x07\x01\x05\xB0\xEE\xEE\x56\x40\x7B\xE4',
+        frame(0x05, 1, b'\x02\x80\x06'): frame(0x07, 1, b'\x03\x80\x06\x00'),
+        frame(0x05, 1, b'\x03\x81\x01\x0C'): frame(0x07, 1, b'\x04\x81OK\x01'),
+    })
+
+    async def main():
+        async with schunk.AsyncSerialConnection(1, opener) as conn:
+            mod = schunk.AsyncModule(conn)
+            est_time = await mod.move_pos(10)
+            unit_system = await mod.config.unit_system
+            await mod.config.set('module_id', 12)
+            return est_time, unit_system
+
+    assert run(main()) == (3.358333110809326, 0)
+    assert len(opener.writers) == 1
+    assert opener.writers[0].closed
+
+
+def test_invalid_config_parameter():
+    mod = schunk.AsyncModule(schunk.AsyncSerialConnection(1, None))
+    with pytest.raises(AttributeError):
+        mod.config.nonexisting
+    with pytest.raises(AttributeError):
+        mod.config.module_id = 12
+
+
+def test_blocking_and_routing():
+    move = frame(0x05, 2, b'\x05\xB0\x00\x00\x20\x41')
+    opener = DummyOpener({
+        move: frame(0x07, 2, b'\x05\xB0\x00\x00\x80\x3F') + pos_reached(2),
+        ack_request(1): pos_reached(3) + ack_response(1),
+    })
+
+    async def main():
+        async with schunk.AsyncSerialBus(opener) as bus:
+            mod1 = schunk.AsyncModule(bus.connection(1))
+            mod2 = schunk.AsyncModule(bus.connection(2))
+            results = await asyncio.gather(mod2.move_pos_blocking(10.0),
+                                           mod1.ack())
+            async with bus.connection(3).open() as exchange:
+                impulse = await exchange.receive()
+            return results, impulse
+
+    results, impulse = run(main())
+    assert results == [10.0, None]
+    assert impulse == b'\x05\x94\x00\x00\x20\x41'
+
+
+def test_concurrent_blocking_moves():
+    move1 = frame(0x05, 1, b'\x05\xB0\x00\x00\x20\x41')
+    move2 = frame(0x05, 2, b'\x05\xB0\x00\x00\x20\x41')
+    opener = DummyOpener({
+        move1: frame(0x07, 1, b'\x05\xB0\x00\x00\x80\x3F'),
+        move2: frame(0x07, 2, b'\x05\xB0\x00\x00\x80\x3F'),
+    })
+
+    async def reach_positions(reader):
+        while len(opener.log) < 2:
+            await asyncio.sleep(0)
+        # Both modules are moving at the same time:
+        assert opener.log == [move1, move2]
+        reader.feed_data(pos_reached(2) + pos_reached(1))
+
+    async def main():
+        async with schunk.AsyncSerialBus(opener) as bus:
+            reader, writer = bus._streams
+            mod1 = schunk.AsyncModule(bus.connection(1))
+            mod2 = schunk.AsyncModule(bus.connection(2))
+            return await asyncio.wait_for(asyncio.gather(
+                mod1.move_pos_blocking(10.0), mod2.move_pos_blocking(10.0),
+                reach_positions(reader)), 1)
+
+    assert run(main()) == [10.0, 10.0, None]
+    assert len(opener.writers) == 1
+
+
+def test_cancel_blocking_move_stops():
+    move = frame(0x05, 1, b'\x05\xB0\x00\x00\x20\x41')
+    stop = frame(0x05, 1, b'\x01\x91')
+    opener = DummyOpener({
+        # estimated time, but position is never reached
+        move: frame(0x07, 1, b'\x05\xB0\x00\x00\x80\x3F'),
+        stop: frame(0x07, 1, b'\x03\x91OK'),
+    })
+
+    async def main():
+        async with schunk.AsyncSerialConnection(1, opener) as conn:
+            mod = schunk.AsyncModule(conn)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(mod.move_pos_blocking(10.0), 0.01)
+            assert conn.connected
+
+    run(main())
+    assert opener.log == [move, stop]
+    # The interrupted stream is not used anymore:
+    assert len(opener.writers) == 2
+
+
+def test_incomplete_response():
+    opener = DummyOpener({ack_request(1): ack_response(1)[:4]})
+
+    async def main():
+        mod = schunk.AsyncModule(schunk.AsyncSerialConnection(1, opener))
+        task = asyncio.ensure_future(mod.ack())
+        await asyncio.sleep(0)
+        opener.writers[0]._reader.feed_eof()
+        with pytest.raises(schunk.SchunkSerialError):
+            await task
+
+    run(main())
@@ -0,0 +1,195 @@
+"""Test several modules sharing one SerialBus."""
+
+import struct
+import threading
+
+import schunk
+import pytest
+
+from helpers import (DummyPort, LoggingPort, ack_request, ack_response,
+                     frame)
+
+
+@pytest.fixture
+def port():
+    class Port(DummyPort):
+        opened = 0
+
+        def __init__(self, answers):
+            type(self).opened += 1
+            DummyPort.__init__(self, answers)
+
+    return Port
+
+
+def pos_reached(id, position=b'\x00\x00\x20\x41'):
+    return frame(0x07, id, b'\x05\x94' + position)
+
+
+def test_routing(port):
+    answers = {
+        ack_request(1): ack_response(1),
+        # module 2 sends an impulse message before module 1 answers:
+        ack_request(3): pos_reached(2) + ack_response(3),
+        frame(0x05, 2, b'\x01\x8B'): ack_response(2),
+    }
+    with schunk.SerialBus(port, answers) as bus:
+        mod1, mod2, mod3 = (schunk.Module(bus.connection(id))
+                            for id in (1, 2, 3))
+        mod1.ack()
+        mod3.ack()
+        # The impulse message is delivered to module 2, and ignored there:
+        mod2.ack()
+    assert port.opened == 1
+
+
+def test_pending_frame_is_delivered(port):
+    answers = {
+        ack_request(1): pos_reached(2) + ack_response(1),
+    }
+    bus = schunk.SerialBus(port, answers).connect()
+    schunk.Module(bus.connection(1)).ack()
+    gen = bus.connection(2).open()
+    try:
+        assert next(gen) == b'\x05\x94\x00\x00\x20\x41'
+    finally:
+        gen.close()
+
+
+def test_stale_response_is_discarded(port):
+    error = frame(0x03, 1, b'\x02\x8B\xD5')  # CMD ACK failed
+    answers = {
+        # late response from module 1 (e.g. after a timeout):
+        ack_request(2): ack_response(1) + ack_response(2),
+        ack_request(1): pos_reached(1) + error,
+    }
+    with schunk.SerialBus(port, answers) as bus:
+        mod1, mod2 = (schunk.Module(bus.connection(id)) for id in (1, 2))
+        mod2.ack()
+        # The impulse message is kept, the stale response is not used:
+        with pytest.raises(schunk.SchunkError) as excinfo:
+            mod1.ack()
+    assert "0xD5" in str(excinfo.value)
+
+
+def test_strict_connection(port):
+    answers = {ack_request(1): ack_response(2)}
+    mod = schunk.Module(schunk.SerialConnection(1, port, answers))
+    with pytest.raises(schunk.SchunkSerialError) as excinfo:
+        mod.ack()
+    assert "Module ID mismatch" in str(excinfo.value)
+
+
+def test_connection_properties(port):
+    bus = schunk.SerialBus(port, {})
+    conn = bus.connection(5)
+    assert conn.id == 5
+    assert conn.bus is bus
+    assert not conn.connected
+    with conn:
+        assert bus.connected
+    assert not bus.connected
+
+
+def test_threads(port):
+    ids = range(1, 7)
+    answers = {ack_request(id): ack_response(id) for id in ids}
+    errors = []
+
+    def worker(mod):
+        try:
+            for _ in range(50):
+                mod.ack()
+        except Exception as e:
+            errors.append(e)
+
+    with schunk.SerialBus(port, answers) as bus:
+        threads = [threading.Thread(target=worker,
+                                    args=[schunk.Module(bus.connection(id))])
+                   for id in ids]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert not errors
+    assert port.opened == 1
+
+
+def test_frame_cache(port):
+    class SmallCacheBus(schunk.SerialBus):
+        frame_cache_size = 2
+
+    answers = {ack_request(id): ack_response(id) for id in (1, 2, 3)}
+    with SmallCacheBus(port, answers) as bus:
+        mod1, mod2, mod3 = (schunk.Module(bus.connection(id))
+                            for id in (1, 2, 3))
+        for _ in range(3):
+            mod1.ack()
+        assert bus._encode.cache_info().hits == 2
+        mod2.ack()
+        mod3.ack()
+        assert bus._encode.cache_info().currsize == 2
+        mod1.ack()  # was evicted
+        assert bus._encode.cache_info().misses == 4
+
+
+def get_state(id, mode=0x07):
+    return frame(0x05, id, b'\x06\x95\x00\x00\x00\x00' + bytes([mode]))
+
+
+def state(id, pos, status=0x01):
+    return frame(0x07, id, b'\x07\x95' + struct.pack('<fBB', pos, status, 0))
+
+
+def test_sample_all(port):
+    np = pytest.importorskip('numpy')
+    answers = {
+        get_state(1, 0x01): state(1, 10.0),
+        # late impulse message from module 3:
+        get_state(2, 0x01): pos_reached(3) + state(2, 20.0),
+        get_state(3, 0x01): state(3, 30.0),
+    }
+    bus = schunk.SerialBus(port, answers)
+    mod3 = schunk.Module(bus.connection(3))
+    samples, skew = bus.sample_all([1, 2, mod3], fields=['position'])
+    assert port.opened == 1
+    assert not bus.connected
+    assert list(samples['id']) == [1, 2, 3]
+    assert list(samples['pos']) == [10.0, 20.0, 30.0]
+    assert np.isnan(samples['vel']).all()
+    assert list(samples['status']) == [0x01] * 3
+    assert (samples['rtt'] >= 0).all()
+    assert (np.diff(samples['timestamp']) > 0).all()
+    assert skew == samples['timestamp'][-1] - samples['timestamp'][0]
+    other = schunk.Module(schunk.SerialConnection(1, port, answers))
+    with pytest.raises(ValueError):
+        bus.sample_all([other])
+
+
+def test_group():
+    def set_target_vel(id, velocity):
+        return frame(0x05, id, b'\x05\xA0' + struct.pack('<f', velocity))
+
+    answers = {
+        set_target_vel(1, 5.0): frame(0x07, 1, b'\x03\xA0OK'),
+        set_target_vel(2, 10.0): frame(0x07, 2, b'\x03\xA0OK'),
+        get_state(1, 0x01): state(1, 10.0, status=0x81),
+        get_state(2, 0x01): state(2, 20.0, status=0x81),
+    }
+    broadcast = frame(0x05, 10, b'\x05\xB0\x00\x00\x20\x41')
+    written = []
+    with schunk.SerialBus(LoggingPort, answers, written) as bus:
+        mod1, mod2 = (schunk.Module(bus.connection(id)) for id in (1, 2))
+        group = schunk.ModuleGroup([mod1, mod2], group_id=10)
+        group.set_targets(velocity=[5.0, 10.0], acceleration=[None, None])
+        group.move_pos(10.0)
+        assert group.wait_until_position_reached(
+            expected_time=0.01, timeout=1) == [10.0, 20.0]
+    assert written == [
+        set_target_vel(1, 5.0), set_target_vel(2, 10.0), broadcast,
+        get_state(1, 0x01), get_state(2, 0x01)]
+    with pytest.raises(ValueError):
+        group.set_targets(current=[1.0])
+    other = schunk.Module(schunk.SerialBus(LoggingPort, {}).connection(3))
+    with pytest.raises(ValueError):
+        schunk.ModuleGroup([mod1, other], group_id=10)
@@ -0,0 +1,179 @@
+"""Test reading (and writing) several config parameters at once."""
+
+import struct
+
+import schunk
+import pytest
+
+from helpers import DummyPort, frame
+
+
+def message(id, *data):
+    data = b''.join(data)
+    return bytes([len(data)]) + data
+
+
+INFO = (b'PR-70\x00\x00\x00\x00\x00\x00\x00\x79\x00\x03\x00\x12\x02'
+        b'11:22:27  Jul  3 2008\x00PTA ')
+
+VALUES = {
+    'module_id': 1,
+    'group_id': 2,
+    'serial_baudrate': 9600,
+    'can_baudrate': 500,
+    'communication_mode': 1,
+    'unit_system': 0,
+    'soft_high': 90.0,
+    'soft_low': -10.0,
+    'max_velocity': 82.0,
+    'max_acceleration': 320.0,
+    'max_current': 5.0,
+    'nom_current': 2.5,
+    'max_jerk': 1000.0,
+    'offset_phase_a': 2048,
+    'offset_phase_b': 2049,
+    'data_crc': 0x1234,
+    'reference_offset': 0.5,
+    'serial_number': 123456,
+    'order_number': 0x79,
+    'gear_ratio': 1.0,
+}
+
+
+def get_config_answers(id, values):
+    answers = {
+        frame(0x05, id, message(id, b'\x80')):
+            frame(0x07, id, message(id, b'\x80', INFO)),
+    }
+    for name, value in values.items():
+        cmd_byte, fmt = schunk._Config._params[name]
+        answers[frame(0x05, id, message(id, b'\x80', cmd_byte))] = frame(
+            0x07, id, message(id, b'\x80', cmd_byte,
+                              struct.pack('<' + fmt, value)))
+    return answers
+
+
+def test_snapshot():
+    answers = get_config_answers(1, VALUES)
+    opened, written = [], []
+    mod = schunk.Module(schunk.SerialConnection(
+        1, DummyPort, answers, written, opened))
+    snapshot = mod.config.snapshot()
+    assert len(opened) == 1
+    # one message per parameter, only one for the info block:
+    assert len(written) == len(VALUES) + 1
+    assert snapshot.module_type == b'PR-70\x00\x00\x00'
+    assert snapshot.firmware_version == 121
+    assert snapshot.protocol_version == 3
+    assert snapshot.hardware_version == 530
+    assert snapshot.firmware_date == b'11:22:27  Jul  3 2008'
+    assert snapshot._asdict() == dict(
+        VALUES,
+        module_type=b'PR-70\x00\x00\x00',
+        firmware_version=121,
+        protocol_version=3,
+        hardware_version=530,
+        firmware_date=b'11:22:27  Jul  3 2008',
+    )
+    with pytest.raises(AttributeError):
+        snapshot.module_id = 3
+    # The order of the fields doesn't depend on hash randomization:
+    assert schunk.ConfigSnapshot._fields[:3] == (
+        'module_id', 'group_id', 'serial_baudrate')
+    assert snapshot[-1] == b'11:22:27  Jul  3 2008'
+
+
+def test_info_block_is_cached():
+    answers = get_config_answers(1, {})
+    written = []
+    mod = schunk.Module(schunk.SerialConnection(
+        1, DummyPort, answers, written))
+    assert mod.config.module_type == b'PR-70\x00\x00\x00'
+    assert mod.config.firmware_version == 121
+    assert mod.config.firmware_date == b'11:22:27  Jul  3 2008'
+    assert len(written) == 1
+
+
+def test_snapshot_with_refused_parameter():
+    values = dict(VALUES)
+    del values['can_baudrate']
+    answers = get_config_answers(1, values)
+    # 2.6.1 CMD ERROR (0x88), INFO UNKNOWN COMMAND (0x04)
+    answers[frame(0x05, 1, b'\x02\x80\x04')] = frame(0x07, 1, b'\x02\x88\x04')
+    mod = schunk.Module(schunk.SerialConnection(
+        1, DummyPort, answers))
+    snapshot = mod.config.snapshot()
+    assert snapshot.can_baudrate is None
+    assert snapshot.serial_baudrate == 9600
+
+
+def test_snapshot_holds_bus():
+    answers = get_config_answers(1, VALUES)
+    opened, written = [], []
+    with schunk.SerialBus(DummyPort, answers, written, opened) as bus:
+        mod = schunk.Module(bus.connection(1))
+        with mod._session():
+            # The bus is taken with the first message ...
+            assert not bus._lock._is_owned()
+            assert mod.config.module_type == b'PR-70\x00\x00\x00'
+            # ... and held by this thread for the rest of the session:
+            assert bus._lock._is_owned()
+            mod.config.snapshot()
+            assert bus._lock._is_owned()
+        assert not bus._lock._is_owned()
+    assert len(opened) == 1
+
+
+def set_config(id, name, value):
+    cmd_byte, fmt = schunk._Config._params[name]
+    return frame(0x05, id, message(id, b'\x81', cmd_byte,
+                                   struct.pack('<' + fmt, value)))
+
+
+def set_config_ok(id, name):
+    cmd_byte, fmt = schunk._Config._params[name]
+    return frame(0x07, id, message(id, b'\x81OK', cmd_byte))
+
+
+def test_apply():
+    answers = get_config_answers(1, VALUES)
+    answers[set_config(1, 'soft_high', 80.0)] = set_config_ok(1, 'soft_high')
+    answers[set_config(1, 'max_velocity', 50.0)] = set_config_ok(
+        1, 'max_velocity')
+    opened, written = [], []
+    mod = schunk.Module(schunk.SerialConnection(
+        1, DummyPort, answers, written, opened))
+    changes = mod.config.apply({
+        'soft_high': 80.0,
+        'soft_low': -10.0,  # unchanged
+        'max_velocity': 50.0,
+    })
+    assert changes.immediate == {'soft_high': (90.0, 80.0)}
+    assert changes.reboot == {'max_velocity': (82.0, 50.0)}
+    assert len(opened) == 1
+    assert len(written) == 3 + 2
+    assert written[3:] == [set_config(1, 'soft_high', 80.0),
+                           set_config(1, 'max_velocity', 50.0)]
+
+
+def test_apply_verify():
+    answers = get_config_answers(1, VALUES)
+    answers[set_config(1, 'unit_system', 1)] = set_config_ok(
+        1, 'unit_system')
+    mod = schunk.Module(schunk.SerialConnection(
+        1, DummyPort, answers))
+    # The module still reports the old value:
+    with pytest.raises(schunk.SchunkError) as excinfo:
+        mod.config.apply({'unit_system': 1}, verify=True)
+    assert "Verification of unit_system failed" in str(excinfo.value)
+
+
+def test_apply_invalid_parameters():
+    written = []
+    mod = schunk.Module(schunk.SerialConnection(
+        1, DummyPort, {}, written))
+    with pytest.raises(AttributeError):
+        mod.config.apply({'module_type': b'PR-70'})
+    with pytest.raises(AttributeError):
+        mod.config.apply({'eeprom': b''})
+    assert written == []
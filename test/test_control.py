@@ -0,0 +1,144 @@
+"""Test velocity/current commands and ControlLoop."""
+
+import struct
+
+import schunk
+import pytest
+
+
+class FakeTime:
+    """Each reading of the clock takes 10 microseconds."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        self.now += 0.00001
+        return self.now
+
+    def sleep(self, duration):
+        self.sleeps.append(duration)
+        self.now += duration
+
+
+def get_state(mode, position):
+    n = bin(mode).count('1')
+    data = b'\x95' + struct.pack('<{}fBB'.format(n), *[position] * n + [1, 0])
+    return bytes([len(data)]) + data
+
+
+class DummyConnection:
+    """Answers GET STATE and the velocity/current commands."""
+
+    def __init__(self):
+        self.written = []
+        self.position = 0.0
+
+    @schunk.coroutine
+    def open(self):
+        response = None
+        while True:
+            data = yield response
+            self.written.append(bytes(data))
+            if data[1] == 0x95:
+                self.position += 1.0
+                response = bytearray(get_state(data[6], self.position))
+            else:
+                response = bytearray([3, data[1]]) + b'OK'
+
+
+def test_move_commands():
+    conn = DummyConnection()
+    mod = schunk.Module(conn)
+    mod.move_cur(1.5)
+    mod.move_vel(-10.0)
+    mod.move_vel(10.0, 2.0)
+    mod.move_grip(0.5)
+    assert conn.written == [
+        b'\x05\xB3' + struct.pack('<f', 1.5),
+        b'\x05\xB5' + struct.pack('<f', -10.0),
+        b'\x09\xB5' + struct.pack('<2f', 10.0, 2.0),
+        b'\x05\xB7' + struct.pack('<f', 0.5),
+    ]
+
+
+def test_loop():
+    conn = DummyConnection()
+    mod = schunk.Module(conn)
+    fake_time = FakeTime()
+    received = []
+
+    def control(state, t):
+        received.append((state[0], t))
+        mod.move_vel(-state[0])
+
+    loop = schunk.ControlLoop(mod, control, rate=100, fields=['position'],
+                              clock=fake_time.clock, sleep=fake_time.sleep)
+    stats = loop.run(cycles=5)
+    assert stats.cycles == 5
+    assert stats.misses == 0
+    assert [position for position, _ in received] == [1, 2, 3, 4, 5]
+    for n, (_, t) in enumerate(received):
+        assert t == pytest.approx(n * 0.01, abs=0.0001)
+    assert len(conn.written) == 10
+    assert len(fake_time.sleeps) == 4
+    # The rest of the waiting time is spent spinning:
+    assert all(0.007 < sleep < 0.008 for sleep in fake_time.sleeps)
+    assert 0 < stats.max_jitter < 0.0001
+    assert stats.histogram == [5, 0, 0, 0, 0, 0]
+
+
+def test_misses_and_stop():
+    mod = schunk.Module(DummyConnection())
+    fake_time = FakeTime()
+    loop = None
+
+    def control(state, t):
+        if loop.cycles == 1:
+            fake_time.sleep(0.025)  # misses two cycles
+        if loop.cycles == 3:
+            loop.stop()
+
+    loop = schunk.ControlLoop(mod, control, rate=100,
+                              clock=fake_time.clock, sleep=fake_time.sleep)
+    stats = loop.run(duration=1.0)
+    assert stats.cycles == 4
+    assert stats.misses == 2
+    assert loop.cycles == 4
+
+
+def test_duration_and_interrupt():
+    mod = schunk.Module(DummyConnection())
+    fake_time = FakeTime()
+    loop = schunk.ControlLoop(mod, lambda state, t: None, rate=10,
+                              clock=fake_time.clock, sleep=fake_time.sleep)
+    assert loop.run(duration=1.0).cycles == 10
+
+    def interrupt(state, t):
+        raise KeyboardInterrupt
+
+    loop = schunk.ControlLoop(mod, interrupt, rate=10)
+    with pytest.raises(KeyboardInterrupt):
+        loop.run()
+    assert mod._connection.written[-1] == b'\x01\x91'
+
+
+class ConnectingConnection(DummyConnection):
+
+    connected = False
+    events = []
+
+    def connect(self):
+        self.events.append('connect')
+
+    def close(self):
+        self.events.append('close')
+
+
+def test_connection_is_kept_open():
+    conn = ConnectingConnection()
+    mod = schunk.Module(conn)
+    loop = schunk.ControlLoop(mod, lambda state, t: None, rate=1000)
+    loop.run(cycles=3)
+    assert conn.events == ['connect', 'close']
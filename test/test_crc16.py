@@ -0,0 +1,41 @@
+"""Test the CRC16 functions."""
+
+import random
+
+import schunk
+import pytest
+
+
+def crc16_reference(data):
+    crc = 0x0
+    for b in data:
+        crc = schunk.crc16_increment(crc, b)
+    return crc
+
+
+random.seed(42)
+data_cases = [b'', b'\x00', b'\x05\x01\x01\x92', b'\xFF' * 7] + [
+    bytes(random.randrange(256) for _ in range(random.randrange(1, 300)))
+    for _ in range(20)]
+
+
+@pytest.mark.parametrize('data', data_cases)
+def test_same_result(data):
+    expected = crc16_reference(data)
+    assert schunk.crc16_update(0, data) == expected
+    assert schunk.crc16_update(0, memoryview(data)) == expected
+    assert schunk.crc16_update(0, bytearray(data)) == expected
+    assert schunk.crc16(data) == bytes([expected & 0xFF, expected >> 8])
+
+
+@pytest.mark.parametrize('data', data_cases)
+def test_resume(data):
+    for i in range(0, len(data), 7):
+        crc = schunk.crc16_update(0, data[:i])
+        assert schunk.crc16_update(crc, data[i:]) == crc16_reference(data)
+
+
+@pytest.mark.parametrize('data', data_cases)
+def test_check(data):
+    assert schunk.crc16_check(data + schunk.crc16(data))
+    assert not schunk.crc16_check(data + b'\x00\x01')
@@ -0,0 +1,135 @@
+"""Test FrameParser."""
+
+import schunk
+import pytest
+
+from helpers import frame
+
+
+ACK = frame(0x07, 0x01, b'\x03\x8BOK')
+POS_REACHED = frame(0x07, 0x02, b'\x05\x94\x00\x00\x20\x41')
+ERROR = frame(0x03, 0x03, b'\x02\x88\xD9')
+
+
+class ChunkedPort:
+    """Returns at most `chunk` bytes per call, supports readinto()."""
+
+    def __init__(self, data, chunk):
+        self._data = bytearray(data)
+        self._chunk = chunk
+        self.calls = 0
+
+    @property
+    def in_waiting(self):
+        return min(len(self._data), self._chunk)
+
+    def readinto(self, buffer):
+        self.calls += 1
+        n = min(len(buffer), len(self._data), self._chunk)
+        buffer[:n] = self._data[:n]
+        del self._data[:n]
+        return n
+
+
+def parse(parser, *chunks):
+    frames = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        frames.extend((id, bytes(data)) for id, data in parser.frames())
+    return frames
+
+
+def test_several_frames_at_once():
+    parser = schunk.FrameParser()
+    assert parse(parser, ACK + POS_REACHED + ERROR) == [
+        (1, b'\x03\x8BOK'),
+        (2, b'\x05\x94\x00\x00\x20\x41'),
+        (3, b'\x02\x88\xD9'),
+    ]
+    assert parser.buffered == 0
+    assert parser.discarded == 0
+
+
+def test_byte_by_byte():
+    parser = schunk.FrameParser()
+    data = ACK + POS_REACHED
+    frames = parse(parser, *(data[i:i + 1] for i in range(len(data))))
+    assert frames == [(1, b'\x03\x8BOK'), (2, b'\x05\x94\x00\x00\x20\x41')]
+
+
+@pytest.mark.parametrize('noise', [
+    b'\x00',
+    b'\xFF\x07',
+    b'\x07\x01\x03\x8B',  # incomplete frame
+    ACK[:-1] + b'\x00',  # CRC error
+    b'\x03\x01\x05\x00\x00',  # message type 0x03 with wrong D-Len
+])
+def test_resync(noise):
+    parser = schunk.FrameParser()
+    frames = parse(parser, noise + ACK, POS_REACHED)
+    assert frames == [(1, b'\x03\x8BOK'), (2, b'\x05\x94\x00\x00\x20\x41')]
+    assert parser.discarded == len(noise)
+
+
+def test_resync_after_timeout():
+    parser = schunk.FrameParser()
+    # D-Len of 0xFF, the parser waits for more data:
+    assert parse(parser, b'\x07\x01\xFF' + ACK) == []
+    assert parser.needed == 0xFF + 5 - 3 - len(ACK)
+    assert parser.resync()
+    assert [(id, bytes(data)) for id, data in parser.frames()] == [
+        (1, b'\x03\x8BOK')]
+    assert not parser.resync()
+
+
+def test_readfrom():
+    port = ChunkedPort(ACK + POS_REACHED + ERROR, chunk=100)
+    parser = schunk.FrameParser()
+    assert parser.readfrom(port) == len(ACK + POS_REACHED + ERROR)
+    assert port.calls == 1
+    assert len(list(parser.frames())) == 3
+
+
+def test_wrap_around():
+    parser = schunk.FrameParser(size=300)
+    for _ in range(100):
+        assert parse(parser, POS_REACHED[:5], POS_REACHED[5:] + ACK[:3]) == [
+            (2, b'\x05\x94\x00\x00\x20\x41')]
+        assert parse(parser, ACK[3:]) == [(1, b'\x03\x8BOK')]
+
+
+def test_buffer_size():
+    with pytest.raises(ValueError):
+        schunk.FrameParser(size=100)
+    parser = schunk.FrameParser(size=300)
+    with pytest.raises(ValueError):
+        parser.feed(bytes(301))
+
+
+class NoisyPort:
+
+    def __init__(self, answer):
+        self._answer = bytearray(answer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def write(self, data):
+        return len(data)
+
+    def read(self, n):
+        result = self._answer[:n]
+        del self._answer[:n]
+        return result
+
+    def flushInput(self):
+        pass
+
+
+def test_noisy_connection():
+    mod = schunk.Module(schunk.SerialConnection(
+        0x01, NoisyPort, b'\x00\x07\x01\xFF\x07' + ACK))
+    mod.ack()
@@ -0,0 +1,48 @@
+"""Test the jerk-limited MotionProfile."""
+
+import schunk
+import pytest
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.mark.parametrize('distance, velocity, acceleration, jerk', [
+    (100, 20, 50, 500),  # all limits reached
+    (2, 20, 50, 500),  # velocity limit not reached
+    (0.1, 20, 50, 500),  # acceleration limit not reached
+    (-50, 2, 50, 500),  # velocity reached, acceleration not reached
+])
+def test_profile(distance, velocity, acceleration, jerk):
+    profile = schunk.MotionProfile(distance, velocity, acceleration, jerk)
+    duration = float(profile.duration)
+    t = np.linspace(-0.1, duration + 0.1, 20001)
+    x = profile.position(t)
+    v = profile.velocity(t)
+    a = np.gradient(v, t)
+    assert x[0] == 0 and v[0] == 0
+    assert x[-1] == pytest.approx(distance)
+    assert v[-1] == 0
+    assert np.abs(v).max() == pytest.approx(float(profile.peak_velocity))
+    assert np.abs(v).max() <= velocity * (1 + 1e-12)
+    assert np.abs(a).max() <= acceleration * 1.001
+    assert np.abs(np.gradient(a, t)).max() <= jerk * 1.01
+    # velocity is the derivative of position:
+    assert np.gradient(x, t) == pytest.approx(v, abs=1e-3 * abs(velocity))
+    # position is monotonic:
+    assert (np.diff(x) * np.sign(distance) >= -1e-12).all()
+
+
+def test_vectorized():
+    profile = schunk.MotionProfile([[1], [10]], [5, 10, 20], 50, 500)
+    assert profile.duration.shape == (2, 3)
+    single = schunk.MotionProfile(10, 20, 50, 500)
+    assert profile.duration[1, 2] == single.duration
+    t = np.linspace(0, 1, 11)
+    assert profile.position(t[:, None, None]).shape == (11, 2, 3)
+
+
+def test_zero_distance():
+    profile = schunk.MotionProfile(0, 20, 50, 500)
+    assert profile.duration == 0
+    assert profile.position(1.0) == 0
+    assert profile.velocity(0.0) == 0
@@ -0,0 +1,169 @@
+"""Test the reader thread of SerialBus."""
+
+import threading
+import time
+
+import schunk
+import pytest
+
+from helpers import ThreadedPort, frame
+
+
+ACK1 = frame(0x05, 1, b'\x01\x8B')
+MOVE2 = frame(0x05, 2, b'\x05\xB0\x00\x00\x20\x41')
+POS_REACHED2 = frame(0x07, 2, b'\x05\x94\x00\x00\x20\x41')
+
+
+@pytest.fixture
+def bus():
+    answers = {
+        ACK1: POS_REACHED2 + frame(0x07, 1, b'\x03\x8BOK'),
+        MOVE2: frame(0x07, 2, b'\x05\xB0\x00\x00\x80\x3F') + POS_REACHED2,
+    }
+    bus = schunk.SerialBus(ThreadedPort, answers).start_reader(timeout=1)
+    yield bus
+    bus.close()
+
+
+def test_impulse_callback(bus):
+    received = []
+    bus.add_callback(lambda id, response: received.append((id, response)))
+    schunk.Module(bus.connection(1)).ack()
+    assert received == [(2, b'\x05\x94\x00\x00\x20\x41')]
+    # The impulse message was not queued for module 2:
+    mod2 = schunk.Module(bus.connection(2))
+    assert mod2.move_pos(10.0) == 1.0
+    assert len(received) == 2
+
+
+def test_blocking_move(bus):
+    received = []
+    bus.add_callback(lambda id, response: received.append(id), id=2)
+    bus.add_callback(lambda id, response: received.append(None), id=3)
+    assert schunk.Module(bus.connection(2)).move_pos_blocking(10.0) == 10.0
+    assert received == [2]
+
+
+def test_remove_callback(bus):
+    received = []
+
+    def callback(id, response):
+        received.append(id)
+
+    bus.add_callback(callback)
+    bus.remove_callback(callback)
+    schunk.Module(bus.connection(1)).ack()
+    assert received == []
+
+
+def test_stale_response_is_discarded(bus):
+    port = bus._serial
+    mod = schunk.Module(bus.connection(1))
+    port.inject(frame(0x07, 1, b'\x03\x92OK'))  # late response
+    for _ in range(1000):
+        if bus._pending.get(1):
+            break
+        time.sleep(0.001)
+    else:
+        pytest.fail("late response was not received")
+    mod.ack()
+
+
+def test_timeout():
+    bus = schunk.SerialBus(ThreadedPort, {}).start_reader(timeout=0.05)
+    try:
+        with pytest.raises(schunk.SchunkSerialError):
+            schunk.Module(bus.connection(1)).ack()
+    finally:
+        bus.close()
+
+
+def test_noise_is_skipped(bus):
+    port = bus._serial
+    port.inject(b'\x07\x01\x03\xFF\xFF\xFF\xFF')
+    while port._input:
+        time.sleep(0.001)
+    schunk.Module(bus.connection(1)).ack()
+
+
+def test_stop_reader(bus):
+    bus.stop_reader()
+    assert bus.connected
+    # Without reader thread, frames are read directly:
+    schunk.Module(bus.connection(1)).ack()
+
+
+MOVE3 = frame(0x05, 3, b'\x05\xB0\x00\x00\x20\x41')
+STOP3 = frame(0x05, 3, b'\x01\x91')
+
+
+@pytest.fixture
+def move_bus():
+    answers = {
+        MOVE2: frame(0x07, 2, b'\x05\xB0\x00\x00\x80\x3F') + POS_REACHED2,
+        # module 3 never reaches its position:
+        MOVE3: frame(0x07, 3, b'\x05\xB0\x00\x00\x80\x3F'),
+        STOP3: frame(0x07, 3, b'\x03\x91OK'),
+        ACK1: frame(0x07, 1, b'\x03\x8BOK'),
+    }
+    bus = schunk.SerialBus(ThreadedPort, answers).start_reader(timeout=1)
+    yield bus
+    bus.close()
+
+
+def test_bus_is_free_during_blocking_move(move_bus):
+    port = move_bus._serial
+    mod3 = schunk.Module(move_bus.connection(3))
+    result = []
+    thread = threading.Thread(
+        target=lambda: result.append(mod3.move_pos_blocking(10.0)))
+    thread.start()
+    try:
+        for _ in range(1000):
+            if move_bus._listening.get(3):
+                break
+            time.sleep(0.001)
+        else:
+            pytest.fail("blocking move didn't release the bus")
+        assert port.written == [MOVE3]
+        # Another module can be used while module 3 is moving:
+        schunk.Module(move_bus.connection(1)).ack()
+        assert port.written == [MOVE3, ACK1]
+        assert not result
+        port.inject(frame(0x07, 3, b'\x05\x94\x00\x00\x20\x41'))
+    finally:
+        thread.join(timeout=1)
+    assert result == [10.0]
+
+
+def test_move_handle(move_bus):
+    handle = schunk.Module(move_bus.connection(2)).start_move(10.0)
+    assert handle.result(timeout=1) == 10.0
+    assert handle.est_time == 1.0
+    assert move_bus._callbacks[2] == ()
+
+
+def test_move_handle_cancel(move_bus):
+    handle = schunk.Module(move_bus.connection(3)).start_move(10.0)
+    assert not handle.done()
+    assert handle.cancel()
+    assert handle.cancelled()
+    assert move_bus._serial.written[-1] == STOP3
+    assert not handle.cancel()
+
+
+def test_move_handle_error(move_bus):
+    handle = schunk.Module(move_bus.connection(3)).start_move(10.0)
+    # 2.6.1 CMD ERROR: ERROR SERVICE (0xD8)
+    move_bus._serial.inject(frame(0x07, 3, b'\x02\x88\xD8'))
+    with pytest.raises(schunk.SchunkError) as excinfo:
+        handle.result(timeout=1)
+    assert "CMD ERROR" in str(excinfo.value)
+
+
+def test_move_handle_needs_reader():
+    mod = schunk.Module(schunk.SerialConnection(1, ThreadedPort, {}))
+    with pytest.raises(schunk.SchunkError):
+        mod.start_move(10.0)
+    with pytest.raises(ValueError):
+        mod.start_move(10.0, command='reference')
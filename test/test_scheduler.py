@@ -0,0 +1,143 @@
+"""Test access to a SerialBus by priority."""
+
+import threading
+import time
+
+import schunk
+import pytest
+
+from helpers import DummyPort, frame
+
+
+def wait_for_waiting(scheduler, n):
+    for _ in range(1000):
+        if len(scheduler._waiting) >= n:
+            return
+        time.sleep(0.001)
+    pytest.fail("thread did not start waiting")
+
+
+def start_thread(target, *args):
+    thread = threading.Thread(target=target, args=args)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def test_priority_order():
+    scheduler = schunk.BusScheduler()
+    order = []
+
+    def worker(priority):
+        with scheduler.request(priority):
+            order.append(priority)
+
+    scheduler.acquire(schunk.BusScheduler.LOW)
+    threads = []
+    for n, priority in enumerate([schunk.BusScheduler.LOW,
+                                  schunk.BusScheduler.MOTION,
+                                  schunk.BusScheduler.LOW,
+                                  schunk.BusScheduler.HIGH]):
+        threads.append(start_thread(worker, priority))
+        wait_for_waiting(scheduler, n + 1)
+    scheduler.release()
+    for thread in threads:
+        thread.join()
+    assert order == [0, 1, 2, 2]
+
+
+def test_reentrant():
+    scheduler = schunk.BusScheduler()
+    with scheduler:
+        with scheduler.request(schunk.BusScheduler.HIGH):
+            assert scheduler._is_owned()
+        assert scheduler._is_owned()
+    assert not scheduler._is_owned()
+    with pytest.raises(RuntimeError):
+        scheduler.release()
+
+
+def test_max_waiting():
+    scheduler = schunk.BusScheduler(max_waiting=1)
+    errors = []
+
+    def worker(priority):
+        try:
+            scheduler.acquire(priority)
+        except schunk.SchunkError as e:
+            errors.append(e)
+        else:
+            scheduler.release()
+
+    scheduler.acquire()
+    first = start_thread(worker, schunk.BusScheduler.LOW)
+    wait_for_waiting(scheduler, 1)
+    start_thread(worker, schunk.BusScheduler.MOTION).join()
+    assert len(errors) == 1
+    # Urgent requests are always accepted:
+    urgent = start_thread(worker, schunk.BusScheduler.HIGH)
+    wait_for_waiting(scheduler, 2)
+    scheduler.release()
+    urgent.join()
+    first.join()
+    assert len(errors) == 1
+
+
+def test_preempt():
+    scheduler = schunk.BusScheduler()
+    order = []
+
+    def urgent():
+        with scheduler.request(schunk.BusScheduler.HIGH):
+            order.append('urgent')
+
+    scheduler.acquire(schunk.BusScheduler.LOW)
+    assert not scheduler.preempt()  # nobody is waiting
+    thread = start_thread(urgent)
+    wait_for_waiting(scheduler, 1)
+    with scheduler:
+        assert not scheduler.preempt()  # taken more than once
+    assert scheduler.preempt()
+    order.append('holder')
+    assert scheduler._is_owned()
+    scheduler.release()
+    thread.join()
+    assert order == ['urgent', 'holder']
+
+
+def test_stats():
+    times = iter([1.0, 1.0, 2.0, 2.5])
+    scheduler = schunk.BusScheduler(clock=lambda: next(times))
+    with scheduler.request(schunk.BusScheduler.HIGH):
+        pass
+    with scheduler.request(schunk.BusScheduler.HIGH):
+        pass
+    stats = scheduler.stats()
+    assert stats['high'] == (2, 0.25, 0.5)
+    assert stats['low'] == schunk.LatencyStats(0, 0.0, 0.0)
+    scheduler.reset_stats()
+    assert scheduler.stats()['high'].count == 0
+
+
+def test_stop_preempts_session():
+    ack = frame(0x05, 1, b'\x01\x8B')
+    get_config = frame(0x05, 1, b'\x02\x80\x06')
+    stop = frame(0x05, 2, b'\x01\x91')
+    answers = {
+        ack: frame(0x07, 1, b'\x03\x8BOK'),
+        get_config: frame(0x07, 1, b'\x03\x80\x06\x00'),
+        stop: frame(0x07, 2, b'\x03\x91OK'),
+    }
+    written = []
+    with schunk.SerialBus(DummyPort, answers, written) as bus:
+        mod1, mod2 = (schunk.Module(bus.connection(id)) for id in (1, 2))
+        with mod1._session():
+            assert mod1.config.unit_system == 0
+            thread = start_thread(mod2.stop)
+            wait_for_waiting(bus.scheduler, 1)
+            mod1.ack()
+        thread.join()
+    assert written == [get_config, stop, ack]
+    stats = bus.scheduler.stats()
+    assert stats['high'].count == 1
+    assert stats['motion'].count == 0
@@ -0,0 +1,194 @@
+"""Test serving several ports with SelectorLoop."""
+
+import socket
+import threading
+import time
+
+import schunk
+import pytest
+
+from helpers import ack_request, ack_response, frame
+
+
+def read_request(sock):
+    """Read one request frame (or return None at EOF)."""
+    data = b''
+    while len(data) < 3 or len(data) < data[2] + 5:
+        chunk = sock.recv(1)
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+class FakeBus:
+    """The other end of a port, answers in a thread."""
+
+    def __init__(self, answers):
+        self.port, self._peer = socket.socketpair()
+        self._answers = answers
+        self.requests = []
+        self.overlapping = False
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            request = read_request(self._peer)
+            if request is None:
+                return
+            self.requests.append(request)
+            # Only one request may be outstanding:
+            self._peer.setblocking(False)
+            try:
+                if self._peer.recv(1, socket.MSG_PEEK):
+                    self.overlapping = True
+            except BlockingIOError:
+                pass
+            self._peer.setblocking(True)
+            self._peer.sendall(self._answers.get(request, b''))
+
+    def close(self):
+        try:
+            self._peer.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # already shut down
+        self._peer.close()
+        self._thread.join()
+        self.port.close()
+
+
+@pytest.fixture
+def buses():
+    buses = []
+    yield buses
+    for bus in buses:
+        bus.close()
+
+
+def test_several_ports(buses):
+    for _ in range(3):
+        buses.append(FakeBus({ack_request(id): ack_response(id)
+                              for id in (1, 2)}))
+    errors = []
+
+    def worker(mod):
+        try:
+            for _ in range(20):
+                mod.ack()
+        except Exception as e:
+            errors.append(e)
+
+    with schunk.SelectorLoop(timeout=1) as loop:
+        for bus in buses:
+            loop.add_port(bus.port)
+        threads = [threading.Thread(target=worker, args=[
+            schunk.Module(loop.connection(bus.port, id))])
+            for bus in buses for id in (1, 2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert not errors
+    for bus in buses:
+        assert len(bus.requests) == 40
+        assert not bus.overlapping
+
+
+def test_blocking_move_and_routing(buses):
+    move = frame(0x05, 2, b'\x05\xB0\x00\x00\x20\x41')
+    pos_reached = frame(0x07, 2, b'\x05\x94\x00\x00\x20\x41')
+    bus = FakeBus({
+        move: frame(0x07, 2, b'\x05\xB0\x00\x00\x80\x3F') + pos_reached,
+        # module 3 sends an impulse message before module 1 answers:
+        ack_request(1): frame(0x07, 3, b'\x05\x94\x00\x00\x20\x41') +
+        ack_response(1),
+    })
+    buses.append(bus)
+    with schunk.SelectorLoop(timeout=1) as loop:
+        loop.add_port(bus.port)
+        mod2 = schunk.Module(loop.connection(bus.port, 2))
+        assert mod2.move_pos_blocking(10.0) == 10.0
+        schunk.Module(loop.connection(bus.port, 1)).ack()
+        # The impulse message is kept for module 3:
+        assert loop.submit(bus.port, 3, None).result(timeout=1) == \
+            b'\x05\x94\x00\x00\x20\x41'
+
+
+def test_impulse_during_other_request(buses):
+    move = frame(0x05, 2, b'\x05\xB0\x00\x00\x20\x41')
+    bus = FakeBus({
+        move: frame(0x07, 2, b'\x05\xB0\x00\x00\x80\x3F'),
+        # the position is reached while another thread talks to module 2:
+        ack_request(2): frame(0x07, 2, b'\x05\x94\x00\x00\x20\x41') +
+        ack_response(2),
+    })
+    buses.append(bus)
+    with schunk.SelectorLoop(timeout=1) as loop:
+        loop.add_port(bus.port)
+        mod2 = schunk.Module(loop.connection(bus.port, 2))
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(mod2.move_pos_blocking(10.0)))
+        thread.start()
+        for _ in range(1000):
+            if bus.requests:
+                break
+            time.sleep(0.001)
+        mod2.ack()
+        thread.join(timeout=2)
+        assert result == [10.0]
+        assert bus.requests == [move, ack_request(2)]
+
+
+def test_timeout(buses):
+    bus = FakeBus({ack_request(1): ack_response(1)})
+    buses.append(bus)
+    with schunk.SelectorLoop(timeout=0.05) as loop:
+        loop.add_port(bus.port)
+        with pytest.raises(schunk.SchunkSerialError):
+            schunk.Module(loop.connection(bus.port, 2)).ack()
+        # The next request works again:
+        schunk.Module(loop.connection(bus.port, 1)).ack()
+        with pytest.raises(schunk.SchunkSerialError):
+            loop.submit(bus.port, 1, None).result(timeout=1)
+
+
+def test_unknown_and_closed_port(buses):
+    bus = FakeBus({})
+    buses.append(bus)
+    with schunk.SelectorLoop(timeout=None) as loop:
+        with pytest.raises(ValueError):
+            loop.submit(bus.port, 1, b'\x01\x8B').result(timeout=1)
+        loop.add_port(bus.port)
+        future = loop.submit(bus.port, 1, b'\x01\x8B')
+        for _ in range(1000):
+            if bus.requests:
+                break
+            time.sleep(0.001)
+        bus._peer.shutdown(socket.SHUT_RDWR)
+        with pytest.raises(schunk.SchunkSerialError):
+            future.result(timeout=1)
+    with pytest.raises(schunk.SchunkError):
+        loop.submit(bus.port, 1, b'\x01\x8B')
+
+
+def test_run_once():
+    port, peer = socket.socketpair()
+    loop = schunk.SelectorLoop()
+    try:
+        loop.add_port(port)
+        future = loop.submit(port, 1, b'\x01\x8B')
+        loop.run_once(0)
+        assert read_request(peer) == ack_request(1)
+        peer.sendall(ack_response(1)[:4])
+        loop.run_once(1)
+        assert not future.done()
+        peer.sendall(ack_response(1)[4:])
+        loop.run_once(1)
+        assert future.result(timeout=0) == b'\x03\x8BOK'
+    finally:
+        loop.close()
+        port.close()
+        peer.close()
@@ -0,0 +1,117 @@
+"""Test keeping a SerialConnection open across several messages."""
+
+import schunk
+import pytest
+
+
+class CountingSerialManager:
+    """Each instance is one opened port; all instances share a script."""
+
+    def __init__(self, script):
+        # script: list of (expected, answer) pairs, consumed in order
+        self._script = script
+        self.opened.append(self)
+        self.closed = False
+        self.flushed = 0
+        self._answer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.closed = True
+
+    def write(self, data):
+        assert not self.closed
+        expected, answer = self._script.pop(0)
+        assert data == expected
+        self._answer.extend(answer)
+        return len(data)
+
+    def read(self, n):
+        result = self._answer[:n]
+        del self._answer[:n]
+        return result
+
+    def flushInput(self):
+        self.flushed += 1
+        del self._answer[:]
+
+
+@pytest.fixture
+def manager():
+    class Manager(CountingSerialManager):
+        opened = []
+    return Manager
+
+
+REFERENCE = (b'\x05\x01\x01\x92\xD1\x31', b'\x07\x01\x03\x92OK\xE9\xD9')
+ACK = (b'\x05\x01\x01\x8B\x10\xFB', b'\x07\x01\x03\x8BOK\x38\x1E')
+
+
+def test_port_is_reused(manager):
+    conn = schunk.SerialConnection(0x01, manager, [REFERENCE, ACK, ACK])
+    with conn:
+        assert conn.connected
+        mod = schunk.Module(conn)
+        mod.reference()
+        mod.ack()
+        mod.ack()
+        assert len(manager.opened) == 1
+        assert not manager.opened[0].closed
+    assert not conn.connected
+    assert manager.opened[0].closed
+
+
+def test_without_session(manager):
+    mod = schunk.Module(
+        schunk.SerialConnection(0x01, manager, [REFERENCE, ACK]))
+    mod.reference()
+    mod.ack()
+    assert len(manager.opened) == 2
+    assert all(port.closed for port in manager.opened)
+
+
+def test_recovery_after_crc_error(manager):
+    broken_ack = (ACK[0], ACK[1][:-1] + b'\x00')
+    conn = schunk.SerialConnection(0x01, manager, [broken_ack, ACK])
+    mod = schunk.Module(conn.connect())
+    port, = manager.opened
+    flushed = port.flushed
+    with pytest.raises(schunk.SchunkSerialError):
+        mod.ack()
+    assert port.flushed == flushed + 1
+    mod.ack()  # works again
+    assert manager.opened == [port]
+    conn.close()
+    assert port.closed
+
+
+def test_recovery_after_timeout(manager):
+    timeout = (ACK[0], ACK[1][:4])  # the rest of the answer is missing
+    conn = schunk.SerialConnection(0x01, manager, [timeout, ACK])
+    with conn:
+        mod = schunk.Module(conn)
+        with pytest.raises(schunk.SchunkSerialError):
+            mod.ack()
+        mod.ack()
+    assert len(manager.opened) == 1
+
+
+def test_reopen_if_flushing_fails(manager):
+    class FailingPort(manager):
+        def flushInput(self):
+            if self.flushed:
+                raise IOError("device vanished")
+            manager.flushInput(self)
+
+    conn = schunk.SerialConnection(0x01, FailingPort, [(ACK[0], b''), ACK])
+    with conn:
+        mod = schunk.Module(conn)
+        with pytest.raises(schunk.SchunkSerialError):
+            mod.ack()
+        assert not conn.connected
+        assert manager.opened[0].closed
+        mod.ack()
+        assert conn.connected
+        assert len(manager.opened) == 2
@@ -0,0 +1,136 @@
+"""Test remembering target values (Module(shadow_targets=True))."""
+
+import struct
+
+import schunk
+import pytest
+
+from helpers import DummyPort, frame
+
+
+def request(command, *values):
+    data = bytes([command]) + struct.pack('<{}f'.format(len(values)), *values)
+    return frame(0x05, 1, bytes([len(data)]) + data)
+
+
+def ok(command):
+    return frame(0x07, 1, bytes([3, command]) + b'OK')
+
+
+def est_time(command, seconds):
+    return frame(0x07, 1, bytes([5, command]) + struct.pack('<f', seconds))
+
+
+MOVE = request(0xB0, 10.0)
+MOVE_VEL_ACC = request(0xB0, 10.0, 5.0, 20.0)
+SET_VEL = request(0xA0, 5.0)
+SET_TIME = request(0xA4, 2.0)
+REBOOT = frame(0x05, 1, b'\x01\xE0')
+
+ANSWERS = {
+    MOVE: est_time(0xB0, 1.0),
+    MOVE_VEL_ACC: est_time(0xB0, 2.0),
+    request(0xB0, 10.0, 5.0): est_time(0xB0, 2.0),
+    request(0xB0, 10.0, 6.0): est_time(0xB0, 1.5),
+    request(0xB0, 10.0, 5.0, 25.0): est_time(0xB0, 1.5),
+    SET_VEL: ok(0xA0),
+    SET_TIME: ok(0xA4),
+    REBOOT: ok(0xE0),
+    request(0xB5, 10.0): ok(0xB5),
+    request(0xB3, 2.0): ok(0xB3),
+}
+
+
+@pytest.fixture
+def written():
+    return []
+
+
+@pytest.fixture
+def mod(written):
+    return schunk.Module(
+        schunk.SerialConnection(1, DummyPort, ANSWERS, written),
+        shadow_targets=True)
+
+
+def test_without_shadow(written):
+    mod = schunk.Module(schunk.SerialConnection(1, DummyPort, ANSWERS,
+                                                written))
+    mod.set_target_vel(5.0)
+    mod.set_target_vel(5.0)
+    assert written == [SET_VEL, SET_VEL]
+
+
+def test_targets_are_folded(mod, written):
+    mod.set_target_vel(5.0)
+    mod.set_target_acc(20.0)
+    assert written == []
+    assert mod.move_pos(10.0) == 2.0
+    assert written == [MOVE_VEL_ACC]
+    # The values are active now:
+    mod.set_target_vel(5.0)
+    mod.set_target_acc(20.0)
+    assert mod.move_pos(10.0) == 1.0
+    assert written == [MOVE_VEL_ACC, MOVE]
+
+
+def test_active_values_fill_gaps(mod, written):
+    mod.move_pos(10.0, 5.0, 20.0)
+    mod.set_target_acc(25.0)
+    assert mod.move_pos(10.0) == 1.5
+    assert written[-1] == request(0xB0, 10.0, 5.0, 25.0)
+    # Active values at the end are not sent:
+    mod.set_target_acc(25.0)
+    mod.set_target_vel(6.0)
+    mod.move_pos(10.0)
+    assert written[-1] == request(0xB0, 10.0, 6.0)
+
+
+def test_explicit_arguments_win(mod, written):
+    mod.set_target_vel(7.0)
+    mod.move_pos(10.0, 5.0)
+    assert written == [request(0xB0, 10.0, 5.0)]
+    mod.set_target_vel(5.0)
+    mod.move_pos(10.0)
+    assert written[-1] == MOVE
+
+
+def test_unrelated_targets_are_sent_separately(mod, written):
+    mod.set_target_time(2.0)
+    mod.move_pos(10.0)
+    assert written == [SET_TIME, MOVE]
+    mod.set_target_time(2.0)
+    mod.move_pos(10.0)
+    assert written == [SET_TIME, MOVE, MOVE]
+
+
+def test_targets_are_sent_before_other_movements(mod, written):
+    mod.set_target_vel(5.0)
+    mod.move_vel(10.0)
+    assert written == [SET_VEL, request(0xB5, 10.0)]
+    mod.set_target_time(2.0)
+    mod.move_cur(2.0)
+    assert written[2:] == [SET_TIME, request(0xB3, 2.0)]
+
+
+def test_reboot_forgets_targets(mod, written):
+    mod.move_pos(10.0, 5.0, 20.0)
+    mod.reboot()
+    mod.set_target_vel(5.0)
+    mod.move_pos(10.0)
+    assert written[-1] == request(0xB0, 10.0, 5.0)
+
+
+def test_error_forgets_targets(mod, written):
+    mod.move_pos(10.0, 5.0, 20.0)
+    move_error = request(0xB0, 20.0)
+    # 2.6.1 CMD ERROR (0x88), ERROR SOFT HIGH (0xD5)
+    ANSWERS[move_error] = frame(0x07, 1, b'\x02\x88\xD5')
+    try:
+        with pytest.raises(schunk.SchunkError):
+            mod.move_pos(20.0)
+    finally:
+        del ANSWERS[move_error]
+    mod.set_target_vel(5.0)
+    mod.move_pos(10.0)
+    assert written[-1] == request(0xB0, 10.0, 5.0)
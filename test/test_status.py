@@ -0,0 +1,60 @@
+"""Test the Status type and decoding of status bytes."""
+
+import schunk
+import pytest
+
+
+def test_same_as_dict():
+    for byte in range(256):
+        status = schunk._status_objects[byte]
+        expected = schunk.decode_status(byte)
+        assert status == expected
+        assert dict(status) == expected
+        assert status.as_dict() == expected
+        assert status == byte
+        for name, value in expected.items():
+            assert getattr(status, name) is value
+            assert status[name] is value
+
+
+def test_status():
+    status = schunk.Status(0xC1)
+    assert status.referenced and status.move_end and status.position_reached
+    assert not status.moving
+    assert status != {'referenced': True}
+    assert status != 0xC0
+    assert 'brake' in status
+    assert hash(status) == hash(0xC1)
+    assert repr(status) == 'Status(0xC1: referenced, move_end, ' \
+        'position_reached)'
+    with pytest.raises(KeyError):
+        status['nonexisting']
+    with pytest.raises(AttributeError):
+        status.moving = True
+    with pytest.raises(AttributeError):
+        status.other = 1
+
+
+def test_mapping_interface():
+    status = schunk.Status(0x03)
+    expected = schunk.decode_status(0x03)
+    assert list(status) == list(expected)
+    assert len(status) == len(expected)
+    assert status.get('moving') is True
+    assert status.get('nonexisting', 42) == 42
+    assert status.copy() == expected
+    assert isinstance(status.copy(), dict)
+    assert [name for name in status if status[name]] == [
+        'referenced', 'moving']
+    # The truth value is still the one of the status byte:
+    assert not schunk.Status(0)
+
+
+def test_decode_status_array():
+    np = pytest.importorskip('numpy')
+    statuses = np.arange(256, dtype='u1').reshape(16, 16)
+    flags = schunk.decode_status_array(statuses)
+    assert flags.shape == (16, 16)
+    for byte, flag in zip(statuses.flat, flags.flat):
+        assert dict(zip(flag.dtype.names, flag.tolist())) == \
+            schunk.decode_status(int(byte))
@@ -0,0 +1,134 @@
+"""Test sending CMD STOP without waiting for the bus."""
+
+import threading
+import time
+
+import schunk
+import pytest
+
+from helpers import LoggingPort, frame
+
+
+def stop(id):
+    return frame(0x05, id, b'\x01\x91')
+
+
+def stop_ok(id):
+    return frame(0x07, id, b'\x03\x91OK')
+
+
+def ack(id):
+    return frame(0x05, id, b'\x01\x8B')
+
+
+def ack_ok(id):
+    return frame(0x07, id, b'\x03\x8BOK')
+
+
+def test_stop_bypasses_scheduler():
+    answers = {
+        stop(1) + stop(2) + stop(10): stop_ok(1) + stop_ok(2),
+        ack(1): ack_ok(1),
+        ack(2): ack_ok(2),
+    }
+    written = []
+    held = threading.Event()
+    done = threading.Event()
+
+    with schunk.SerialBus(LoggingPort, answers, written) as bus:
+        def hold():
+            with bus.scheduler:
+                held.set()
+                done.wait(1)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait(1)
+        latency = bus.stop([1, 2], group_id=10)
+        done.set()
+        thread.join()
+        assert 0 <= latency < 1
+        assert written == [stop(1) + stop(2) + stop(10)]
+        # The responses are discarded:
+        schunk.Module(bus.connection(1)).ack()
+        schunk.Module(bus.connection(2)).ack()
+        assert not bus._stops
+
+
+def test_stop_without_open_port():
+    written = []
+    bus = schunk.SerialBus(LoggingPort, {}, written)
+    bus.stop(3, trigger=time.perf_counter())
+    assert written == [stop(3)]
+    assert not bus.connected
+    assert bus.scheduler.stats()['high'].count == 1
+
+
+def test_stop_with_reader():
+    answers = {stop(1): stop_ok(1), ack(1): ack_ok(1)}
+    written = []
+    bus = schunk.SerialBus(LoggingPort, answers, written)
+    bus.start_reader(timeout=1)
+    try:
+        received = []
+        bus.add_callback(lambda id, response: received.append(response))
+        conn = bus.connection(1)
+        conn.stop()
+        schunk.Module(conn).ack()
+    finally:
+        bus.close()
+    assert received == []
+    assert written == [stop(1), ack(1)]
+
+
+@pytest.mark.parametrize('reader', [False, True])
+def test_lost_stop_responses(reader):
+    # The responses to the first stop() collide and get lost:
+    answers = {stop(1): stop_ok(1), ack(2): ack_ok(2)}
+    written = []
+    with schunk.SerialBus(LoggingPort, answers, written) as bus:
+        if reader:
+            bus.start_reader(timeout=1)
+        bus.stop([1, 2])
+        # An exchange which sends CMD STOP itself gets its response:
+        schunk.Module(bus.connection(1)).stop()
+        assert list(bus._stops) == [2]
+        # After stop_response_window, a response is not dropped anymore:
+        bus.stop_response_window = 0.0
+        bus.stop(2)
+        with bus._received:
+            assert not bus._is_stop_response(2, bytearray(b'\x03\x91OK'))
+        assert not bus._stops
+        schunk.Module(bus.connection(2)).ack()
+    assert written == [stop(1) + stop(2), stop(1), stop(2), ack(2)]
+
+
+class InterruptingPort(LoggingPort):
+    """Raise KeyboardInterrupt while waiting for CMD POS REACHED."""
+
+    def read(self, n):
+        if not self._input:
+            raise KeyboardInterrupt
+        return LoggingPort.read(self, n)
+
+
+def test_interrupt_uses_stop_channel():
+    move = frame(0x05, 1, b'\x05\xB0\x00\x00\x20\x41')
+    answers = {move: frame(0x07, 1, b'\x05\xB0\x00\x00\x80\x3F')}
+    written = []
+    with schunk.SerialBus(InterruptingPort, answers, written) as bus:
+        mod = schunk.Module(bus.connection(1))
+        with pytest.raises(KeyboardInterrupt):
+            mod.move_pos_blocking(10.0)
+        assert written == [move, stop(1)]
+        assert list(bus._stops) == [1]
+
+
+def test_group_stop():
+    written = []
+    with schunk.SerialBus(LoggingPort, {}, written) as bus:
+        group = schunk.ModuleGroup(
+            [schunk.Module(bus.connection(id)) for id in (1, 2)],
+            group_id=10)
+        group.stop()
+    assert written == [stop(10)]
@@ -0,0 +1,136 @@
+"""Test GET STATE with selected fields and streaming of states."""
+
+import asyncio
+import contextlib
+import struct
+
+import schunk
+import pytest
+
+from helpers import DummyPort, DummyWriter, frame, run
+
+
+def get_state(id, interval, mode=0x07):
+    return frame(0x05, id, b'\x06\x95' + struct.pack('<fB', interval, mode))
+
+
+def state(id, pos, status=0x01):
+    return frame(0x07, id, b'\x0F\x95' + struct.pack(
+        '<3fBB', pos, 0.0, 0.0, status, 0))
+
+
+ACK = frame(0x05, 1, b'\x01\x8B')
+ACK_RESPONSE = frame(0x07, 1, b'\x03\x8BOK')
+
+
+def test_stream_state():
+    answers = {
+        get_state(1, 0.5): state(1, 1.0) + state(1, 2.0) + state(1, 3.0),
+        # another state is sent before the module stops streaming:
+        get_state(1, 0.0): state(1, 4.0) + state(1, 5.0),
+        ACK: ACK_RESPONSE,
+    }
+    written = []
+    with schunk.SerialConnection(1, DummyPort, answers, written) as conn:
+        mod = schunk.Module(conn)
+        positions = []
+        with contextlib.closing(mod.stream_state(0.5)) as states:
+            for pos, vel, cur, status, error in states:
+                assert status['referenced']
+                positions.append(pos)
+                if len(positions) == 3:
+                    break
+        assert positions == [1.0, 2.0, 3.0]
+        assert written == [get_state(1, 0.5), get_state(1, 0.0)]
+        mod.ack()  # the late state is ignored
+
+
+def test_stream_is_stopped_after_timeout():
+    move = frame(0x05, 1, b'\x05\xB0\x00\x00\x20\x41')
+    answers = {
+        # no further state arrives within the timeout of the port:
+        get_state(1, 2.0): state(1, 1.0),
+        # two late states are sent before the module stops streaming:
+        get_state(1, 0.0): state(1, 4.0) + state(1, 5.0) + state(1, 6.0),
+        # another late state arrives before the response:
+        get_state(1, 0.0, 0x01): state(1, 7.0) + frame(
+            0x07, 1, b'\x07\x95' + struct.pack('<fBB', 8.0, 0x80, 0)),
+        move: frame(0x07, 1, b'\x05\xB0\x00\x00\x80\x3F'),
+    }
+    written = []
+    with schunk.SerialConnection(1, DummyPort, answers, written) as conn:
+        mod = schunk.Module(conn)
+        states = mod.stream_state(2.0)
+        assert next(states)[0] == 1.0
+        with pytest.raises(schunk.SchunkSerialError):
+            next(states)
+        assert written == [get_state(1, 2.0), get_state(1, 0.0)]
+        # The late states are ignored:
+        assert mod.move_pos(10.0) == 1.0
+        assert mod.wait_until_position_reached() == 8.0
+
+
+def test_get_state_fields():
+    answers = {
+        get_state(1, 0.0, 0x01): frame(0x07, 1, b'\x07\x95' + struct.pack(
+            '<fBB', 10.0, 0x01, 0)),
+        get_state(1, 0.0, 0x06): frame(0x07, 1, b'\x0B\x95' + struct.pack(
+            '<2fBB', 2.0, 0.5, 0x03, 0)),
+    }
+    mod = schunk.Module(schunk.SerialConnection(1, DummyPort, answers, []))
+    pos, vel, cur, status, error = mod.get_state(['position'])
+    assert (pos, vel, cur) == (10.0, None, None)
+    assert status['referenced'] and not status['moving']
+    pos, vel, cur, status, error = mod.get_state(('current', 'velocity'))
+    assert (pos, vel, cur) == (None, 2.0, 0.5)
+    assert status['moving']
+    with pytest.raises(ValueError):
+        mod.get_state(['acceleration'])
+
+
+def test_wait_for_status_only():
+    status_only = get_state(1, 0.0, 0x00)
+    position = get_state(1, 0.0, 0x01)
+    answers = {
+        status_only: frame(0x07, 1, b'\x03\x95\x81\x00'),
+        position: frame(0x07, 1, b'\x07\x95' + struct.pack(
+            '<fBB', 10.0, 0x81, 0)),
+    }
+    written = []
+    mod = schunk.Module(schunk.SerialConnection(
+        1, DummyPort, answers, written))
+    assert mod.wait_until_position_reached(fields=()) == 10.0
+    assert written == [status_only, position]
+
+
+def test_invalid_interval():
+    mod = schunk.Module(schunk.SerialConnection(1, DummyPort, {}, []))
+    with pytest.raises(ValueError):
+        next(mod.stream_state(0))
+    with pytest.raises(ValueError):
+        schunk.AsyncModule(None).stream_state(-1.0)
+
+
+def test_async_stream_state():
+    answers = {
+        get_state(1, 0.5): state(1, 1.0) + state(1, 2.0) + state(1, 3.0),
+        get_state(1, 0.0): state(1, 4.0),
+    }
+    log = []
+
+    async def opener():
+        reader = asyncio.StreamReader()
+        return reader, DummyWriter(reader, answers, log)
+
+    async def main():
+        mod = schunk.AsyncModule(schunk.AsyncSerialConnection(1, opener))
+        positions = []
+        async with mod.stream_state(0.5) as states:
+            async for pos, vel, cur, status, error in states:
+                positions.append(pos)
+                if len(positions) == 2:
+                    break
+        return positions
+
+    assert run(main()) == [1.0, 2.0]
+    assert log == [get_state(1, 0.5), get_state(1, 0.0)]
@@ -0,0 +1,61 @@
+"""Test TelemetryRecorder."""
+
+import math
+
+import schunk
+import pytest
+
+np = pytest.importorskip('numpy')
+
+
+def state(pos, status=0x01, error=0):
+    return pos, 0.5 * pos, None, schunk.decode_status(status), error
+
+
+def test_record_and_window():
+    recorder = schunk.TelemetryRecorder(4)
+    assert len(recorder) == 0
+    assert len(recorder.window()) == 0
+    for i in range(3):
+        recorder.record(state(float(i)), timestamp=10.0 + i)
+    assert len(recorder) == 3
+    window = recorder.window()
+    assert list(window['pos']) == [0.0, 1.0, 2.0]
+    assert list(window['vel']) == [0.0, 0.5, 1.0]
+    assert all(math.isnan(cur) for cur in window['cur'])
+    assert list(window['status']) == [0x01] * 3
+    assert list(recorder.window(2)['timestamp']) == [11.0, 12.0]
+
+
+def test_overwrite_oldest():
+    recorder = schunk.TelemetryRecorder(4)
+    data = recorder._data
+    for i in range(11):
+        recorder.record(state(float(i), status=0x83), timestamp=float(i))
+    assert len(recorder) == 4
+    assert recorder.total == 11
+    window = recorder.window()
+    assert list(window['pos']) == [7.0, 8.0, 9.0, 10.0]
+    assert list(window['status']) == [0x83] * 4
+    # no copy was made:
+    assert np.shares_memory(window, data)
+    assert not window.flags.writeable
+    assert list(recorder.since(9.0)['pos']) == [9.0, 10.0]
+    assert list(recorder.window(100)['pos']) == [7.0, 8.0, 9.0, 10.0]
+    recorder.clear()
+    assert len(recorder) == 0
+
+
+def test_clock_and_extend():
+    times = iter([1.0, 2.0])
+    recorder = schunk.TelemetryRecorder(10, clock=lambda: next(times))
+    recorder.extend([state(1.0), state(2.0, status=0x80, error=0xD5)])
+    window = recorder.window()
+    assert list(window['timestamp']) == [1.0, 2.0]
+    assert list(window['error']) == [0, 0xD5]
+    assert list(window['status']) == [0x01, 0x80]
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        schunk.TelemetryRecorder(0)
@@ -0,0 +1,129 @@
+"""Test TrajectoryPlayer."""
+
+import struct
+
+import schunk
+import pytest
+
+
+class FakeTime:
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, duration):
+        self.sleeps.append(duration)
+        self.now += duration
+
+
+class DummyConnection:
+    """Answers are looked up by the sent data frame."""
+
+    def __init__(self, answers, fake_time):
+        self._answers = answers
+        self._time = fake_time
+        self.sent = []
+        self.stopped = False
+
+    @schunk.coroutine
+    def open(self):
+        response = None
+        while True:
+            data = yield response
+            self.sent.append((self._time.now, bytes(data)))
+            if data == b'\x01\x91':  # CMD STOP
+                self.stopped = True
+            response = bytearray(self._answers[bytes(data)])
+            self._time.now += 0.01  # round trip time
+
+
+def move_pos(*args, command=0xB0):
+    data = struct.pack('<{}f'.format(len(args)), *args)
+    return bytes([len(data) + 1, command]) + data
+
+
+def est_time(value, command=0xB0):
+    return bytes([5, command]) + struct.pack('<f', value)
+
+
+GET_POSITION = b'\x06\x95\x00\x00\x00\x00\x01'
+REACHED = b'\x07\x95\x00\x00\xC8\x41\x80\x00'  # 25.0
+
+
+def test_play():
+    fake_time = FakeTime()
+    conn = DummyConnection({
+        move_pos(10.0, 20.0): est_time(0.5),
+        move_pos(20.0, 20.0): est_time(0.5),
+        move_pos(25.0): est_time(0.25),
+        GET_POSITION: REACHED,
+    }, fake_time)
+    player = schunk.TrajectoryPlayer(
+        schunk.Module(conn), lead_time=0.1,
+        clock=fake_time.clock, sleep=fake_time.sleep)
+    stats = player.play([(10, 20), (20, 20, float('nan')), 25])
+    times = [time for time, data in conn.sent]
+    assert [data for time, data in conn.sent] == [
+        move_pos(10.0, 20.0), move_pos(20.0, 20.0), move_pos(25.0),
+        GET_POSITION]
+    # The next waypoint is sent before the previous is reached:
+    assert times[1] == pytest.approx(times[0] + 0.005 + 0.5 - 0.1)
+    assert times[2] == pytest.approx(times[1] + 0.005 + 0.5 - 0.1)
+    assert [segment.position for segment in stats] == [10.0, 20.0, 25.0]
+    assert [segment.est_time for segment in stats] == [0.5, 0.5, 0.25]
+    assert stats[0].start == pytest.approx(100.005)
+    assert stats[0].rtt == pytest.approx(0.01)
+    assert stats[0].duration == pytest.approx(0.405)
+    assert stats[2].duration == pytest.approx(0.015)
+    assert not conn.stopped
+
+
+def test_without_estimated_time():
+    fake_time = FakeTime()
+    conn = DummyConnection({
+        move_pos(10.0, command=0xB1): b'\x03\xB1OK',
+        move_pos(25.0, command=0xB1): est_time(0.25, command=0xB1),
+        GET_POSITION: REACHED,
+    }, fake_time)
+    player = schunk.TrajectoryPlayer(
+        schunk.Module(conn), clock=fake_time.clock, sleep=fake_time.sleep)
+    stats = player.play([[10], [25]], use_time=True)
+    assert [data for time, data in conn.sent] == [
+        move_pos(10.0, command=0xB1), GET_POSITION,
+        move_pos(25.0, command=0xB1), GET_POSITION]
+    assert fake_time.sleeps == []
+    assert len(stats) == 2
+
+
+def test_expected_time_of_last_waypoint():
+    fake_time = FakeTime()
+    conn = DummyConnection({move_pos(10.0): est_time(0.5)}, fake_time)
+    mod = schunk.Module(conn)
+    calls = []
+    mod.wait_until_position_reached = lambda **kwargs: calls.append(kwargs)
+    player = schunk.TrajectoryPlayer(
+        mod, clock=fake_time.clock, sleep=fake_time.sleep)
+    player.play([10])
+    # The rest of the estimated time is passed on:
+    assert calls == [{'expected_time': pytest.approx(0.495)}]
+
+
+def test_interrupt_stops_module():
+    fake_time = FakeTime()
+    conn = DummyConnection({
+        move_pos(10.0): est_time(0.5),
+        b'\x01\x91': b'\x03\x91OK',
+    }, fake_time)
+
+    def sleep(duration):
+        raise KeyboardInterrupt
+
+    player = schunk.TrajectoryPlayer(
+        schunk.Module(conn), clock=fake_time.clock, sleep=sleep)
+    with pytest.raises(KeyboardInterrupt):
+        player.play([10, 20])
+    assert conn.stopped
@@ -1,5 +1,7 @@
 """Test wait_until_position_reached()."""
 
+import time
+
 import schunk
 import pytest
 
@@ -60,3 +62,47 @@ def test_exception(exc_class):
     with pytest.raises(exc_class):
         mod.wait_until_position_reached()
     assert mod._connection.stopped
+
+
+class TimedConnection:
+    """The position is reached after a given time."""
+
+    def __init__(self, duration):
+        self._end = time.monotonic() + duration
+        self.polls = []
+        self.opened = 0
+
+    @schunk.coroutine
+    def open(self):
+        self.opened += 1
+        response = None
+        while True:
+            data = yield response
+            assert data == b'\x06\x95\x00\x00\x00\x00\x01'  # GET STATE
+            now = time.monotonic()
+            self.polls.append(now)
+            status = b'\x80' if now >= self._end else b'\x02'
+            response = bytearray(b'\x07\x95\x00\x00\x00\x00' + status)
+            response.append(0x00)
+
+
+def test_expected_time():
+    conn = TimedConnection(0.1)
+    start = time.monotonic()
+    mod = schunk.Module(conn)
+    assert mod.wait_until_position_reached(expected_time=0.1) == 0.0
+    assert conn.polls[0] - start >= 0.09 - 0.001
+    # The time between checks is halved until the expected time is over:
+    assert len(conn.polls) < 10
+    assert conn.opened == len(conn.polls)
+
+
+def test_timeout():
+    conn = TimedConnection(10)
+    mod = schunk.Module(conn)
+    with pytest.raises(schunk.SchunkTimeoutError) as excinfo:
+        mod.wait_until_position_reached(timeout=0.05, bus_load=0.5)
+    assert excinfo.value.waited >= 0.05
+    assert "not reached after" in str(excinfo.value)
+    with pytest.raises(ValueError):
+        mod.wait_until_position_reached(bus_load=0)